@@ -27,35 +27,14 @@ outputPath="$outputDir/$folderName"
 create_directory "$outputPath"
 
 # Define paths to scripts
-inventoryScript="inventory.py"
-importInventoryScript="import_inventory.py"
-keywordsScript="keywords.py"
-literalsScript="literal_analyzer.py"
-sqlScripts="sql_scripts_metrics.py"
-javaMethods="collect_java_methods.py"
-javaStrings="collect_java_strings.py"
-javaMaven="collect_gradle_dependencies.py"
-javaGradle="collect_maven_dependencies.py"
+# assessment.py runs inventory, import inventory, keywords, literals, sql scripts
+# and the java/maven/gradle collectors in a single pass over the folders
+assessmentScript="assessment.py"
 
 # Run scripts with arguments
 echo "Executing scripts..."
-echo "Executing Inventory collection..." 
-$PYTHON "$inventoryScript" "$configFile" "$outputPath"
-echo "Executing Import Inventory collection..." 
-$PYTHON "$importInventoryScript" "$configFile" "$outputPath"
-echo "Executing Keywords collection..." 
-$PYTHON "$keywordsScript" "$configFile" "$outputPath"
-echo "Executing Literals collection..." 
-$PYTHON "$literalsScript" "$configFile" "$outputPath"
-echo "Executing SQL Scripts collection..." 
-$PYTHON "$sqlScripts" "$configFile" "$outputPath"
-echo "Executing java methods..." 
-$PYTHON "$javaMethods" "$configFile" "$outputPath"
-echo "Executing java strings..." 
-$PYTHON "$javaStrings" "$configFile" "$outputPath"
-echo "Executing java maven..." 
-$PYTHON "$javaMaven" "$configFile" "$outputPath"
-echo "Executing java gradle..." 
-$PYTHON "$javaGradle" "$configFile" "$outputPath"
+echo "Executing Assessment collection..." 
+# the cache lives next to the timestamped folders so the next assessment can reuse it
+$PYTHON "$assessmentScript" "$configFile" "$outputPath" --cache "$outputDir/assessment_cache.sqlite"
 
 echo "Scripts executed successfully."
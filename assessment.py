@@ -0,0 +1,228 @@
+#!/usr/bin/python3
+"""
+Runs every collector (inventory, imports, keywords, literals, SQL metrics and the Java/Maven/Gradle
+collectors) in a single pass: each root_path is walked once, each file is read once and the same
+buffer is handed to every collector that accepts it. The reports are the same ones written by
+running the scripts one by one.
+"""
+import os
+import time
+import argparse
+import logging
+import csv
+from contextlib import ExitStack
+from functools import partial
+from rich.console import Console
+import yaml
+
+import inventory
+import import_inventory
+import keywords
+import literal_analyzer
+import sql_scripts_metrics
+import collect_java_methods
+import collect_java_strings
+import collect_maven_dependencies
+import collect_gradle_dependencies
+import line_counter
+import keyword_matcher
+import code_regions
+import notebook_reader
+import keyword_index
+import keyword_matrix
+import literal_store
+from scan_utils import SourceFile, iter_entries, is_hidden
+from exclusions import Exclusions, folders_from_config
+from result_cache import ResultCache, version_stamp
+from report_writer import open_report, output_formats
+from perf_stats import PerfStats
+
+csv.register_dialect('pipes', delimiter='|',quoting=csv.QUOTE_NONE,escapechar='\\')
+
+
+class Collector:
+    def __init__(self, name, report_path, fieldnames, collect, version, accepts=None, dialect="excel", column_types=None,
+                 open_writer=None):
+        self.name = name
+        self.version = version
+        self.report_path = report_path
+        self.fieldnames = fieldnames
+        self.collect = collect
+        self.accepts = accepts or (lambda file_path: True)
+        self.dialect = dialect
+        self.column_types = column_types
+        # writes the rows somewhere else than a report, for example keyword_index.KeywordIndex
+        self.open_writer = open_writer
+        self.writer = None
+
+
+def build_collectors(keyword_list, count_keyword_strings=False, keyword_index_file=None, keyword_matrix_format=None, aggregate_imports=False,
+                     classify_literals=False, literal_store_file=None):
+    collectors = [
+        # the keywords read every text file whole, streaming the big ones here would read them twice
+        Collector("inventory", inventory.report_path, inventory.report_fieldnames, partial(inventory.collect_rows, stream=False),
+                  version_stamp(inventory, helpers=(line_counter, notebook_reader)), column_types=inventory.report_types),
+        Collector("imports", import_inventory.report_path, import_inventory.report_fieldnames, partial(import_inventory.collect_rows, aggregate=aggregate_imports),
+                  version_stamp(import_inventory, [aggregate_imports], helpers=(code_regions, notebook_reader)),
+                  column_types=import_inventory.aggregated_types if aggregate_imports else import_inventory.report_types),
+        Collector("keywords", keywords.report_path, keywords.string_fieldnames if count_keyword_strings else keywords.report_fieldnames,
+                  partial(keywords.collect_rows, keyword_matcher.keyword_matcher(keyword_list), count_strings=count_keyword_strings),
+                  version_stamp(keywords, [keyword_list, count_keyword_strings], helpers=(keyword_matcher, code_regions, notebook_reader)),
+                  column_types=keywords.string_types if count_keyword_strings else keywords.report_types),
+        Collector("literals", literal_store_file or literal_analyzer.report_path,
+                  literal_analyzer.classified_fieldnames if classify_literals else literal_analyzer.report_fieldnames,
+                  partial(literal_analyzer.collect_rows, classify_sql=classify_literals),
+                  version_stamp(literal_analyzer, [classify_literals], helpers=(code_regions,)), accepts=literal_analyzer.is_r_file,
+                  open_writer=literal_store.LiteralStore if literal_store_file else None),
+        Collector("sql_metrics", sql_scripts_metrics.report_path, sql_scripts_metrics.report_fieldnames, sql_scripts_metrics.collect_rows,
+                  version_stamp(sql_scripts_metrics), accepts=lambda file_path: file_path.endswith('.sql')),
+        Collector("sql_metrics_errors", sql_scripts_metrics.errors_report_path, sql_scripts_metrics.errors_report_fieldnames, sql_scripts_metrics.collect_error_rows,
+                  version_stamp(sql_scripts_metrics), accepts=lambda file_path: file_path.endswith('.sql')),
+        Collector("java_methods", collect_java_methods.report_path, collect_java_methods.report_fieldnames, collect_java_methods.collect_rows,
+                  version_stamp(collect_java_methods), accepts=lambda file_path: file_path.endswith('.java'), dialect="pipes"),
+        Collector("java_strings", collect_java_strings.report_path, collect_java_strings.report_fieldnames, collect_java_strings.collect_rows,
+                  version_stamp(collect_java_strings), accepts=lambda file_path: file_path.endswith('.java'), dialect="pipes"),
+        Collector("maven", collect_maven_dependencies.report_path, collect_maven_dependencies.report_fieldnames, collect_maven_dependencies.collect_rows,
+                  version_stamp(collect_maven_dependencies), accepts=lambda file_path: file_path.endswith('pom.xml'), dialect="pipes"),
+        Collector("gradle", collect_gradle_dependencies.report_path, collect_gradle_dependencies.report_fieldnames, collect_gradle_dependencies.collect_rows,
+                  version_stamp(collect_gradle_dependencies), accepts=lambda file_path: file_path.endswith('.gradle'), dialect="pipes"),
+    ]
+    if keyword_index_file:
+        collectors.append(Collector("keyword_index", keyword_index_file, keyword_index.report_fieldnames,
+                                    partial(keywords.collect_occurrences, keyword_matcher.keyword_matcher(keyword_list), count_strings=count_keyword_strings),
+                                    version_stamp(keywords, [keyword_list, count_keyword_strings], helpers=(keyword_matcher, code_regions, notebook_reader, keyword_index)),
+                                    open_writer=keyword_index.KeywordIndex))
+    if keyword_matrix_format:
+        matcher = keyword_matcher.keyword_matcher(keyword_list)
+        collectors.append(Collector("keyword_matrix", keyword_matrix.matrix_path, keywords.report_fieldnames,
+                                    partial(keywords.collect_rows, matcher, count_strings=count_keyword_strings),
+                                    version_stamp(keywords, [keyword_list, count_keyword_strings], helpers=(keyword_matcher, code_regions, notebook_reader)),
+                                    open_writer=partial(open_keyword_matrix, names=matcher.names, matrix_format=keyword_matrix_format)))
+    return collectors
+
+
+def open_keyword_matrix(path, names, matrix_format):
+    return keyword_matrix.KeywordMatrix(path, names, matrix_format)
+
+# these collectors never look inside hidden folders, see scan_utils.is_hidden
+glob_collectors = ("literals", "sql_metrics", "sql_metrics_errors")
+
+
+def process_file(collectors, file_path, root_path, cache=None, perf=None, entry=None):
+    logging.info(f"Processing file: {file_path}")
+    source = SourceFile(file_path, entry)
+    hidden = None
+    if perf is not None:
+        file_start = time.perf_counter()
+        stages = []
+    for collector in collectors:
+        if not collector.accepts(file_path):
+            continue
+        if collector.name in glob_collectors:
+            if hidden is None:
+                hidden = is_hidden(file_path, root_path)
+            if hidden:
+                continue
+        if perf is not None:
+            stage_start = time.perf_counter()
+            read_before = source.read_seconds
+            cached = False
+        try:
+            rows = cache.get(collector.name, collector.version, source) if cache else None
+            if rows is None:
+                rows = list(collector.collect(file_path, root_path, source))
+                if cache:
+                    cache.put(collector.name, collector.version, source, rows)
+            elif perf is not None:
+                cached = True
+            collector.writer.writerows(rows)
+        except Exception as e:
+            logging.error(f"Error processing file: {file_path} in {collector.name} - {e}")
+        if perf is not None:
+            # the read of the file is charged to the "read" stage, not to the collector that triggered it
+            stages.append((collector.name, time.perf_counter() - stage_start - (source.read_seconds - read_before), cached))
+    if perf is not None:
+        size = source.size if source.is_loaded else 0
+        perf.record_file(file_path, size, source.read_seconds, stages, time.perf_counter() - file_start)
+
+
+def scan_folders(folder_config, collectors, output_folder, cache=None, output_format="csv", perf=None, walk_threads=0):
+    console = Console()
+
+    with ExitStack() as stack:
+        for collector in collectors:
+            output_csv = os.path.join(output_folder, collector.report_path)
+            os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+            if collector.open_writer:
+                collector.writer = stack.enter_context(collector.open_writer(output_csv))
+            else:
+                collector.writer = stack.enter_context(open_report(output_csv, collector.fieldnames, output_format,
+                                                                  collector.dialect, collector.column_types))
+
+        for config in folder_config:
+            root_path = config.get("root_path", "")
+            exclusions = Exclusions.from_config(config)
+
+            console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
+            logging.info(f"Scanning folder: {root_path}")
+
+            for entry in iter_entries(root_path, exclusions, walk_threads):
+                process_file(collectors, entry.path, root_path, cache, perf, entry)
+
+
+def setup_logging(log_file):
+    logging.basicConfig(filename=log_file, level=logging.INFO,
+                        format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan folders based on YAML configuration running all the collectors in a single pass.")
+    parser.add_argument("config_file", help="Path to the YAML configuration file")
+    parser.add_argument("output_folder", help="Folder for all the tool output")
+    parser.add_argument("--output-format", choices=output_formats, default="csv", help="Format of the reports: csv (default), parquet or arrow")
+    parser.add_argument("--cache", help="Path to a SQLite file used to reuse the results of files that did not change since the last run")
+    parser.add_argument("--keyword-index", help="Path to a SQLite file where the line and column of every keyword are written (see keyword_index.py)")
+    parser.add_argument("--keyword-matrix", choices=keyword_matrix.matrix_formats, help="Also write the keyword counts as a files x keywords matrix: npz (SciPy CSR), parquet or arrow")
+    parser.add_argument("--aggregate-imports", action="store_true", help="Write one row per element, package, kind and file in ImportUsagesInventory.csv, with the number of imports in Count")
+    parser.add_argument("--classify-literals", action="store_true", help="Parse the literals of R_SQL_Snippets.csv that look like SQL and add the IsSQL, StatementType and Tables columns")
+    parser.add_argument("--literal-store", help="Path to a SQLite file where every distinct literal is written once with the list of its occurrences, instead of R_SQL_Snippets.csv (see literal_store.py)")
+    parser.add_argument("--profile", action="store_true", help="Write Reports/Performance.csv with the time spent on every file and collector")
+    parser.add_argument("--walk-threads", type=int, default=0, help="Threads listing the next folders of the walk ahead of the scan (default 0, no prefetch)")
+    parser.add_argument("--profile-top", type=int, default=20, help="Number of files in Reports/PerformanceSlowestFiles.csv (default 20)")
+
+    args = parser.parse_args()
+
+    output_folder = args.output_folder
+    log_file = os.path.join(output_folder,"Logs","assessment.log")
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    setup_logging(log_file)
+
+    try:
+        with open(args.config_file, "r") as file:
+            config = yaml.safe_load(file)
+            folder_config = folders_from_config(config)
+            keyword_list = config.get("keywords", [])
+
+            with ExitStack() as stack:
+                cache = stack.enter_context(ResultCache(args.cache)) if args.cache else None
+                perf = stack.enter_context(PerfStats(output_folder, args.profile_top)) if args.profile else None
+                keyword_index_file = os.path.abspath(args.keyword_index) if args.keyword_index else None
+                keyword_matrix_format = keyword_matrix.resolve_matrix_format(args.keyword_matrix) if args.keyword_matrix else None
+                collectors = build_collectors(keyword_list, config.get("count_keywords_in_strings", False), keyword_index_file,
+                                              keyword_matrix_format, args.aggregate_imports, args.classify_literals,
+                                              os.path.abspath(args.literal_store) if args.literal_store else None)
+                scan_folders(folder_config, collectors, output_folder, cache, args.output_format, perf,
+                             args.walk_threads)
+                if cache:
+                    logging.info(f"Cache {args.cache}: {cache.hits} hits, {cache.misses} misses")
+        print("Assessment done")
+
+    except FileNotFoundError:
+        print(f"Error: Configuration file '{args.config_file}' not found.")
+        logging.error(f"Configuration file '{args.config_file}' not found.")
+    except yaml.YAMLError as e:
+        print(f"Error in YAML file: {e}")
+        logging.error(f"Error in YAML file: {e}")
+
+if __name__ == "__main__":
+    main()
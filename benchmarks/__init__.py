@@ -0,0 +1,16 @@
+"""
+Benchmarks for the SMA extension scripts.
+
+- generate_estate.py builds a reproducible synthetic workload (R/Rmd, SQL, Java with Maven and Gradle
+  builds, Python and Scala sources, Jupyter notebooks, Databricks source exports and .dbc archives).
+- run_benchmarks.py times every entry point over such a workload and writes files/sec, MB/sec and
+  peak RSS as JSON so different runs can be compared.
+- bench_exclusions.py is a microbenchmark of the exclusion rules.
+- bench_line_counter.py compares the line counting of inventory.py with the old readlines() version.
+- bench_keywords.py measures the keyword matching of keywords.py as the keyword list grows.
+- bench_imports.py compares the Python import extraction of import_inventory.py with ast.parse per line and per file.
+- bench_notebooks.py compares reading notebook cells with nbformat and with notebook_reader.py.
+- bench_sniffer.py checks and times the binary and encoding sniffing of sniffer.py.
+
+Run them from the repository root, for example `python3 -m benchmarks.run_benchmarks --files 2000`.
+"""
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+Microbenchmark of the exclusion rules: cost per path of the old per-pattern `re.search` loop
+against the compiled exclusions.PathMatcher, with a few hundred rules.
+
+    python3 benchmarks/bench_exclusions.py --rules 300 --paths 50000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exclusions import PathMatcher
+
+
+def is_excluded(name, exclude_patterns):
+    # the loop every scanner used to carry
+    for pattern in exclude_patterns:
+        if re.search(pattern, name):
+            return True
+    return False
+
+
+def make_rules(count, rng):
+    rules = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            rules.append(f"^generated_{i}_")
+        elif kind == 1:
+            rules.append(f"\\.tmp{i}$")
+        else:
+            rules.append(f"backup{i}")
+    return rules
+
+
+def make_names(count, rng):
+    exts = ['.py', '.R', '.sql', '.java', '.scala', '.ipynb', '.txt']
+    return [f"module_{rng.randint(0, 10**6)}{rng.choice(exts)}" for _ in range(count)]
+
+
+def measure(label, check, names, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for name in names:
+            check(name)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<28} {best / len(names) * 1e9:10.0f} ns/path")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the cost per path of the exclusion rules.")
+    parser.add_argument("--rules", type=int, default=300, help="Number of exclusion rules")
+    parser.add_argument("--paths", type=int, default=50000, help="Number of paths to check")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions, the best one is reported")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rules = make_rules(args.rules, rng)
+    names = make_names(args.paths, rng)
+
+    print(f"{args.rules} rules, {args.paths} paths")
+    legacy = measure("re.search per pattern", lambda name: is_excluded(name, rules), names, args.repeat)
+    matcher = PathMatcher(rules)
+    compiled = measure("compiled PathMatcher", lambda name: matcher.matches(name, name), names, args.repeat)
+    glob_matcher = PathMatcher(["glob:" + rule.strip("^$\\") + "*" for rule in rules])
+    measure("compiled PathMatcher (glob)", lambda name: glob_matcher.matches(name, name), names, args.repeat)
+    print(f"speedup {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
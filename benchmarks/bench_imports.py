@@ -0,0 +1,169 @@
+#!/usr/bin/python3
+"""
+Compares the Python import extraction of import_inventory.py with the previous one, ast.parse on
+every line that contains "import ", and with ast.parse of the whole file, which finds the same
+imports as import_inventory.py but builds the tree of all the code. With --language scala the
+Scala scan is compared with the two regular expressions it replaced, applied to every line, after
+checking the Scala imports of a few statements that follow comments.
+
+    python3 benchmarks/bench_imports.py --folder /path/to/a/large/repository
+    python3 benchmarks/bench_imports.py --files 500 --lines 2000
+    python3 benchmarks/bench_imports.py --language scala
+"""
+import os
+import io
+import re
+import ast
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_inventory import extract_imports_py, extract_imports_scala, import_element
+
+snippets = ["import os", "import numpy as np", "from pyspark.sql import functions as F", "from . import utils",
+            "from ..common.io import (read_table,\n    write_table)", "def load(path):\n    import json\n    return json.load(open(path))",
+            "x = {}\ny = x.get('import', 1)", "log.info(\"import started\")", "df = spark.read.table('sales_{}')",
+            "for row in rows:\n    total += row[{}]", "class Job{}:\n    def run(self):\n        return self.name"]
+# Scala files start with their imports, the code follows
+scala_imports = ["import org.apache.spark.sql.functions._", "import org.apache.spark.sql.{DataFrame, SparkSession => Session}",
+                 "import scala.collection.mutable", "import java.util.{\n  List => JList,\n  Map\n}", "import com.example.model{}.Record"]
+scala_snippets = ["  val total{} = rows.map(_.amount).sum", "  df.groupBy(\"region\").agg(sum(\"amount\")).show({})",
+                  "  // the totals of step {}", "  if (count > {}) {\n    log.info(s\"too many rows: $count\")\n  }",
+                  "  val cfg{} = Map(\"path\" -> \"/data/in\", \"format\" -> \"parquet\")", "val df = spark.read.table(\"sales_{}\")", "// import this later", "def run{}(x: Int): Int = {\n  import math._\n  x * {}\n}",
+                  "val text = s\"import $x\"", "object Job{} {\n  def main(args: Array[String]): Unit = println(args.length)\n}"]
+# (text, (ElementName, Line) of its imports)
+scala_cases = [("/* import a.b */ import c.d\n", [("c.d", 0)]),
+               ("/* a\n   b */ import c.d; import e.f\n", [("c.d", 1), ("e.f", 1)]),
+               ("// import a.b\nimport c.{D, E => F}\n", [("c.D", 1), ("c.E", 1)]),
+               ("val x = 1 /* c */ import c.d\n", [])]
+import_pattern_scala = re.compile(r'^\s*import\s+([^\s]+(\.[^\s]+)*)\s*$')
+from_import_pattern_scala = re.compile(r'^\s*import\s+([^\s]+(\.[^\s]+)*)(\.|\s)({[^}]+}|[^\s]+)\s*$')
+
+
+def old_extract(text):
+    # what import_inventory.py did before: ast.parse of every line that contains "import "
+    for line_number, code_line in enumerate(io.StringIO(text).readlines()):
+        if "import " not in code_line:
+            continue
+        try:
+            for node in ast.walk(ast.parse(code_line)):
+                if isinstance(node, ast.Import):
+                    for alias in node.names:
+                        yield (alias.name, line_number, alias.asname, code_line, alias.name)
+                elif isinstance(node, ast.ImportFrom):
+                    for alias in node.names:
+                        yield (node.module + "." + alias.name, line_number, alias.asname, code_line, node.module)
+        except Exception:
+            pass
+
+
+def old_extract_scala(text):
+    # what import_inventory.py did before for Scala: two regular expressions on every line with "import "
+    for line_number, statement in enumerate(io.StringIO(text).readlines()):
+        if "import " not in statement:
+            continue
+        match = import_pattern_scala.match(statement)
+        if match:
+            yield (match.group(1), line_number, "", statement, match.group(1))
+        match = from_import_pattern_scala.match(statement)
+        if match:
+            for name in match.group(4).strip('{}').split(','):
+                yield (name, line_number, "", statement, match.group(1))
+
+
+def import_nodes(body):
+    for node in body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+        else:
+            for field in ('body', 'handlers', 'orelse', 'finalbody', 'cases'):
+                yield from import_nodes(getattr(node, field, ()))
+
+
+def ast_extract(text):
+    # one ast.parse per file, the files that do not parse have no imports here
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError, RecursionError):
+        return
+    lines = io.StringIO(text).readlines()
+    for node in import_nodes(tree.body):
+        statement = "".join(lines[node.lineno - 1:node.end_lineno])
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                yield (alias.name, node.lineno - 1, alias.asname, statement, alias.name)
+        else:
+            module_name = "." * node.level + (node.module or "")
+            for alias in node.names:
+                yield (import_element(module_name, alias.name), node.lineno - 1, alias.asname, statement, module_name)
+
+
+def check_scala():
+    for text, expected in scala_cases:
+        found = [row[:2] for row in extract_imports_scala(text)]
+        if found != expected:
+            sys.exit(f"Wrong Scala imports for {text!r}: {found}, expected {expected}")
+
+
+def make_files(files, lines, rng, language="python"):
+    texts = []
+    for _ in range(files):
+        parts = [rng.choice(scala_imports).replace("{}", str(rng.randrange(100))) for _ in range(rng.randint(5, 30))] if language == "scala" else []
+        while sum(part.count("\n") + 1 for part in parts) < lines:
+            parts.append(rng.choice(scala_snippets if language == "scala" else snippets).replace("{}", str(rng.randrange(1000))))
+        texts.append("\n".join(parts) + "\n")
+    return texts
+
+
+def read_folder(folder, extension=".py"):
+    texts = []
+    for path, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith(extension):
+                try:
+                    with open(os.path.join(path, name), encoding="utf-8") as f:
+                        texts.append(f.read())
+                except (OSError, UnicodeDecodeError):
+                    pass
+    return texts
+
+
+def measure(label, extract, texts):
+    start = time.perf_counter()
+    found = sum(len(list(extract(text))) for text in texts)
+    elapsed = time.perf_counter() - start
+    size = sum(len(text) for text in texts)
+    print(f"  {label:<12} {elapsed:8.3f}s {size / 1e6 / elapsed:8.1f} MB/s  imports={found}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Python import extraction of import_inventory.py.")
+    parser.add_argument("--language", choices=["python", "scala"], default="python", help="Language of the files (default python)")
+    parser.add_argument("--folder", help="Repository whose .py or .scala files are scanned, instead of generated files")
+    parser.add_argument("--files", type=int, default=500, help="Number of generated files")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines of every generated file")
+    args = parser.parse_args()
+
+    if args.folder:
+        texts = read_folder(args.folder, ".scala" if args.language == "scala" else ".py")
+    else:
+        texts = make_files(args.files, args.lines, random.Random(7), args.language)
+    print(f"{len(texts)} files, {sum(len(text) for text in texts) / 1e6:.1f} MB")
+    if args.language == "scala":
+        check_scala()
+        before = measure("per line", old_extract_scala, texts)
+        after = measure("scan", extract_imports_scala, texts)
+        print(f"  {before / after:.1f}x the speed of the per line extraction")
+        return
+    before = measure("per line", old_extract, texts)
+    measure("ast.parse", ast_extract, texts)
+    after = measure("scan", extract_imports_py, texts)
+    print(f"  {before / after:.1f}x the speed of the per line extraction")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+"""
+Compares the keyword counting of keywords.py before and after keyword_matcher.py while the keyword
+list grows: re.split on every line plus a list lookup per fragment, against one pass over the text.
+Before timing it checks the split of code and strings on a few cases that went wrong before, and
+that both count the same keywords on the text given to the previous implementation (its keywords
+start their line or follow punctuation, where the two agree).
+
+    python3 benchmarks/bench_keywords.py --mb 20 --sizes 20 1000 10000
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keyword_matcher import KeywordMatcher
+from keywords import count_keywords_in_text
+
+spark_functions = ["library", "SparkR", "from_unixtime", "unix_timestamp", "from_utc_timestamp", "datediff", "date_add",
+                   "date_sub", "date_format", "collect_list", "collect_set", "explode", "explode_outer", "array_agg",
+                   "arrays_zip", "map_from_arrays", "from_json", "named_struct", "struct", "instr", "locate"]
+lines = ["df <- sql(\"SELECT id, amount FROM sales WHERE region = 'EU'\")", "# load the data", "",
+         "from_unixtime(df$ts, 'yyyy-MM-dd')", "library(SparkR)", "collect_list(agg(groupBy(df, df$k)))",
+         "explode(date_add(ts, 1)).collect_set(id)", "    explode_outer(df$items)", "fn_{}(x, {})"]
+
+
+def old_count(keywords, text):
+    # what keywords.count_keywords_in_line did before, for every line of the file
+    keyword_counts = {keyword: 0 for keyword in keywords}
+    for line in text.split('\n'):
+        line = line.strip()
+        if line == "" or line.startswith("#"):
+            continue
+        for word in re.split(r'\.|,|;|\(|\)|\[|\]|\{|\}', line):
+            if word and word in keywords:
+                keyword_counts[word] += 1
+    return keyword_counts
+
+
+# (text, extension, code counts, string counts)
+region_cases = [
+    # an R string with a SQL statement on several lines is a string, not code
+    ("q <- \"SELECT from_unixtime(ts),\n  datediff(a, b)\nFROM t\"\nx <- date_add(d, 1) # datediff\n", ".R",
+     {"date_add": 1}, {"from_unixtime": 1, "datediff": 1}),
+    ("```{r}\nq <- 'SELECT date_add(ts, 1)\nFROM t'\n```\ndatediff in the prose\n", ".Rmd", {}, {"date_add": 1}),
+    ("q <- \"never closed from_unixtime(ts)\n", ".R", {}, {"from_unixtime": 1}),
+]
+
+
+def check_regions():
+    for text, extension, code, strings in region_cases:
+        found = count_keywords_in_text(["from_unixtime", "datediff", "date_add"], text, extension, True)
+        if found != (code, strings):
+            sys.exit(f"Wrong code/string split for {text!r}: {found}, expected {(code, strings)}")
+
+
+def check_counts(keywords, matcher, text):
+    expected = {keyword: count for keyword, count in old_count(keywords, text).items() if count}
+    found = {keyword: count for keyword, count in matcher.count(text).items() if count}
+    if found != expected:
+        different = sorted(keyword for keyword in expected.keys() | found.keys() if expected.get(keyword) != found.get(keyword))
+        sys.exit(f"Different counts for {len(different)} keywords, e.g. {different[:5]}")
+
+
+def make_text(size_mb, rng):
+    chunk = "\n".join(rng.choice(lines).format(rng.randrange(20000), rng.randrange(100)) for _ in range(10000)) + "\n"
+    return chunk * max(1, size_mb * 1024 * 1024 // len(chunk))
+
+
+def measure(label, func, size):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<12} {elapsed:8.3f}s {size / 1e6 / elapsed:8.1f} MB/s  matches={sum(result.values())}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the keyword counting of keywords.py against the size of the keyword list.")
+    parser.add_argument("--mb", type=int, default=20, help="Size of the generated text in MB")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 1000, 10000], help="Sizes of the keyword lists")
+    parser.add_argument("--old-mb", type=float, default=1, help="MB of text given to the previous implementation, it gets slow with long lists")
+    args = parser.parse_args()
+
+    check_regions()
+    rng = random.Random(3)
+    text = make_text(args.mb, rng)
+    size = len(text.encode('utf-8'))
+    old_text = text[:int(args.old_mb * 1024 * 1024)]
+    old_text = old_text[:old_text.rfind("\n") + 1]
+    for count in args.sizes:
+        keywords = (spark_functions + [f"fn_{i}" for i in range(count)])[:count]
+        print(f"{count} keywords")
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords)
+        print(f"  {'compile':<12} {time.perf_counter() - start:8.3f}s")
+        check_counts(keywords, matcher, old_text)
+        measure("before", lambda: old_count(keywords, old_text), len(old_text.encode('utf-8')))
+        measure("after", lambda: matcher.count(old_text), len(old_text.encode('utf-8')))
+        measure("after, all", lambda: matcher.count(text), size)
+
+
+if __name__ == "__main__":
+    main()
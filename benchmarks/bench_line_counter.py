@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+"""
+Compares the line counting of inventory.py before and after line_counter.py on big files:
+readlines() plus three passes over the lines against one pass over binary chunks.
+
+    python3 benchmarks/bench_line_counter.py --mb 300
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_counter import count_file_lines, block_comments_by_extension
+
+# snippets of a few lines, the generated files are made of random snippets
+samples = {
+    ".R": ["df <- sql(\"SELECT id, amount FROM sales WHERE region = 'EU'\")", "# load the data", "",
+           "x <- paste0('value_', i)  # inline", "    out <- from_unixtime(df$ts, 'yyyy-MM-dd')"],
+    ".java": ["    public int method(int value) {\n        int total = value * 2;\n        return total;\n    }",
+              "        // comment", "", "        String sql = \"SELECT * FROM t WHERE a = '\" + value + \"'\";",
+              "    /**\n     * Javadoc of the method.\n     *\n     * @param value the value\n     */",
+              "        total += value; /* inline */", "        total += value;", "        if (total > 10) {\n            total -= 1;\n        }"],
+}
+line_comments = {".R": "#", ".java": "//"}
+
+
+def readlines_count(path, line_comment_mark):
+    # what inventory.process_file did before
+    with open(path, 'r') as f:
+        lines = f.readlines()
+    code_lines = sum(1 for line in lines if line.strip() and not line.strip().startswith(line_comment_mark))
+    comment_lines = sum(1 for line in lines if line.strip().startswith(line_comment_mark))
+    blank_lines = sum(1 for line in lines if not line.strip())
+    return code_lines, comment_lines, blank_lines
+
+
+def make_file(folder, extension, size_mb, rng):
+    path = os.path.join(folder, "big" + extension)
+    block = "\n".join(rng.choice(samples[extension]) for _ in range(10000)) + "\n"
+    with open(path, 'w') as f:
+        for _ in range(max(1, size_mb * 1024 * 1024 // len(block))):
+            f.write(block)
+    return path
+
+
+def measure(label, func, size):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<30} {elapsed:8.2f}s {size / 1e6 / elapsed:8.1f} MB/s  code/comment/blank={result}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the line counting of inventory.py on big files.")
+    parser.add_argument("--mb", type=int, default=200, help="Size of every generated file in MB")
+    parser.add_argument("--chunk-size", type=int, default=4 * 1024 * 1024, help="Chunk size of line_counter")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as folder:
+        for extension in samples:
+            path = make_file(folder, extension, args.mb, rng)
+            size = os.path.getsize(path)
+            mark = line_comments[extension]
+            print(f"{extension} file of {size / 1e6:.0f} MB")
+            before = measure("readlines + 3 passes", lambda: readlines_count(path, mark), size)
+            after = measure("line_counter (line comments)", lambda: count_file_lines(path, mark, (), args.chunk_size), size)
+            blocks = block_comments_by_extension.get(extension, ())
+            if blocks:
+                measure("line_counter (with blocks)", lambda: count_file_lines(path, mark, blocks, args.chunk_size), size)
+            print(f"  speedup {before / after:.1f}x")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+"""
+Compares the literal extraction of literal_analyzer.py with the complete R lexer (ply, every token
+of the code) and with the literal scanner, which only looks at comments, backtick names and
+strings. Both must find the same (file, literal, line) in every file.
+
+With --startup it times, in new processes, the import of literal_analyzer.py and the first use of
+the lexer, with its tables built from the rules and read from r_lextab.py.
+
+    python3 benchmarks/bench_literals.py --files 300 --lines 2000
+    python3 benchmarks/bench_literals.py --folder /path/to/r/code
+    python3 benchmarks/bench_literals.py --startup
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+
+from literal_analyzer import lex_literals, scan_literals
+
+snippets = ["library(SparkR)", "df{} <- sql(\"SELECT id, amount FROM sales WHERE region = 'north'\")",
+            "total{} <- sum(df$amount[df$year >= 2020 & df$flag != 0]) / {}", "# it's the \"old\" query, see ticket {}",
+            "query <- paste0(\"SELECT * FROM \", table, \" LIMIT {}\")", "path <- 'C:\\\\data\\\\input_{}.csv'",
+            "msg <- \"row \\\"{}\\\" is invalid\"", "sql <- r\"(SELECT \"id\" FROM t{} WHERE name = 'x')\"",
+            "tmpl <- R'---[multi\nline {} ]---'", "`odd name {}` <- function(x, y) {{ x %in% y }}",
+            "for (i in 1:{}) {{\n  if (i %% 2 == 0) print(i)\n}}", "result <- tryCatch(run(\"job_{}\"), error = function(e) NULL)",
+            "long <- \"SELECT a,\n  b\nFROM t{}\"", "x{} <- c(1, 2, 3) * 2.5e3"]
+
+
+def make_files(files, lines, rng):
+    texts = []
+    for _ in range(files):
+        parts = []
+        while sum(part.count("\n") + 1 for part in parts) < lines:
+            parts.append(rng.choice(snippets).replace("{}", str(rng.randrange(1000))))
+        texts.append("\n".join(parts) + "\n")
+    return texts
+
+
+def read_folder(folder):
+    texts = []
+    for path, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith((".R", ".r")):
+                try:
+                    with open(os.path.join(path, name), encoding="utf-8") as f:
+                        texts.append(f.read())
+                except (OSError, UnicodeDecodeError):
+                    pass
+    return texts
+
+
+def measure(label, extract, texts):
+    start = time.perf_counter()
+    found = [list(extract("file.R", text)) for text in texts]
+    elapsed = time.perf_counter() - start
+    size = sum(len(text) for text in texts)
+    print(f"  {label:<10} {elapsed:8.3f}s {size / 1e6 / elapsed:8.1f} MB/s  literals={sum(len(rows) for rows in found)}")
+    return elapsed, found
+
+
+# run in a new process, prints the milliseconds of the import and of the first lexer
+startup_script = """
+import sys, time
+sys.path.insert(0, {repo_root!r})
+start = time.perf_counter()
+import literal_analyzer
+imported = time.perf_counter()
+literal_analyzer.lexer_table_path = {table_path!r}
+literal_analyzer.r_lexer()
+print((imported - start) * 1000, (time.perf_counter() - imported) * 1000)
+"""
+
+
+def measure_startup(runs):
+    with tempfile.TemporaryDirectory() as folder:
+        table_path = os.path.join(folder, "r_lextab.py")
+        script = startup_script.format(repo_root=repo_root, table_path=table_path)
+        times = {"import": [], "build": [], "read": []}
+        for _ in range(runs):
+            for case in ("build", "read"):
+                if case == "build" and os.path.exists(table_path):
+                    os.remove(table_path)
+                output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+                imported, lexer = (float(value) for value in output.split())
+                times["import"].append(imported)
+                times[case].append(lexer)
+    print(f"median of {runs} runs")
+    print(f"  import of literal_analyzer   {statistics.median(times['import']):7.2f} ms")
+    print(f"  lexer built from the rules   {statistics.median(times['build']):7.2f} ms")
+    print(f"  lexer read from r_lextab.py  {statistics.median(times['read']):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the literal extraction of literal_analyzer.py.")
+    parser.add_argument("--folder", help="Folder whose .R files are scanned, instead of generated files")
+    parser.add_argument("--files", type=int, default=300, help="Number of generated files")
+    parser.add_argument("--lines", type=int, default=2000, help="Lines of every generated file")
+    parser.add_argument("--startup", action="store_true", help="Time the import and the lexer construction instead")
+    parser.add_argument("--runs", type=int, default=20, help="Processes started for --startup")
+    args = parser.parse_args()
+
+    if args.startup:
+        measure_startup(args.runs)
+        return
+    texts = read_folder(args.folder) if args.folder else make_files(args.files, args.lines, random.Random(3))
+    print(f"{len(texts)} files, {sum(len(text) for text in texts) / 1e6:.1f} MB")
+    before, expected = measure("ply", lex_literals, texts)
+    after, found = measure("scanner", scan_literals, texts)
+    different = sum(1 for a, b in zip(expected, found) if a != b)
+    if different:
+        print(f"  {different} files have different literals")
+    print(f"  {before / after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
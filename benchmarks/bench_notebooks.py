@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""
+Compares reading the cells of Jupyter notebooks with nbformat and with notebook_reader.py, on
+notebooks whose outputs hold large images (the usual case of exported analysis notebooks) and on
+small notebooks without outputs.
+
+    python3 benchmarks/bench_notebooks.py --cells 200 --image-kb 200
+"""
+import os
+import sys
+import json
+import time
+import base64
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nbformat
+
+from notebook_reader import read_notebook
+
+
+def make_notebook(cells, image_kb, rng):
+    notebook_cells = []
+    for index in range(cells):
+        outputs = []
+        if image_kb:
+            image = base64.b64encode(rng.randbytes(image_kb * 1024)).decode()
+            outputs.append({"output_type": "display_data", "metadata": {}, "data": {"image/png": image, "text/plain": ["<Figure>"]}})
+            outputs.append({"output_type": "stream", "name": "stdout", "text": [f"row {row}\n" for row in range(20)]})
+        notebook_cells.append({"cell_type": "code", "execution_count": index, "metadata": {}, "outputs": outputs,
+                               "source": ["df = spark.read.table(\"sales\")\n", f"display(df.limit({index}))"]})
+        notebook_cells.append({"cell_type": "markdown", "metadata": {}, "source": [f"## Step {index}"]})
+    return json.dumps({"cells": notebook_cells, "metadata": {"kernelspec": {"language": "python", "name": "python3"}},
+                       "nbformat": 4, "nbformat_minor": 4}, indent=1)
+
+
+def measure(label, func, texts):
+    start = time.perf_counter()
+    for text in texts:
+        func(text)
+    elapsed = time.perf_counter() - start
+    size = sum(len(text) for text in texts)
+    print(f"  {label:<10} {elapsed:8.3f}s {size / 1e6 / elapsed:8.1f} MB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reading notebook cells with nbformat and with notebook_reader.py.")
+    parser.add_argument("--cells", type=int, default=200, help="Code cells of the notebook with outputs")
+    parser.add_argument("--image-kb", type=int, default=200, help="Size of the image in the outputs of every cell")
+    parser.add_argument("--small", type=int, default=300, help="Number of small notebooks without outputs")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    heavy = make_notebook(args.cells, args.image_kb, rng)
+    small = [make_notebook(rng.randrange(5, 40), 0, rng) for _ in range(args.small)]
+    expected = [(cell.cell_type, cell.source) for cell in nbformat.reads(heavy, as_version=4).cells]
+    assert [(cell.cell_type, cell.source) for cell in read_notebook(heavy).cells] == expected
+    for title, texts in ((f"1 notebook of {len(heavy) / 1e6:.1f} MB with outputs", [heavy]),
+                         (f"{len(small)} notebooks without outputs", small)):
+        print(title)
+        before = measure("nbformat", lambda text: nbformat.reads(text, as_version=4), texts)
+        after = measure("reader", read_notebook, texts)
+        print(f"  {before / after:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+"""
+Times sniffer.py on the heads of generated text and binary files, after checking the verdict of a
+few heads that are easy to get wrong: text that starts like a magic number, binary files whose
+magic number is printable ascii, text with a BOM or in latin-1.
+
+    python3 benchmarks/bench_sniffer.py --heads 20000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sniffer import sniff, sniff_size
+
+# (head, (is_binary, encoding))
+sniff_cases = [
+    (b"ID3 tags are read by read_tags()\n", (False, "utf-8")),
+    (b"PAR1 = 3\nprint(PAR1)\n", (False, "utf-8")),
+    (b"BM <- read.csv('bm.csv')\n", (False, "utf-8")),
+    (b"OggS files are skipped\n", (False, "utf-8")),
+    (b"ID3\x03\x00\x00\x00\x00\x0fvTIT2", (True, None)),
+    (b"PAR1\x15\x04\x15\x80\x01\x15\x00", (True, None)),
+    (b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj", (True, None)),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR", (True, None)),
+    (b"\xef\xbb\xbfSELECT 1;\n", (False, "utf-8-sig")),
+    (b"caf\xe9 = 1\n", (False, "latin-1")),
+]
+text_lines = [b"df <- sql(\"SELECT id, amount FROM sales\")", b"# load the data", b"import os", b"    total += row[3]", b""]
+
+
+def check_sniff():
+    for head, expected in sniff_cases:
+        found = sniff(head)
+        if found != expected:
+            sys.exit(f"Wrong sniff of {head!r}: {found}, expected {expected}")
+
+
+def make_heads(count, rng):
+    heads = []
+    for index in range(count):
+        if index % 4 == 0:
+            heads.append(rng.choice([b"\x89PNG\r\n\x1a\n", b"PK\x03\x04", b"PAR1", b""]) + rng.randbytes(sniff_size))
+        else:
+            lines = []
+            while sum(len(line) + 1 for line in lines) < sniff_size:
+                lines.append(rng.choice(text_lines))
+            heads.append(b"\n".join(lines)[:sniff_size])
+    return heads
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary and encoding sniffing of sniffer.py.")
+    parser.add_argument("--heads", type=int, default=20000, help="Number of generated file heads")
+    args = parser.parse_args()
+
+    check_sniff()
+    heads = make_heads(args.heads, random.Random(5))
+    start = time.perf_counter()
+    binary = sum(1 for head in heads if sniff(head)[0])
+    elapsed = time.perf_counter() - start
+    size = sum(len(head) for head in heads)
+    print(f"{len(heads)} heads, {size / 1e6:.1f} MB")
+    print(f"  {'sniff':<12} {elapsed:8.3f}s {len(heads) / elapsed:10.0f} heads/s  binary={binary}")
+
+
+if __name__ == "__main__":
+    main()
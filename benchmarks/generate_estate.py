@@ -0,0 +1,315 @@
+#!/usr/bin/python3
+"""
+Generates a reproducible synthetic estate for the benchmarks.
+
+    python3 -m benchmarks.generate_estate /tmp/estate --files 2000 --seed 1
+
+The same seed and size always produce the same files. The estate looks like:
+
+    <target>/config.yml          config used by the collectors (one root_path: <target>/workload)
+    <target>/workload/r          .R and .Rmd scripts with SQL strings
+    <target>/workload/sql        .sql scripts
+    <target>/workload/java       Maven/Gradle modules with .java sources, pom.xml and build.gradle
+    <target>/workload/python     .py and .scala sources
+    <target>/workload/notebooks  .ipynb notebooks, some of them with heavy image outputs
+    <target>/workload/dbx        Databricks "notebook source" exports
+    <target>/dbc                 .dbc archives (kept out of the workload, they are inputs of dbcexplode/dbc-to-ipynb)
+    <target>/manifest.json       number of files and bytes per extension
+"""
+import os
+import io
+import json
+import base64
+import random
+import zipfile
+import argparse
+
+# share of the workload files of each kind
+mix = [
+    ("r", 0.20),
+    ("rmd", 0.05),
+    ("sql", 0.15),
+    ("java", 0.15),
+    ("python", 0.10),
+    ("scala", 0.05),
+    ("notebook", 0.10),
+    ("dbx", 0.20),
+]
+
+spark_functions = ["from_unixtime", "unix_timestamp", "from_utc_timestamp", "datediff", "date_add", "date_sub",
+                   "date_format", "collect_list", "collect_set", "explode", "explode_outer", "array_agg",
+                   "arrays_zip", "map_from_arrays", "from_json", "named_struct", "struct", "instr", "locate"]
+python_modules = ["os", "sys", "json", "re", "datetime", "pandas", "numpy", "pyspark.sql", "pyspark.sql.functions",
+                  "pyspark.sql.types", "snowflake.snowpark", "requests", "collections", "itertools"]
+r_packages = ["SparkR", "sparklyr", "dplyr", "DBI", "odbc", "lubridate", "ggplot2", "data.table", "stringr"]
+java_packages = ["java.util.List", "java.util.Map", "java.sql.Connection", "java.sql.ResultSet",
+                 "org.apache.spark.sql.Dataset", "org.apache.spark.sql.SparkSession", "com.google.common.base.Strings"]
+
+
+class Estate:
+    def __init__(self, target, rng):
+        self.target = target
+        self.rng = rng
+        self.manifest = {}
+
+    def write(self, rel_path, content, record=True):
+        path = os.path.join(self.target, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = content if isinstance(content, bytes) else content.encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+        if record:
+            name = os.path.basename(path)
+            ext = name if name == "pom.xml" else os.path.splitext(name)[1]
+            entry = self.manifest.setdefault(ext, {"files": 0, "bytes": 0})
+            entry["files"] += 1
+            entry["bytes"] += len(data)
+        return path
+
+    def table(self):
+        return self.rng.choice(["sales", "customers", "orders", "events", "accounts", "inventory"]) + "_" + str(self.rng.randint(1, 50))
+
+    def query(self):
+        cols = ", ".join(self.rng.sample(["id", "name", "amount", "ts", "region", "status", "price", "qty"], 3))
+        fn = self.rng.choice(spark_functions)
+        return f"SELECT {cols}, {fn}(ts) AS v FROM {self.table()} t JOIN {self.table()} u ON t.id = u.id WHERE t.status = 'OK'"
+
+    def r_lines(self, count):
+        lines = [f"library({pkg})" for pkg in self.rng.sample(r_packages, 3)]
+        for i in range(count):
+            kind = self.rng.random()
+            if kind < 0.15:
+                lines.append(f"# step {i}: {self.rng.choice(['load', 'clean', 'aggregate', 'export'])} data")
+            elif kind < 0.35:
+                lines.append(f"df{i} <- sql(\"{self.query()}\")")
+            elif kind < 0.5:
+                lines.append(f"out{i} <- {self.rng.choice(spark_functions)}(df$col{i}, 'yyyy-MM-dd')")
+            elif kind < 0.6:
+                lines.append("")
+            else:
+                lines.append(f"x{i} <- paste0('value_', {i}) # inline comment")
+        return lines
+
+    def r_script(self, rel_path, size):
+        self.write(rel_path, "\n".join(self.r_lines(size)) + "\n")
+
+    def rmd(self, rel_path, size):
+        out = ["---", "title: \"report\"", "output: html_document", "---", "", "# Analysis", ""]
+        for chunk in range(max(1, size // 20)):
+            out.append(f"Some text explaining chunk {chunk}.")
+            out.append("```{r}")
+            out.extend(self.r_lines(20))
+            out.append("```")
+            out.append("")
+        self.write(rel_path, "\n".join(out) + "\n")
+
+    def sql_script(self, rel_path, size):
+        out = []
+        for i in range(max(1, size // 6)):
+            out.append(f"-- statement {i}")
+            kind = self.rng.random()
+            if kind < 0.5:
+                out.append(self.query() + ";")
+            elif kind < 0.7:
+                out.append(f"CREATE TABLE {self.table()}_copy AS {self.query()};")
+            elif kind < 0.85:
+                out.append(f"INSERT INTO {self.table()} {self.query()};")
+            else:
+                out.append(f"/* block comment {i}\n   spanning lines */\nUPDATE {self.table()} SET status = 'DONE' WHERE id = {i};")
+        self.write(rel_path, "\n".join(out) + "\n")
+
+    def java_source(self, rel_path, package, class_name, size):
+        out = [f"package {package};", ""]
+        out.extend(f"import {name};" for name in self.rng.sample(java_packages, 4))
+        out.append("")
+        out.append(f"public class {class_name} {{")
+        out.append(f"    private static final String QUERY = \"{self.query()}\";")
+        for m in range(max(1, size // 10)):
+            out.append(f"    // method {m}")
+            out.append(f"    public int method{m}(int value) {{")
+            out.append(f"        String sql = \"INSERT INTO {self.table()} VALUES (\" + value + \")\";")
+            out.append("        int total = value * 2;")
+            out.append("        if (total > 10) {")
+            out.append("            total -= 1;")
+            out.append("        }")
+            out.append("        return total;")
+            out.append("    }")
+        out.append("}")
+        self.write(rel_path, "\n".join(out) + "\n")
+
+    def pom(self, rel_path, artifact):
+        deps = "".join(
+            f"<dependency><groupId>org.example{i}</groupId><artifactId>lib{i}</artifactId><version>1.{i}.0</version></dependency>"
+            for i in range(self.rng.randint(3, 12)))
+        self.write(rel_path, f"""<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+  <groupId>com.example</groupId>
+  <artifactId>{artifact}</artifactId>
+  <version>1.0</version>
+  <dependencies>{deps}</dependencies>
+</project>
+""")
+
+    def gradle(self, rel_path):
+        out = ["plugins { id 'java' }", "dependencies {"]
+        for i in range(self.rng.randint(3, 12)):
+            out.append(f"    implementation group: 'org.example{i}', name: 'lib{i}', version: '2.{i}.0'")
+        out.append("}")
+        self.write(rel_path, "\n".join(out) + "\n")
+
+    def python_lines(self, count):
+        lines = [f"import {m}" for m in self.rng.sample(python_modules, 3)]
+        lines.append("from pyspark.sql.functions import (col,\n    lit, explode)")
+        for i in range(count):
+            kind = self.rng.random()
+            if kind < 0.15:
+                lines.append(f"# step {i}")
+            elif kind < 0.35:
+                lines.append(f"df{i} = spark.sql(\"{self.query()}\")")
+            elif kind < 0.5:
+                lines.append(f"df{i} = df.withColumn('c{i}', F.{self.rng.choice(spark_functions)}(col('ts')))")
+            elif kind < 0.6:
+                lines.append("")
+            else:
+                lines.append(f"value_{i} = {i} * 2")
+        return lines
+
+    def python_script(self, rel_path, size):
+        self.write(rel_path, "\n".join(self.python_lines(size)) + "\n")
+
+    def scala_script(self, rel_path, size):
+        out = ["package com.example", "", "import org.apache.spark.sql.{DataFrame, SparkSession => SS}",
+               "import org.apache.spark.sql.functions._", "import scala.collection.mutable", ""]
+        out.append("object Job {")
+        for i in range(size):
+            kind = self.rng.random()
+            if kind < 0.2:
+                out.append(f"  // step {i}")
+            elif kind < 0.4:
+                out.append(f"  val df{i} = spark.sql(\"{self.query()}\")")
+            else:
+                out.append(f"  val v{i} = {i} * 2")
+        out.append("}")
+        self.write(rel_path, "\n".join(out) + "\n")
+
+    def notebook(self, rel_path, size, heavy_outputs):
+        cells = []
+        for c in range(max(1, size // 10)):
+            if c % 4 == 0:
+                cells.append({"cell_type": "markdown", "metadata": {}, "source": [f"## Section {c}\n", "Some notes."]})
+                continue
+            source = "\n".join(self.python_lines(8))
+            outputs = []
+            if heavy_outputs:
+                image = base64.b64encode(bytes(self.rng.getrandbits(8) for _ in range(20000))).decode('ascii')
+                outputs.append({"output_type": "display_data", "metadata": {},
+                                "data": {"image/png": image, "text/plain": ["<Figure>"]}})
+            outputs.append({"output_type": "stream", "name": "stdout", "text": [f"row {i}\n" for i in range(20)]})
+            cells.append({"cell_type": "code", "execution_count": c, "metadata": {}, "outputs": outputs,
+                          "source": source.splitlines(True)})
+        nb = {"cells": cells, "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3", "language": "python"}},
+              "nbformat": 4, "nbformat_minor": 4}
+        self.write(rel_path, json.dumps(nb, indent=1))
+
+    def dbx_cells(self, size):
+        cells = []
+        for c in range(max(2, size // 10)):
+            kind = c % 5
+            if kind == 0:
+                cells.append(f"# MAGIC %md\n# MAGIC ## Step {c}\n# MAGIC Some notes")
+            elif kind == 1:
+                cells.append(f"# MAGIC %sql\n# MAGIC {self.query()}")
+            elif kind == 2:
+                cells.append(f"# MAGIC %run ./shared/utils_{self.rng.randint(1, 5)}")
+            else:
+                cells.append("\n".join(self.python_lines(8)))
+        return cells
+
+    def dbx_source(self, rel_path, size):
+        body = "\n\n# COMMAND ----------\n\n".join(self.dbx_cells(size))
+        self.write(rel_path, "# Databricks notebook source\n" + body + "\n")
+
+    def dbc_archive(self, rel_path, notebooks, size):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as dbc:
+            for n in range(notebooks):
+                commands = []
+                for cell in self.dbx_cells(size):
+                    command = cell.replace("# MAGIC ", "")
+                    commands.append({"command": command, "position": len(commands)})
+                notebook = {"version": "NotebookV1", "name": f"notebook_{n:04d}", "language": "python",
+                            "commands": commands}
+                # fixed timestamps keep the archive byte for byte reproducible
+                entry = zipfile.ZipInfo(f"project/folder_{n % 5}/notebook_{n:04d}.python", date_time=(2020, 1, 1, 0, 0, 0))
+                dbc.writestr(entry, json.dumps(notebook), zipfile.ZIP_DEFLATED)
+        self.write(rel_path, buffer.getvalue(), record=False)
+
+
+def generate_estate(target, files=1000, seed=1, lines=60, dbc_archives=2, dbc_notebooks=50):
+    """Writes the estate under target and returns the manifest."""
+    rng = random.Random(seed)
+    estate = Estate(target, rng)
+    workload = "workload"
+    counts = {kind: max(1, int(files * share)) for kind, share in mix}
+    size = lambda: rng.randint(lines // 2, lines * 2)
+
+    for i in range(counts["r"]):
+        estate.r_script(os.path.join(workload, "r", f"pkg{i % 20}", f"script_{i}.R"), size())
+    for i in range(counts["rmd"]):
+        estate.rmd(os.path.join(workload, "r", "reports", f"report_{i}.Rmd"), size())
+    for i in range(counts["sql"]):
+        estate.sql_script(os.path.join(workload, "sql", f"schema{i % 10}", f"query_{i}.sql"), size())
+    modules = max(1, counts["java"] // 25)
+    for m in range(modules):
+        base = os.path.join(workload, "java", f"module{m}")
+        estate.pom(os.path.join(base, "pom.xml"), f"module{m}")
+        estate.gradle(os.path.join(base, "build.gradle"))
+    for i in range(counts["java"]):
+        m = i % modules
+        package = f"com.example.module{m}.pkg{i % 7}"
+        rel = os.path.join(workload, "java", f"module{m}", "src", "main", "java", *package.split("."), f"Class{i}.java")
+        estate.java_source(rel, package, f"Class{i}", size())
+    for i in range(counts["python"]):
+        estate.python_script(os.path.join(workload, "python", f"app{i % 10}", f"module_{i}.py"), size())
+    for i in range(counts["scala"]):
+        estate.scala_script(os.path.join(workload, "python", "scala", f"Job{i}.scala"), size())
+    for i in range(counts["notebook"]):
+        estate.notebook(os.path.join(workload, "notebooks", f"notebook_{i}.ipynb"), size(), heavy_outputs=(i % 3 == 0))
+    for i in range(counts["dbx"]):
+        estate.dbx_source(os.path.join(workload, "dbx", f"team{i % 8}", f"notebook_{i}.py"), size())
+
+    manifest = {"seed": seed, "files": files, "lines": lines, "extensions": estate.manifest, "dbc": []}
+    # the dbc archives are not part of the workload folder
+    for a in range(dbc_archives):
+        path = os.path.join(target, "dbc", f"archive_{a}.dbc")
+        estate.dbc_archive(path, dbc_notebooks, lines)
+        manifest["dbc"].append({"path": path, "notebooks": dbc_notebooks, "bytes": os.path.getsize(path)})
+
+    with open(os.path.join(target, "config.yml"), "w") as f:
+        f.write(f"folders:\n  - root_path: \"{os.path.abspath(os.path.join(target, workload))}\"\n")
+        f.write("keywords:\n")
+        f.write("".join(f"  - {name}\n" for name in ["library", "SparkR"] + spark_functions))
+    with open(os.path.join(target, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a reproducible synthetic estate for the benchmarks.")
+    parser.add_argument("target", help="Folder where the estate is generated")
+    parser.add_argument("--files", type=int, default=1000, help="Approximate number of source files in the workload")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed, the same seed generates the same estate")
+    parser.add_argument("--lines", type=int, default=60, help="Average number of lines per file")
+    parser.add_argument("--dbc-archives", type=int, default=2, help="Number of .dbc archives")
+    parser.add_argument("--dbc-notebooks", type=int, default=50, help="Notebooks per .dbc archive")
+    args = parser.parse_args()
+
+    manifest = generate_estate(args.target, args.files, args.seed, args.lines, args.dbc_archives, args.dbc_notebooks)
+    total_files = sum(entry["files"] for entry in manifest["extensions"].values())
+    total_bytes = sum(entry["bytes"] for entry in manifest["extensions"].values())
+    print(f"Generated {total_files} files ({total_bytes / 1e6:.1f} MB) and {len(manifest['dbc'])} dbc archives in {args.target}")
+
+
+if __name__ == "__main__":
+    main()
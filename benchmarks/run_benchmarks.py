@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+"""
+Times every entry point of the repo over a synthetic estate (see generate_estate.py).
+
+    python3 -m benchmarks.run_benchmarks --files 2000 --seed 1 --output results.json
+    python3 -m benchmarks.run_benchmarks --estate /tmp/estate --only inventory keywords --compare results.json
+
+Every script runs in its own process, the way RunScripts.sh calls it, and for each one the results
+file records the wall time, files/sec, MB/sec (over the files the script actually reads) and the peak
+RSS of the process. With --compare the files/sec of a previous results file are printed next to
+the new ones.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_root)
+
+from benchmarks.generate_estate import generate_estate
+
+all_files = None
+# name -> (script, how it is called, files it reads)
+entry_points = {
+    "inventory": ("inventory.py", "config", all_files),
+    "keywords": ("keywords.py", "config", all_files),
+    "import_inventory": ("import_inventory.py", "config", ('.rmd', '.r', '.R', '.py', '.scala', '.java')),
+    "literal_analyzer": ("literal_analyzer.py", "config", ('.R', '.r', '.Rmd', '.rmd')),
+    "sql_scripts_metrics": ("sql_scripts_metrics.py", "config", ('.sql',)),
+    "collect_java_methods": ("collect_java_methods.py", "config", ('.java',)),
+    "collect_java_strings": ("collect_java_strings.py", "config", ('.java',)),
+    "collect_maven_dependencies": ("collect_maven_dependencies.py", "config", ('pom.xml',)),
+    "collect_gradle_dependencies": ("collect_gradle_dependencies.py", "config", ('.gradle',)),
+    "assessment": ("assessment.py", "config", all_files),
+    "dbx_magic_process": ("dbx_magic_process.py", "dbx", all_files),
+    "dbcexplode": ("dbcexplode.py", "dbc", None),
+    "dbc-to-ipynb": (os.path.join("dbc-to-ipynb", "dbc-to-ipynb.py"), "dbc", None),
+}
+
+
+def workload_stats(folder, suffixes):
+    files = 0
+    size = 0
+    for dir_path, _, names in os.walk(folder):
+        for name in names:
+            if suffixes is None or name.endswith(suffixes):
+                files += 1
+                size += os.path.getsize(os.path.join(dir_path, name))
+    return files, size
+
+
+def run_process(command):
+    """Runs command from the repo root, returns (exit code, seconds, peak RSS in bytes or None, stderr tail)."""
+    with tempfile.TemporaryFile() as stderr:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=repo_root, stdout=subprocess.DEVNULL, stderr=stderr)
+        peak_rss = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+            peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+        else:
+            process.wait()
+        elapsed = time.perf_counter() - start
+        stderr.seek(0)
+        tail = stderr.read()[-2000:].decode('utf-8', errors='replace')
+    return process.returncode, elapsed, peak_rss, tail
+
+
+def commands_for(name, estate, manifest, scratch):
+    """Returns the list of commands of one entry point and the folder/files they read."""
+    script, kind, _ = entry_points[name]
+    script = os.path.join(repo_root, script)
+    workload = os.path.join(estate, "workload")
+    if kind == "config":
+        output = os.path.join(scratch, name)
+        os.makedirs(output, exist_ok=True)
+        return [[sys.executable, script, os.path.join(estate, "config.yml"), output]]
+    if kind == "dbx":
+        return [[sys.executable, script, "--input", os.path.join(workload, "dbx"),
+                 "--output", os.path.join(scratch, name), "--format", "python-script"]]
+    commands = []
+    for entry in manifest["dbc"]:
+        # dbcexplode writes next to its input, so every run works on a copy
+        target = os.path.join(scratch, name, os.path.basename(entry["path"]))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(entry["path"], target)
+        if name == "dbcexplode":
+            commands.append([sys.executable, script, target])
+        else:
+            commands.append([sys.executable, script, target, target + "-notebooks"])
+    return commands
+
+
+def input_size(name, estate, manifest):
+    _, kind, suffixes = entry_points[name]
+    if kind == "config":
+        return workload_stats(os.path.join(estate, "workload"), suffixes)
+    if kind == "dbx":
+        return workload_stats(os.path.join(estate, "workload", "dbx"), suffixes)
+    return sum(entry["notebooks"] for entry in manifest["dbc"]), sum(entry["bytes"] for entry in manifest["dbc"])
+
+
+def benchmark(name, estate, manifest, repeat):
+    files, size = input_size(name, estate, manifest)
+    best = None
+    for _ in range(repeat):
+        scratch = tempfile.mkdtemp(prefix="sma-bench-")
+        try:
+            commands = commands_for(name, estate, manifest, scratch)
+            elapsed = 0.0
+            peak_rss = None
+            for command in commands:
+                code, seconds, rss, tail = run_process(command)
+                if code != 0:
+                    return {"name": name, "error": f"exit code {code}", "stderr": tail}
+                elapsed += seconds
+                if rss is not None:
+                    peak_rss = max(peak_rss or 0, rss)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        if best is None or elapsed < best["seconds"]:
+            best = {"seconds": elapsed, "peak_rss": peak_rss}
+    seconds = best["seconds"]
+    return {
+        "name": name,
+        "files": files,
+        "bytes": size,
+        "seconds": round(seconds, 4),
+        "files_per_sec": round(files / seconds, 2) if seconds else None,
+        "mb_per_sec": round(size / 1e6 / seconds, 3) if seconds else None,
+        "peak_rss_mb": round(best["peak_rss"] / 2**20, 1) if best["peak_rss"] is not None else None,
+    }
+
+
+def print_results(results, previous=None):
+    previous = {entry["name"]: entry for entry in (previous or {}).get("results", [])}
+    print(f"{'entry point':<30}{'files':>8}{'seconds':>10}{'files/s':>10}{'MB/s':>9}{'RSS MB':>9}")
+    for entry in results:
+        if "error" in entry:
+            print(f"{entry['name']:<30} failed: {entry['error']}")
+            continue
+        line = (f"{entry['name']:<30}{entry['files']:>8}{entry['seconds']:>10.2f}{entry['files_per_sec']:>10.1f}"
+                f"{entry['mb_per_sec']:>9.2f}{entry['peak_rss_mb'] if entry['peak_rss_mb'] is not None else '-':>9}")
+        before = previous.get(entry["name"])
+        if before and before.get("files_per_sec"):
+            line += f"   {entry['files_per_sec'] / before['files_per_sec']:.2f}x vs previous"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the entry points over a synthetic estate.")
+    parser.add_argument("--estate", help="Folder of the estate. It is generated if it does not have a manifest.json (default: a temporary folder)")
+    parser.add_argument("--files", type=int, default=1000, help="Approximate number of files of the generated estate")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the generated estate")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per entry point, the fastest one is reported")
+    parser.add_argument("--only", nargs="+", choices=list(entry_points), help="Entry points to run (default: all)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file with the results")
+    parser.add_argument("--compare", help="Previous results file to compare with")
+    args = parser.parse_args()
+
+    estate = args.estate or tempfile.mkdtemp(prefix="sma-estate-")
+    manifest_path = os.path.join(estate, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    else:
+        print(f"Generating estate in {estate}")
+        manifest = generate_estate(estate, args.files, args.seed)
+
+    results = []
+    for name in args.only or list(entry_points):
+        print(f"Running {name}")
+        results.append(benchmark(name, estate, manifest, args.repeat))
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "estate": {"path": estate, "seed": manifest["seed"], "files": manifest["files"]},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_results(results, previous)
+    if not args.estate:
+        shutil.rmtree(estate, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+"""
+Separates the code of a source file from its comments and string literals, so keywords.py only
+matches keywords in code and, when asked to, counts the matches inside strings on their own
+(SQL statements are often written inside string literals).
+
+    code, strings = split_code(text, language_for(".java"))
+
+The language is picked from the extension of the file, lower cased as keywords.map_technology does
+(PowerShell gets its own scanner, it shares the Shell technology with .sh files). Each language has
+a single regular expression with its comments and its string literals as alternatives; scanning left to right
+makes a `//` inside a string part of the string and a quote inside a comment part of the comment.
+Removing the matches is one `re.sub` pass and the strings are collected by one `findall` pass, only
+when they are needed.
+
+- R: `#` comments, '...' and "..." strings, which can span lines (SQL statements often do).
+- Python: `#` comments, triple quoted, '...' and "..." strings (docstrings are strings).
+- Java and Scala: `//` and `/* */` comments, triple quoted (text blocks), "..." strings and 'c' characters.
+- SQL: `--` and `/* */` comments, '...' strings (with '' escapes). "..." are quoted identifiers, code.
+- Shell: `#` comments at the start of a word, '...' and "..." strings.
+- PowerShell (.ps1): `#` and `<# #>` comments, '...' and "..." strings (with ` escapes).
+- R Markdown: only the code of the chunks, with the language of the chunk; the prose is left out.
+
+Any other language returns None and the caller falls back to its own handling.
+
+`mask_code` returns the same two texts keeping every character at its offset (the other regions
+are replaced by spaces, newlines are kept), so the line and column of a match can be computed. It
+is slower and only used for the keyword occurrence index.
+
+`CodePositions` tells whether a few positions of a big file are in code, without walking all its
+strings; import_inventory.py uses it for the import statements of Python and Scala.
+"""
+import re
+
+line_comment_hash = r"#[^\n]*"
+line_comment_dashes = r"--[^\n]*"
+line_comment_slashes = r"//[^\n]*"
+block_comment_c = r"/\*[\s\S]*?(?:\*/|\Z)"
+double_quoted = r'"(?:[^"\\\n]|\\[\s\S])*"'
+single_quoted = r"'(?:[^'\\\n]|\\[\s\S])*'"
+# R strings go on until the closing quote, across lines
+r_double_quoted = r'"[^"\\]*(?:\\[\s\S][^"\\]*)*(?:"|\Z)'
+r_single_quoted = r"'[^'\\]*(?:\\[\s\S][^'\\]*)*(?:'|\Z)"
+triple_double_quoted = r'"""[\s\S]*?(?:"""|\Z)'
+triple_single_quoted = r"'''[\s\S]*?(?:'''|\Z)"
+character = r"'(?:[^'\\\n]|\\[^\n]+?)'"
+sql_string = r"'(?:[^']|'')*(?:'|\Z)"
+shell_comment = r"(?<![^\s;|&(){}])#[^\n]*"
+shell_single_quoted = r"'[^']*(?:'|\Z)"
+powershell_block_comment = r"<#[\s\S]*?(?:#>|\Z)"
+powershell_double_quoted = r'"(?:[^"`]|`[\s\S])*(?:"|\Z)'
+powershell_single_quoted = r"'(?:[^']|'')*(?:'|\Z)"
+
+
+def region_pattern(comments, strings):
+    # group 1 is the string literal, empty for comments
+    return re.compile(r"(?:" + "|".join(comments) + r")|(" + "|".join(strings) + r")")
+
+
+patterns = {
+    "R": region_pattern([line_comment_hash], [r_double_quoted, r_single_quoted]),
+    "Python": region_pattern([line_comment_hash], [triple_double_quoted, triple_single_quoted, double_quoted, single_quoted]),
+    "Java": region_pattern([line_comment_slashes, block_comment_c], [triple_double_quoted, double_quoted, character]),
+    "Scala": region_pattern([line_comment_slashes, block_comment_c], [triple_double_quoted, double_quoted, character]),
+    "SQL": region_pattern([line_comment_dashes, block_comment_c], [sql_string]),
+    "Shell": region_pattern([shell_comment], [double_quoted, shell_single_quoted]),
+    "PowerShell": region_pattern([powershell_block_comment, shell_comment], [powershell_double_quoted, powershell_single_quoted]),
+}
+# the regions that can span lines start with these
+multiline_openers = {
+    "Python": ('"""', "'''"),
+    "Scala": ('"""', "/*"),
+}
+# ```{r setup, echo=FALSE} ... ``` chunks of R Markdown
+rmd_chunk = re.compile(r"^[ \t]*```+[ \t]*\{[ \t]*(\w+)[^}\n]*\}[^\n]*\n(.*?)^[ \t]*```+[ \t]*$", re.MULTILINE | re.DOTALL)
+rmd_engines = {"r": "R", "sql": "SQL", "python": "Python", "scala": "Scala", "bash": "Shell", "sh": "Shell"}
+languages_by_extension = {
+    ".r": "R",
+    ".rmd": "RMD",
+    ".py": "Python",
+    ".scala": "Scala",
+    ".java": "Java",
+    ".sql": "SQL",
+    ".sh": "Shell",
+    ".zsh": "Shell",
+    ".bash": "Shell",
+    ".ps1": "PowerShell",
+}
+
+
+def language_for(extension):
+    return languages_by_extension.get(extension.lower())
+
+
+def split_code(text, language, with_strings=False):
+    """
+    Returns (code, strings) of text: the code without comments and strings, and the string literals
+    joined by newlines (None unless with_strings). Returns None for a language without a scanner.
+    """
+    if language == "RMD":
+        return split_rmd(text, with_strings)
+    pattern = patterns.get(language)
+    if pattern is None:
+        return None
+    code = pattern.sub(" ", text)
+    strings = "\n".join(pattern.findall(text)) if with_strings else None
+    return code, strings
+
+
+not_newline = re.compile(r"[^\n]")
+
+
+def blank(text):
+    return not_newline.sub(" ", text)
+
+
+def mask_code(text, language, with_strings=False):
+    """
+    Same as split_code but the texts have the length of text: comments and strings are blanked in
+    the code, everything but the string literals is blanked in the strings.
+    """
+    if language == "RMD":
+        return mask_rmd(text, with_strings)
+    pattern = patterns.get(language)
+    if pattern is None:
+        return None
+    code = []
+    strings = []
+    pos = 0
+    for match in pattern.finditer(text):
+        start, end = match.span()
+        region = text[start:end]
+        code.append(text[pos:start])
+        code.append(blank(region))
+        if with_strings:
+            strings.append(blank(text[pos:start]))
+            strings.append(region if match.group(1) is not None else blank(region))
+        pos = end
+    code.append(text[pos:])
+    if with_strings:
+        strings.append(blank(text[pos:]))
+    return "".join(code), "".join(strings) if with_strings else None
+
+
+def mask_rmd(text, with_strings=False):
+    code = []
+    strings = []
+    pos = 0
+    for match in rmd_chunk.finditer(text):
+        start, end = match.span(2)
+        code.append(blank(text[pos:start]))
+        strings.append(blank(text[pos:start]))
+        parts = mask_code(text[start:end], rmd_engines.get(match.group(1).lower()), with_strings)
+        if parts is None:
+            parts = (blank(text[start:end]), blank(text[start:end]))
+        code.append(parts[0])
+        strings.append(parts[1] if with_strings else "")
+        pos = end
+    code.append(blank(text[pos:]))
+    strings.append(blank(text[pos:]))
+    return "".join(code), "".join(strings) if with_strings else None
+
+
+def split_chunks(chunks, with_strings=False):
+    """Same as split_code for a list of (language, text), for example the cells of a notebook."""
+    code = []
+    strings = []
+    for language, text in chunks:
+        parts = split_code(text, language, with_strings)
+        if parts is not None:
+            code.append(parts[0])
+            strings.append(parts[1])
+    return "\n".join(code), "\n".join(strings) if with_strings else None
+
+
+def split_rmd(text, with_strings=False):
+    return split_chunks([(rmd_engines.get(engine.lower()), chunk) for engine, chunk in rmd_chunk.findall(text)], with_strings)
+
+
+class CodePositions:
+    """
+    Tells whether positions of a text, asked in increasing order, are in code. The regions that span
+    lines (block comments, triple quoted strings) are found ahead up to the position asked, each
+    one checked against the strings and comments of its line; for the other regions only the line
+    of the position is looked at.
+    """
+
+    def __init__(self, text, language):
+        self.text = text
+        self.pattern = patterns[language]
+        self.spans = self.multiline_spans(multiline_openers[language])
+        self.span = next(self.spans, None)
+        # end of the last region spanning lines before the position
+        self.code_start = 0
+
+    def multiline_spans(self, openers):
+        text = self.text
+        pos = 0
+        # next position of every opener, found with str.find
+        found = [text.find(opener) for opener in openers]
+        while True:
+            for index, opener in enumerate(openers):
+                if 0 <= found[index] < pos:
+                    found[index] = text.find(opener, pos)
+            start = min((position for position in found if position >= 0), default=-1)
+            if start < 0:
+                return
+            # the opener can be inside a string or a comment of its line
+            region = None
+            for region in self.pattern.finditer(text, max(text.rfind("\n", 0, start) + 1, pos)):
+                if region.end() > start:
+                    break
+            if region is None:
+                return
+            if region.start() == start:
+                yield region.span()
+            pos = region.end()
+
+    def is_code(self, pos):
+        while self.span is not None and self.span[1] <= pos:
+            self.code_start = self.span[1]
+            self.span = next(self.spans, None)
+        if self.span is not None and self.span[0] <= pos:
+            return False
+        line_start = max(self.text.rfind("\n", 0, pos) + 1, self.code_start)
+        # the other regions start and end in the line, there is none before pos when the line starts with it
+        if not self.text[line_start:pos].strip():
+            return True
+        line_end = self.text.find("\n", pos)
+        for region in self.pattern.finditer(self.text, line_start, len(self.text) if line_end < 0 else line_end):
+            if region.start() > pos:
+                break
+            if region.end() > pos:
+                return False
+        return True
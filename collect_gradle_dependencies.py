@@ -6,24 +6,28 @@ import yaml
 from rich.console import Console
 import csv
 
-def collect_dependencies(gradle_file):
+from scan_utils import SourceFile, iter_entries
+from exclusions import Exclusions, folders_from_config
+
+def collect_dependencies(gradle_file, content=None):
     dependencies = list()
     print(f"Processing file: {gradle_file}")
-    with open(gradle_file, 'r') as file:
-        content = file.read()
-        # Regex to match dependencies
-        dependency_pattern = re.compile(r"(\w+)\s+['\"](.*?):(.*?):(.*?)['\",]")
-        matches = dependency_pattern.findall(content)
-        for match in matches:
-            if len(match)==4:
-                scope, group, artifact, version = match
-                dependencies.append({"scoope":scope, "group":group.strip(), "artifact":artifact.strip(), "version":version.strip()})
-        dependency_pattern = re.compile(r"(\w+)\s+group:(.*?),\s*name:(.*?),\s*version:\s*(.*)['\",]?")
-        matches = dependency_pattern.findall(content)
-        for match in matches:
-            if len(match)==4:
-                scope, group, artifact, version = match
-                dependencies.append({"scope":scope,"group":group.strip(), "artifact":artifact.strip(), "version":version.strip()})
+    if content is None:
+        with open(gradle_file, 'r') as file:
+            content = file.read()
+    # Regex to match dependencies
+    dependency_pattern = re.compile(r"(\w+)\s+['\"](.*?):(.*?):(.*?)['\",]")
+    matches = dependency_pattern.findall(content)
+    for match in matches:
+        if len(match)==4:
+            scope, group, artifact, version = match
+            dependencies.append({"scoope":scope, "group":group.strip(), "artifact":artifact.strip(), "version":version.strip()})
+    dependency_pattern = re.compile(r"(\w+)\s+group:(.*?),\s*name:(.*?),\s*version:\s*(.*)['\",]?")
+    matches = dependency_pattern.findall(content)
+    for match in matches:
+        if len(match)==4:
+            scope, group, artifact, version = match
+            dependencies.append({"scope":scope,"group":group.strip(), "artifact":artifact.strip(), "version":version.strip()})
     return dependencies
 
 def find_gradle_files(root_dir):
@@ -36,62 +40,52 @@ def find_gradle_files(root_dir):
 
 all_dependencies = set()
 
-def process_file(gradle_file,root_path):
-    return collect_dependencies(gradle_file)
+report_path = os.path.join("Reports","gradle_dependencies.csv")
+report_fieldnames = [
+    'FileName', 'scope','group', 'artifact', 'version'
+]
+
+def process_file(gradle_file,root_path,source=None):
+    source = source or SourceFile(gradle_file)
+    return collect_dependencies(gradle_file, source.text)
     
 def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def is_excluded(name, exclude_patterns):
-    for pattern in exclude_patterns:
-        if re.search(pattern, name):
-            return True
-    return False
-
 def scan_folders(folder_config, output_csv):
     console = Console()
 
     with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = [
-            'FileName', 'scope','group', 'artifact', 'version'
-        ]
         csv.register_dialect('pipes', delimiter='|',quoting=csv.QUOTE_NONE,escapechar='\\')
-        csv_writer = csv.DictWriter(csv_file, dialect="pipes",fieldnames=fieldnames)
+        csv_writer = csv.DictWriter(csv_file, dialect="pipes",fieldnames=report_fieldnames)
         csv_writer.writeheader()
 
         for config in folder_config:
             root_path = config.get("root_path", "")
-            exclude_folders = config.get("exclude_folders", [])
-            exclude_files = config.get("exclude_files", [])
+            exclusions = Exclusions.from_config(config)
 
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
             logging.info(f"Scanning folder: {root_path}")
 
-            for folder in os.listdir(root_path):
-                folder_path = os.path.join(root_path, folder)
-                if os.path.isfile(folder_path) and not is_excluded(folder_path, exclude_files) and folder_path.endswith('.gradle'):
-                    do_file_processing(root_path,"", csv_writer, folder_path)
-                elif os.path.isdir(folder_path) and not is_excluded(folder, exclude_folders):
-                    for root, dirs, files in os.walk(folder_path):
-                        current_path = root
-                        dirs[:] = [d for d in dirs if not is_excluded(d, exclude_folders)]
-                        files = [f for f in files if not is_excluded(f, exclude_files) and f.endswith('.gradle')]
-
-                        for file in files:
-                            do_file_processing(root_path,os.path.relpath(current_path,root_path),csv_writer, file)
-
-def do_file_processing(root_path,folder_path,csv_writer, file):
-    file_path = os.path.join(root_path,folder_path, file)
+            for entry in iter_entries(root_path, exclusions):
+                if entry.path.endswith('.gradle'):
+                    do_file_processing(root_path, csv_writer, entry.path, SourceFile(entry.path, entry))
+
+def collect_rows(file_path, root_path, source=None):
+    file_info = process_file(file_path, root_path, source)
+    if file_info is not None:
+        for record in file_info:
+            record["FileName"]=file_path
+            yield record
+
+def do_file_processing(root_path, csv_writer, file_path, source=None):
     logging.info(f"Processing file: {file_path}")
 
     try:
-        file_info = process_file(file_path, root_path)
-        if file_info is not None:
-            for record in file_info:
-                record["FileName"]=file_path
-                csv_writer.writerow(record)
+        for record in collect_rows(file_path, root_path, source):
+            csv_writer.writerow(record)
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
 
@@ -105,7 +99,7 @@ def main():
 
 
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports","gradle_dependencies.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","gradle_dependencies.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -114,7 +108,7 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
 
             scan_folders(folder_config, output_csv)
 
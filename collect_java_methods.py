@@ -8,6 +8,9 @@ import csv
 import xml.etree.ElementTree as ET
 import javalang
 
+from scan_utils import SourceFile, iter_entries
+from exclusions import Exclusions, folders_from_config
+
 def is_sql_statement(input_string):
     keywords = ["SELECT", "INSERT", "UPDATE", "DELETE", "CREATE", "ALTER", "DROP"]
     for keyword in keywords:
@@ -21,9 +24,10 @@ def get_class_name(path):
             return node.name
     return "Unknown"
 
-def extract_methods_info_from_java_file(file_path):
-    with open(file_path, 'r') as file:
-        java_code = file.read()
+def extract_methods_info_from_java_file(file_path, java_code=None):
+    if java_code is None:
+        with open(file_path, 'r') as file:
+            java_code = file.read()
 
     methods_info = []
     try:
@@ -41,63 +45,53 @@ def extract_methods_info_from_java_file(file_path):
     
     return methods_info
 
-def process_file(java_file,root_path):
-    return extract_methods_info_from_java_file(java_file)
+report_path = os.path.join("Reports","java_methods.csv")
+report_fieldnames = [
+    'FileName', 'class_name','method', 'start_line', 'end_line', 'loc'
+]
+
+def process_file(java_file,root_path,source=None):
+    source = source or SourceFile(java_file)
+    return extract_methods_info_from_java_file(java_file, source.text)
     
 def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def is_excluded(name, exclude_patterns):
-    for pattern in exclude_patterns:
-        if re.search(pattern, name):
-            return True
-    return False
-
 def scan_folders(folder_config, output_csv):
     console = Console()
 
     with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
 
-        fieldnames = [
-            'FileName', 'class_name','method', 'start_line', 'end_line', 'loc'
-        ]
         csv.register_dialect('pipes', delimiter='|',quoting=csv.QUOTE_NONE,escapechar='\\')
-        csv_writer = csv.DictWriter(csv_file, dialect="pipes",fieldnames=fieldnames)
+        csv_writer = csv.DictWriter(csv_file, dialect="pipes",fieldnames=report_fieldnames)
         csv_writer.writeheader()
 
         for config in folder_config:
             root_path = config.get("root_path", "")
-            exclude_folders = config.get("exclude_folders", [])
-            exclude_files = config.get("exclude_files", [])
+            exclusions = Exclusions.from_config(config)
 
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
             logging.info(f"Scanning folder: {root_path}")
 
-            for folder in os.listdir(root_path):
-                folder_path = os.path.join(root_path, folder)
-                if os.path.isfile(folder_path) and not is_excluded(folder_path, exclude_files) and folder_path.endswith('.java'):
-                    do_file_processing(root_path,"", csv_writer, folder_path)
-                elif os.path.isdir(folder_path) and not is_excluded(folder, exclude_folders):
-                    for root, dirs, files in os.walk(folder_path):
-                        current_path = root
-                        dirs[:] = [d for d in dirs if not is_excluded(d, exclude_folders)]
-                        files = [f for f in files if not is_excluded(f, exclude_files) and f.endswith('.java')]
-
-                        for file in files:
-                            do_file_processing(root_path,os.path.relpath(current_path,root_path),csv_writer, file)
-
-def do_file_processing(root_path,folder_path,csv_writer, file):
-    file_path = os.path.join(root_path,folder_path, file)
+            for entry in iter_entries(root_path, exclusions):
+                if entry.path.endswith('.java'):
+                    do_file_processing(root_path, csv_writer, entry.path, SourceFile(entry.path, entry))
+
+def collect_rows(file_path, root_path, source=None):
+    file_info = process_file(file_path, root_path, source)
+    if file_info:
+        for record in file_info:
+            record["FileName"]=file_path
+            yield record
+
+def do_file_processing(root_path, csv_writer, file_path, source=None):
     logging.info(f"Processing file: {file_path}")
 
     try:
-        file_info = process_file(file_path, root_path)
-        if file_info:
-            for record in file_info:
-                record["FileName"]=file_path
-                csv_writer.writerow(record)
+        for record in collect_rows(file_path, root_path, source):
+            csv_writer.writerow(record)
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
 
@@ -111,7 +105,7 @@ def main():
 
 
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports","java_methods.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","java_methods.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -120,7 +114,7 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
 
             scan_folders(folder_config, output_csv)
 
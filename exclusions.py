@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""
+Exclusion rules shared by all the scanners.
+
+Every folder entry in config.yml can have `exclude_folders` and `exclude_files` lists, and the
+top level `ignore_folders` list applies to every folder:
+
+    folders:
+      - root_path: "/path/to/workload1"
+        exclude_folders: ["^test"]
+        exclude_files: ["\\.min\\.js$", "glob:src/generated/**"]
+    ignore_folders:
+      - root_path: .git
+
+Plain rules are regular expressions searched in the folder or file name (as the scanners always did).
+Rules starting with `glob:` use a gitignore-like syntax and are matched against the path relative to
+root_path: `*` and `?` stay inside one folder, `**` spans folders, a rule without a `/` matches the
+name at any depth and a rule with a `/` is anchored at root_path. `ignore_folders` entries are
+folder names.
+
+All the rules of a list are compiled once into a single regular expression. A list with a
+backreference (`(a)\\1`, `(?P=name)`) is compiled rule by rule, joining would renumber its groups.
+"""
+import re
+
+glob_prefix = "glob:"
+# \1 or (?P=name) in a rule, may also find an escaped backslash followed by a digit
+backreference = re.compile(r"\\\d|\(\?P=")
+
+
+def is_path_glob(pattern):
+    # gitignore: a rule with a '/' (other than a trailing one) is relative to the root, otherwise it matches names
+    return '/' in pattern.strip('/')
+
+
+def glob_to_regex(pattern):
+    """Translates a glob rule into a regular expression meant to be used with fullmatch."""
+    pattern = pattern.strip('/')
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            content = pattern[i + 1:end].replace('\\', '\\\\')
+            if content.startswith('!'):
+                content = '^' + content[1:]
+            parts.append(f'[{content}]')
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(parts)
+
+
+def combine(patterns, method='search'):
+    """Compiles a list of regular expressions into a single search (or fullmatch) function."""
+    if not patterns:
+        return None
+    if not any(backreference.search(pattern) for pattern in patterns):
+        try:
+            return getattr(re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)), method)
+        except re.error:
+            pass
+    # some rules can't be joined (global inline flags, backreferences), keep them compiled one by one
+    compiled = [getattr(re.compile(pattern), method) for pattern in patterns]
+    return lambda name: any(match(name) for match in compiled)
+
+
+class PathMatcher:
+    def __init__(self, rules):
+        name_patterns = []
+        name_globs = []
+        path_globs = []
+        for rule in rules:
+            if rule.startswith(glob_prefix):
+                glob = rule[len(glob_prefix):]
+                (path_globs if is_path_glob(glob) else name_globs).append(glob_to_regex(glob))
+            else:
+                name_patterns.append(rule)
+        self.search_name = combine(name_patterns)
+        self.match_name = combine(name_globs, 'fullmatch')
+        self.match_path = combine(path_globs, 'fullmatch')
+
+    def matches(self, name, rel_path):
+        """name is the folder or file name, rel_path the path relative to root_path using '/'."""
+        if self.search_name is not None and self.search_name(name):
+            return True
+        if self.match_name is not None and self.match_name(name):
+            return True
+        if self.match_path is not None and self.match_path(rel_path):
+            return True
+        return False
+
+
+def ignore_folder_names(ignore_folders):
+    names = []
+    for entry in ignore_folders or []:
+        name = entry.get("root_path", "") if isinstance(entry, dict) else str(entry)
+        if name:
+            names.append(name)
+    return names
+
+
+class Exclusions:
+    def __init__(self, exclude_folders=(), exclude_files=(), ignore_folders=()):
+        folder_rules = list(exclude_folders) + [glob_prefix + name for name in ignore_folder_names(ignore_folders)]
+        self.folders = PathMatcher(folder_rules)
+        self.files = PathMatcher(list(exclude_files))
+
+    @classmethod
+    def from_config(cls, config):
+        """config is one entry of the `folders` list, see folders_from_config."""
+        return cls(config.get("exclude_folders", []) or [],
+                   config.get("exclude_files", []) or [],
+                   config.get("ignore_folders", []) or [])
+
+    def folder_excluded(self, name, rel_path):
+        return self.folders.matches(name, rel_path)
+
+    def file_excluded(self, name, rel_path):
+        return self.files.matches(name, rel_path)
+
+
+def folders_from_config(config):
+    """Returns the `folders` entries of config.yml with the global `ignore_folders` attached to each of them."""
+    ignore_folders = config.get("ignore_folders", []) or []
+    folders = []
+    for entry in config.get("folders", []) or []:
+        entry = dict(entry)
+        entry["ignore_folders"] = list(entry.get("ignore_folders", []) or []) + list(ignore_folders)
+        folders.append(entry)
+    return folders
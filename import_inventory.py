@@ -3,57 +3,254 @@ import os
 import re
 import argparse
 import logging
-import csv
 from rich.console import Console
 import yaml
-import ast
+import io
 
-import nbformat
+from scan_utils import SourceFile, iter_entries
+from notebook_reader import notebook_of
+import code_regions
+from exclusions import Exclusions, folders_from_config
+from report_writer import open_report, output_formats
 # Regular expression to match library or require statements
 r_lib_pattern = re.compile(r'\b(?:library|require)\(([^\)]+)\)', re.IGNORECASE)
 # Regular expression to match Java import statements
 java_import_pattern = re.compile(r'\bimport\s+(static\s+)?([\w.]+)\s*;')
 
-# Define regular expressions for different import patterns in scala
-import_pattern_scala = re.compile(r'^\s*import\s+([^\s]+(\.[^\s]+)*)\s*$')
-from_import_pattern_scala = re.compile(r'^\s*import\s+([^\s]+(\.[^\s]+)*)(\.|\s)({[^}]+}|[^\s]+)\s*$')
-
-
-def extract_import_info_py(code_line, line):
-    try:
-        # Parse the code into an abstract syntax tree
-        tree = ast.parse(code_line)
-        # Iterate through the nodes in the tree
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Import):
-                # Handle "import module" statements
-                for alias in node.names:
-                    yield (alias.name, line, alias.asname, code_line, alias.name)
-
-            elif isinstance(node, ast.ImportFrom):
-                # Handle "from module import name" statements
-                module_name = node.module
-                for alias in node.names:
-                    yield (module_name + "." + alias.name, line, alias.asname, code_line, module_name)
-
-    except Exception as e:
-        yield None
-
-def extract_import_info_scala(statement, line):
-    # Check for "import" statements
-    import_match = import_pattern_scala.match(statement)
-    if import_match:
-        module_path = import_match.group(1)
-        yield (module_path,line,"",statement,module_path)
-
-    # Check for "import from" statements
-    from_import_match = from_import_pattern_scala.match(statement)
-    if from_import_match:
-        module_path = from_import_match.group(1)
-        for imp in from_import_match.group(4).strip('{}').split(','):
-            yield (imp,line,"",statement,module_path)
-
-# yields ElementName, Line, Alias, Statement, ElementPackage
+# tokens of a Scala import statement: names (`quoted` too), the symbols of the selectors, comments are skipped
+scala_token = re.compile(r"""(?P<skip>[ \t\r\f]+|//[^\n]*|/\*[\s\S]*?(?:\*/|\Z))|(?P<newline>\n)
+    |(?P<word>`[^`\n]*`|[\w$]+)|(?P<symbol>=>|\u21d2|[.,{}*;])|(?P<other>[\s\S])""", re.VERBOSE)
+scala_name = re.compile(r"`|[\w$*]")
+scala_identifier_char = re.compile(r"[\w$.]")
+scala_renames = ("=>", "\u21d2", "as")
+# one line imports, the most common ones
+scala_simple_import = re.compile(r"[ \t]+([\w$]+(?:\.[\w$]+)*?)(?:\.\{([^{}\n/`]*)\})?[ \t]*(?=\n|;|//|\}|$)")
+scala_simple_selector = re.compile(r"\s*([\w$]+|\*)\s*(?:(?:=>|\u21d2|as)\s*([\w$]+|\*))?\s*")
+# an import goes on in the next line after these tokens
+scala_continuations = (".", ",", "=>", "\u21d2", "as", "{")
+
+# import statement of Python starting at a given position: at the start of a line or after ; or :
+py_import_statement = re.compile(r"""[ \t]*(?P<keyword>
+    from[ \t]+(?P<module>\.*[\w.]*)[ \t]*(?<=[\s.])import\b(?P<from_names>[ \t]*\([^)]*\)?|(?:[^\n;\\\#]|\\\n)*)
+    |import\b(?P<names>(?:[^\n;\\\#]|\\\n)*))""", re.VERBOSE)
+py_import_name = re.compile(r"([\w.]+|\*)(?:\s+as\s+(\w+))?")
+py_comment = re.compile(r"#[^\n]*")
+py_statement_separator = re.compile(r"[;:]")
+
+# notebook cells: %run and %pip magics are reported as imports, %scala, %%sql... change the language of the cell
+import_magic = re.compile(r"^[ \t]*%(run|pip)\b([^\n]*)", re.MULTILINE)
+language_magic = re.compile(r"\s*%%?(\w+)")
+cell_extensions = {"python": ".py", "pyspark": ".py", "scala": ".scala", "spark": ".scala", "r": ".r", "java": ".java"}
+dbx_comment_prefixes = {".py": "#", ".r": "#", ".scala": "//"}
+pip_value_options = {"-r", "--requirement", "-c", "--constraint", "-e", "--editable", "-i", "--index-url",
+                     "--extra-index-url", "-f", "--find-links", "-t", "--target"}
+pip_requirement_name = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+
+def import_element(module_name, name):
+    # "from . import x" is ".x", "from ..pkg import y" is "..pkg.y"
+    return module_name + name if module_name.endswith(".") else module_name + "." + name
+
+def import_names(names):
+    # (name, alias) of "a.b as c, d" without the comments and the line continuations
+    return py_import_name.findall(py_comment.sub("", names).replace("\\\n", " "))
+
+def import_statements_py(text):
+    """
+    Yields the match of every import statement of a Python file, in the order of the file.
+    Only the lines with "import" are looked at, the statements inside a string or a comment are dropped.
+    """
+    positions = None
+    done = 0
+    hit = text.find("import")
+    while hit >= 0:
+        line_start = text.rfind("\n", 0, hit) + 1
+        line_end = text.find("\n", hit)
+        if line_end < 0:
+            line_end = len(text)
+        if line_start >= done:
+            # the statements start at the start of the line or after a ; or a :
+            starts = [line_start] + [separator.end() for separator in py_statement_separator.finditer(text, line_start, line_end)]
+            for start in starts:
+                if start < done:
+                    continue
+                match = py_import_statement.match(text, start)
+                if match is None:
+                    continue
+                if positions is None:
+                    positions = code_regions.CodePositions(text, "Python")
+                if not positions.is_code(match.start("keyword")):
+                    continue
+                done = match.end()
+                yield match
+            done = max(done, line_end)
+        hit = text.find("import", max(done, hit + 1))
+
+def statement_lines(text, start, end):
+    # the whole lines of the statement between start and end
+    line_end = text.find("\n", end)
+    return text[text.rfind("\n", 0, start) + 1:len(text) if line_end < 0 else line_end + 1]
+
+def extract_imports_py(text):
+    """
+    Yields (ElementName, Line, Alias, Statement, ElementPackage) of every import of a Python file:
+    multi-line and relative imports, and the imports inside functions or if/try blocks.
+    The file is scanned once and Python 2 files, which do not parse with ast, are handled the same.
+    """
+    line = 0
+    pos = 0
+    for match in import_statements_py(text):
+        # lines are counted from 0 like in the other languages of the report
+        line += text.count("\n", pos, match.start())
+        pos = match.start()
+        statement = statement_lines(text, match.start(), match.end())
+        if match.group("names") is not None:
+            for name, alias in import_names(match.group("names")):
+                yield (name, line, alias or None, statement, name)
+        else:
+            module_name = match.group("module")
+            for name, alias in import_names(match.group("from_names")):
+                yield (import_element(module_name, name), line, alias or None, statement, module_name)
+
+def scala_statement_tokens(text, pos):
+    """
+    (token, line offset) of the import clauses that start at pos, and the end of the statement. It
+    ends at a ; or a newline outside braces, unless the line ends with a dot, a comma or an arrow.
+    Comments are skipped, the newlines inside them are counted.
+    """
+    tokens = []
+    line = 0
+    depth = 0
+    end = pos
+    for match in scala_token.finditer(text, pos):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == "skip":
+            line += value.count("\n")
+            continue
+        if kind == "newline":
+            line += 1
+            if depth == 0 and tokens and tokens[-1][0] not in scala_continuations:
+                break
+            continue
+        if depth == 0 and value in (";", "}"):
+            break
+        if kind == "other":
+            break
+        depth += 1 if value == "{" else -1 if value == "}" else 0
+        tokens.append((value, line))
+        end = match.end()
+    return tokens, end
+
+def parse_import_scala(tokens):
+    """(package, name, alias, line offset) of the import clauses "a.b.C", "a.b._", "a.{B, C => D}", "a.B as C", ..."""
+    imports = []
+    size = len(tokens)
+    i = 0
+    while i < size:
+        path = []
+        while i < size and scala_name.match(tokens[i][0]):
+            path.append(tokens[i])
+            i += 1
+            if i < size and tokens[i][0] == ".":
+                i += 1
+            else:
+                break
+        package = ".".join(name for name, _ in path)
+        if i < size and tokens[i][0] == "{":
+            i += 1
+            while i < size and tokens[i][0] != "}":
+                name, line = tokens[i]
+                alias = ""
+                i += 1
+                if i + 1 < size and tokens[i][0] in scala_renames:
+                    alias = tokens[i + 1][0]
+                    i += 2
+                # "A => _" hides A, it is not imported
+                if alias != "_" and scala_name.match(name):
+                    imports.append((package, name, alias, line))
+                if i < size and tokens[i][0] == ",":
+                    i += 1
+                elif i < size and tokens[i][0] != "}":
+                    return imports
+            i += 1
+        elif path:
+            alias = ""
+            if i + 1 < size and tokens[i][0] == "as":
+                alias = tokens[i + 1][0]
+                i += 2
+            name, line = path[-1]
+            imports.append((".".join(name for name, _ in path[:-1]), name, alias, line))
+        else:
+            return imports
+        if i < size and tokens[i][0] == ",":
+            i += 1
+        else:
+            return imports
+    return imports
+
+def simple_import_scala(text, pos):
+    """
+    (imports, end) of the one line imports "a.b.C", "a.b._" and "a.b.{C, D => E}" with a regular
+    expression, most of the imports of a file; (None, pos) for the others, left to the tokens.
+    """
+    match = scala_simple_import.match(text, pos)
+    if match is None:
+        return None, pos
+    path, selectors = match.groups()
+    if selectors is None:
+        package, _, name = path.rpartition(".")
+        return [(package, name, "", 0)], match.end()
+    imports = []
+    for selector in selectors.split(","):
+        parts = scala_simple_selector.fullmatch(selector)
+        if parts is None:
+            return None, pos
+        # "A => _" hides A, it is not imported
+        if parts.group(2) != "_":
+            imports.append((path, parts.group(1), parts.group(2) or "", 0))
+    return imports, match.end()
+
+def extract_imports_scala(text):
+    """
+    Yields (ElementName, Line, Alias, Statement, ElementPackage) of every import of a Scala file, one
+    per imported name: "import a.{B, C => D}" gives a.B and a.C with alias D. The statements can span
+    lines and several of them can share a line. Only the lines with "import" are looked at, the
+    ones inside a string or a comment are dropped.
+    """
+    positions = None
+    line = 0
+    counted = 0
+    hit = text.find("import")
+    while hit >= 0:
+        after = hit + len("import")
+        # a statement: "import" as a word, first on its line or after a ; or a brace, the comments
+        # before it on the line skipped ("/* ... */ import a.b")
+        before = text[text.rfind("\n", 0, hit) + 1:hit].rstrip()
+        if before.endswith("*/"):
+            before = code_regions.split_code(before, "Scala")[0].rstrip()
+            # a comment opened on a line above ends on this one
+            before = before[before.rfind("*/") + 2:].rstrip() if "*/" in before else before
+        if ((hit == 0 or not scala_identifier_char.match(text, hit - 1)) and not scala_identifier_char.match(text, after)
+                and (not before or before[-1] in ";{}")):
+            if positions is None:
+                positions = code_regions.CodePositions(text, "Scala")
+            if positions.is_code(hit):
+                imports, end = simple_import_scala(text, after)
+                if imports is None:
+                    tokens, end = scala_statement_tokens(text, after)
+                    imports = parse_import_scala(tokens)
+                if imports:
+                    line += text.count("\n", counted, hit)
+                    counted = hit
+                    statement = statement_lines(text, hit, end)
+                    for package, name, alias, offset in imports:
+                        element = package + "." + name if package else name
+                        yield (element, line + offset, alias, statement, package)
+                after = max(after, end)
+        hit = text.find("import", after)
+
+# yields ElementName, Line, Alias, Statement, ElementPackage of an R or Java line
 def collect_import_info(extension,statement, line):
     if extension == ".r":
         match = r_lib_pattern.match(statement)
@@ -69,147 +266,231 @@ def collect_import_info(extension,statement, line):
             elementpackage = ""
             elementname = import_statement[1]
             yield (elementname,line,alias,statement,elementpackage)
-    elif extension == ".py":
-        if "import " in statement:
-            yield from extract_import_info_py(statement, line)
-    elif extension == ".scala":
-        if "import " in statement:
-            yield from extract_import_info_scala(statement, line)
-
-def analyze_jupyter_notebook(file_path):
-    # Read the Jupyter notebook
-    with open(file_path, 'r', encoding='utf-8') as f:
-        notebook_content = nbformat.read(f, as_version=4)
-
-    # Initialize counters
-    total_cells = 0
-    total_blank_lines = 0
-    total_comment_lines = 0
-    total_code_lines = 0
-
-    # Iterate through each cell in the notebook
-    for cell in notebook_content['cells']:
-        total_cells += 1
-
-        # Get the source code of the cell
-        source_code = cell['source']
-
-        # Split the source code into lines
-        lines = source_code.split('\n')
-
-        # Count the number of blank lines, comment lines, and code lines
-        blank_lines = sum(1 for line in lines if not line.strip())
-        comment_lines = sum(1 for line in lines if line.strip().startswith('#'))
-        code_lines = len(lines) - blank_lines - comment_lines
-
-        # Update the total counters
-        total_blank_lines += blank_lines
-        total_comment_lines += comment_lines
-        total_code_lines += code_lines
-
-    # Return the results
-    return {
-        'total_cells': total_cells,
-        'total_blank_lines': total_blank_lines,
-        'total_comment_lines': total_comment_lines,
-        'total_code_lines': total_code_lines
-    }
+
+def text_import_info(extension, text):
+    # Python and Scala code is scanned whole, the other languages are matched line by line
+    if extension == ".py":
+        yield from extract_imports_py(text)
+        return
+    if extension == ".scala":
+        yield from extract_imports_scala(text)
+        return
+    for i, line in enumerate(io.StringIO(text).readlines()):
+        yield from collect_import_info(extension, line, i)
+
+def pip_packages(arguments):
+    # the requirements of "install [options] pkg==1.0 other[extra]", the options and their values are skipped
+    words = [word.strip("'\"") for word in arguments.split()]
+    if not words or words[0] != "install":
+        return
+    skip = False
+    for word in words[1:]:
+        if skip:
+            skip = False
+        elif word.startswith("-"):
+            skip = word in pip_value_options
+        else:
+            name = pip_requirement_name.match(word)
+            if name:
+                yield name.group()
+
+def magic_import_info(text):
+    """Yields ((ElementName, Line, Alias, Statement, ElementPackage), Kind) of the %run and %pip lines of a cell."""
+    for match in import_magic.finditer(text):
+        line = text.count("\n", 0, match.start())
+        statement = match.group()
+        if match.group(1) == "run":
+            target = match.group(2).split()
+            if target:
+                yield (target[0].strip("'\""), line, "", statement, ""), "%run"
+        else:
+            for package in pip_packages(match.group(2)):
+                yield (package, line, "", statement, package), "%pip"
+
+def cell_language(text, extension):
+    """(extension, text) of a notebook cell: a %scala, %%sql... first line changes the language and is removed (the line is kept empty)."""
+    magic = language_magic.match(text)
+    if magic is None or magic.group(1) in ("run", "pip"):
+        return extension, text
+    end = text.find("\n", magic.end())
+    code = "\n" * text.count("\n", 0, magic.start(1)) + (text[end:] if end >= 0 else "")
+    return cell_extensions.get(magic.group(1).lower()), code
+
+def notebook_cells(source):
+    # (cell id, extension, text) of the code cells of a Jupyter notebook
+    notebook = notebook_of(source)
+    extension = cell_extensions.get((notebook.language or "python").lower())
+    for cell_id, cell in enumerate(notebook.cells):
+        if cell.cell_type == "code":
+            yield (cell_id,) + cell_language(cell.source, extension)
+
+def dbx_cells(extension, text):
+    """
+    (cell id, extension, text) of the cells of a Databricks source export ("# Databricks notebook source"
+    first line, "# COMMAND ----------" between cells), None for any other file. Lines starting with
+    "# MAGIC" are cells in another language, the prefix is removed.
+    """
+    prefix = dbx_comment_prefixes.get(extension)
+    if prefix is None or not text.startswith(prefix + " Databricks notebook source"):
+        return None
+    return iter_dbx_cells(extension, text, prefix)
+
+def remove_prefix(line, prefix):
+    # "# MAGIC %sql" is "%sql", "# MAGIC" alone an empty line
+    if line.startswith(prefix):
+        line = line[len(prefix):]
+        return line[1:] if line.startswith(" ") else line
+    return line
+
+def iter_dbx_cells(extension, text, prefix):
+    separator = prefix + " COMMAND ----------"
+    magic = prefix + " MAGIC"
+    cell_id = 0
+    lines = []
+    # the header line is not part of the first cell
+    for line in io.StringIO(text).readlines()[1:] + [separator]:
+        if line.rstrip() != separator:
+            lines.append(line)
+            continue
+        # the export writes an empty line after every separator
+        if cell_id and lines and not lines[0].strip():
+            lines = lines[1:]
+        if lines and all(line.startswith(magic) or not line.strip() for line in lines):
+            yield (cell_id,) + cell_language("".join(remove_prefix(line, magic) for line in lines), extension)
+        else:
+            yield cell_id, extension, "".join(lines)
+        cell_id += 1
+        lines = []
+
+def file_import_info(extension, source):
+    """
+    Yields ((ElementName, Line, Alias, Statement, ElementPackage), CellId, Kind) of a file. In notebooks
+    and Databricks source exports the code of every cell is scanned in its language, the line is
+    counted from the start of the cell and the %run and %pip magics are reported too.
+    """
+    if extension == ".ipynb":
+        cells = notebook_cells(source)
+    else:
+        cells = dbx_cells(extension, source.text)
+    if cells is None:
+        for info in text_import_info(extension, source.text):
+            yield info, None, ""
+        return
+    for cell_id, cell_extension, text in cells:
+        found = [(info, kind) for info, kind in magic_import_info(text)]
+        if cell_extension:
+            found.extend((info, "") for info in text_import_info(cell_extension, text))
+        found.sort(key=lambda item: item[0][1])
+        for info, kind in found:
+            yield info, cell_id, kind
 
 def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-def is_excluded(name, exclude_patterns):
-    for pattern in exclude_patterns:
-        if re.search(pattern, name):
-            return True
-    return False
+text_files = ('.rmd','.r','.R', '.py', '.scala', '.java', '.ipynb')
 
-text_files = ('.rmd','.r','.R', '.py', '.scala', '.java')
+report_path = os.path.join("Reports","ImportUsagesInventory.csv")
+report_fieldnames = [
+    "Element","ProjectId","FileId","Count","Alias",
+    "Kind","Line","PackageName","Supported","Automated","Status",
+    "Statement","SessionId","SnowConvertCoreVersion","SnowparkVersion","ElementPackage","CellId"
+]
+# CellId is the index of the cell in notebooks and Databricks source exports, Line is then counted from the start of the cell
+report_types = {"Line": "int64", "CellId": "int64"}
+# with aggregate, Count is the number of imports instead of "1"
+aggregated_types = dict(report_types, Count="int64")
 
-def process_file(file_path,root):
+def process_file(file_path,root,source=None,aggregate=False):
     imports_info = []
     try:
-        if os.path.isfile(file_path):
+        source = source or SourceFile(file_path)
+        if source.is_file():
             
             # Process code files for lines of code and comments
             if file_path.endswith(text_files):
-                rel_path = file_path[len(root):]
                 filename, extension = os.path.splitext(os.path.basename(file_path))
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    for i, line in enumerate(lines):
-                        for info in collect_import_info(extension.lower(),line,i):
-                            if info:
-                                Element, Line, Alias, Statement, ElementPackage = info
-                                imports_info.append(
-                                    {
-                                        "Element":Element,
-                                        "ProjectId":"ProjectId",
-                                        "FileId":file_path,
-                                        "Count":"1",
-                                        "Alias":Alias,
-                                        "Kind":"",
-                                        "Line":Line,
-                                        "PackageName":ElementPackage,
-                                        "Supported":"",
-                                        "Automated":"",
-                                        "Status":"",
-                                        "Statement":Statement,
-                                        "SessionId":"",
-                                        "SnowConvertCoreVersion":"",
-                                        "SnowparkVersion":"",
-                                        "ElementPackage":""
-                                    }
-                                )
+                if aggregate:
+                    return aggregated_rows(file_path, file_import_info(extension.lower(), source))
+                for info, cell_id, kind in file_import_info(extension.lower(), source):
+                    if info:
+                        Element, Line, Alias, Statement, ElementPackage = info
+                        imports_info.append(
+                            {
+                                "Element":Element,
+                                "ProjectId":"ProjectId",
+                                "FileId":file_path,
+                                "Count":"1",
+                                "Alias":Alias,
+                                "Kind":kind,
+                                "Line":Line,
+                                "PackageName":ElementPackage,
+                                "Supported":"",
+                                "Automated":"",
+                                "Status":"",
+                                "Statement":Statement,
+                                "SessionId":"",
+                                "SnowConvertCoreVersion":"",
+                                "SnowparkVersion":"",
+                                "ElementPackage":"",
+                                "CellId":cell_id
+                            }
+                        )
             
             return imports_info
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
         return None
 
-def scan_folders(folder_config, output_csv):
+def aggregated_rows(file_path, imports):
+    """
+    One row per (Element, PackageName, Kind) of a file with the number of imports in Count, in the
+    order of their first import, so a %pip install and an import of the same package stay apart.
+    The rows of a file are written together, so counting them per file is the same as counting
+    (Element, PackageName, Kind, FileId) over the whole scan.
+    """
+    counts = {}
+    for (element, _, _, _, package), _, kind in imports:
+        key = (element, package, kind)
+        counts[key] = counts.get(key, 0) + 1
+    return [
+        {
+            "Element":element,
+            "ProjectId":"ProjectId",
+            "FileId":file_path,
+            "Count":count,
+            "Kind":kind,
+            "PackageName":package,
+        }
+        for (element, package, kind), count in counts.items()
+    ]
+
+def scan_folders(folder_config, output_csv, output_format="csv", aggregate=False):
     console = Console()
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = [
-            "Element","ProjectId","FileId","Count","Alias",
-            "Kind","Line","PackageName","Supported","Automated","Status",
-            "Statement","SessionId","SnowConvertCoreVersion","SnowparkVersion","ElementPackage"
-        ]
-        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        csv_writer.writeheader()
+    with open_report(output_csv, report_fieldnames, output_format, column_types=aggregated_types if aggregate else report_types) as csv_writer:
 
         for config in folder_config:
             root_path = config.get("root_path", "")
-            exclude_folders = config.get("exclude_folders", [])
-            exclude_files = config.get("exclude_files", [])
+            exclusions = Exclusions.from_config(config)
 
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
             logging.info(f"Scanning folder: {root_path}")
 
-            for folder in os.listdir(root_path):
-                folder_path = os.path.join(root_path, folder)
-                if os.path.isfile(folder_path) and not is_excluded(folder_path, exclude_files):
-                    do_file_processing(root_path,"", csv_writer, folder_path)
-                elif os.path.isdir(folder_path) and not is_excluded(folder, exclude_folders):
-                    for root, dirs, files in os.walk(folder_path):
-                        current_path = root
-                        dirs[:] = [d for d in dirs if not is_excluded(d, exclude_folders)]
-                        files = [f for f in files if not is_excluded(f, exclude_files)]
-
-                        for file in files:
-                            do_file_processing(root_path,os.path.relpath(current_path,root_path),csv_writer, file)
-
-def do_file_processing(root_path,folder_path,csv_writer, file):
-    file_path = os.path.join(root_path,folder_path, file)
+            for entry in iter_entries(root_path, exclusions):
+                do_file_processing(root_path, csv_writer, entry.path, SourceFile(entry.path, entry), aggregate)
+
+def collect_rows(file_path, root_path, source=None, aggregate=False):
+    imports_info = process_file(file_path, root_path, source, aggregate)
+    if imports_info is not None:
+        yield from imports_info
+
+def do_file_processing(root_path, csv_writer, file_path, source=None, aggregate=False):
     logging.info(f"Processing file: {file_path}")
 
     try:
-        imports_info = process_file(file_path, root_path)
-        if imports_info is not None:
-            for import_detail in imports_info:
-                csv_writer.writerow(import_detail)
+        for import_detail in collect_rows(file_path, root_path, source, aggregate):
+            csv_writer.writerow(import_detail)
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
 
@@ -218,11 +499,13 @@ def main():
     parser.add_argument("config_file",   help="Path to the YAML configuration file")
     parser.add_argument("output_folder", help="Folder for all the tool output")
     #parser.add_argument("output_csv", help="Path to the output CSV file",default="ImportUsagesInventory.csv")
+    parser.add_argument("--output-format", choices=output_formats, default="csv", help="Format of the report: csv (default), parquet or arrow")
+    parser.add_argument("--aggregate", action="store_true", help="Write one row per element, package, kind and file with the number of imports in Count")
 
     args = parser.parse_args()
     output_folder = args.output_folder
 
-    output_csv = os.path.join(output_folder, "Reports","ImportUsagesInventory.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","imports_scanner.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -231,9 +514,9 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
 
-            scan_folders(folder_config, output_csv)
+            scan_folders(folder_config, output_csv, args.output_format, args.aggregate)
 
     except FileNotFoundError:
         print(f"Error: Configuration file '{args.config_file}' not found.")
@@ -1,18 +1,25 @@
 #!/usr/bin/python3
 import os
-import re
 import argparse
 import logging
-import csv
 from rich.console import Console
 import yaml
 
-import nbformat
-
-def analyze_jupyter_notebook(file_path):
-    # Read the Jupyter notebook
-    with open(file_path, 'r', encoding='utf-8') as f:
-        notebook_content = nbformat.read(f, as_version=4)
+from scan_utils import SourceFile, iter_entries, ordered_map
+from exclusions import Exclusions, folders_from_config
+from report_writer import open_report, output_formats
+from line_counter import count_lines, count_file_lines, block_comments_by_extension
+from notebook_reader import read_notebook, notebook_of
+
+def analyze_jupyter_notebook(file_path, content=None, source=None):
+    # Read the Jupyter notebook, only the cell sources are decoded
+    if source is not None:
+        notebook_content = notebook_of(source)
+    else:
+        if content is None:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        notebook_content = read_notebook(content)
 
     # Initialize counters
     total_cells = 0
@@ -21,11 +28,11 @@ def analyze_jupyter_notebook(file_path):
     total_code_lines = 0
 
     # Iterate through each cell in the notebook
-    for cell in notebook_content['cells']:
+    for cell in notebook_content.cells:
         total_cells += 1
 
         # Get the source code of the cell
-        source_code = cell['source']
+        source_code = cell.source
 
         # Split the source code into lines
         lines = source_code.split('\n')
@@ -52,12 +59,6 @@ def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-def is_excluded(name, exclude_patterns):
-    for pattern in exclude_patterns:
-        if re.search(pattern, name):
-            return True
-    return False
-
 def map_technology(extension):
     technology_mappings = {
         '.r': 'R',
@@ -96,13 +97,55 @@ line_comments_by_extension = {
     ".ps1":"#",
     ".sql":"--"
 }
-def process_file(file_path,root):
+# files bigger than this are counted in chunks from disk unless another collector already loaded them,
+# or will (stream=False, assessment.py: the keywords and the imports read every text file whole)
+stream_threshold = 64 * 1024 * 1024
+# encodings where the newline and the comment marks are the same bytes as in ascii
+byte_encodings = ('utf-8', 'utf-8-sig', 'latin-1')
+
+def count_source_lines(source, extension, stream=True):
+    """
+    Returns code, comment and blank lines. Comment lines are None for the extensions without a known comment mark.
+    With stream=False big files are loaded in source like the small ones, for the collectors that follow.
+    """
+    if extension in line_comments_by_extension:
+        line_comment = line_comments_by_extension[extension]
+        blocks = block_comments_by_extension.get(extension, ())
+    else:
+        line_comment = "#"
+        blocks = ()
+    if source.encoding not in byte_encodings:
+        # the counter works on bytes where a newline is b"\n", utf-16/utf-32 text is converted first
+        code_lines, comment_lines, blank_lines = count_lines(source.text.encode('utf-8'), line_comment, blocks)
+    elif source.is_loaded or not stream or source.size < stream_threshold:
+        data = source.data
+        if source.encoding == 'utf-8-sig':
+            data = data[3:]
+        code_lines, comment_lines, blank_lines = count_lines(data, line_comment, blocks)
+    else:
+        offset = 3 if source.encoding == 'utf-8-sig' else 0
+        code_lines, comment_lines, blank_lines = count_file_lines(source.path, line_comment, blocks, offset=offset)
+    if extension not in line_comments_by_extension:
+        comment_lines = None
+    return code_lines, comment_lines, blank_lines
+
+report_path = os.path.join("Reports","GenericScanner","GenericScannerOutput","FilesInventory.csv")
+report_fieldnames = [
+    'FileName', 'Extension', 'Technology', 'Status', 'isBinary',
+    'Bytes', 'ContentType', 'ContentLines', 'CommentLines', 'BlankLines'
+]
+# column types for the parquet/arrow reports, the other columns are strings
+report_types = {'isBinary': 'bool_', 'Bytes': 'int64', 'ContentLines': 'int64', 'CommentLines': 'int64', 'BlankLines': 'int64'}
+
+def process_file(file_path,root,source=None,stream=True):
     try:
-        if os.path.isfile(file_path):
+        source = source or SourceFile(file_path)
+        if source.is_file():
             # Extract file information
             filename, extension = os.path.splitext(os.path.basename(file_path))
-            is_binary = not bool(re.search(r'\.txt$|\.text$|\.md$|\.json$', extension, re.IGNORECASE))
-            byte_size = os.path.getsize(file_path)
+            # decided from the first bytes of the file, binary files are never read whole
+            is_binary = source.is_binary
+            byte_size = source.size
 
             # Determine technology based on file extension
             technology = map_technology(extension)
@@ -110,24 +153,13 @@ def process_file(file_path,root):
             # Initialize variables for code lines, comment lines, and blank lines
             code_lines, comment_lines, blank_lines = 0, 0, 0
             if file_path.endswith(".ipynb"):
-                data = analyze_jupyter_notebook(file_path)
+                data = analyze_jupyter_notebook(file_path, source=source)
                 code_lines = data['total_code_lines']
                 comment_lines = data['total_comment_lines']
                 blank_lines  = data['total_blank_lines']
             # Process code files for lines of code and comments
-            if file_path.endswith(text_files):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                    if extension in line_comments_by_extension:
-                        line_comment_mark = line_comments_by_extension[extension]
-                        code_lines = sum(1 for line in lines if line.strip() and not line.strip().startswith(line_comment_mark))
-                        comment_lines = sum(1 for line in lines if line.strip().startswith(line_comment_mark))
-                        blank_lines = sum(1 for line in lines if not line.strip())
-                    else:
-                        line_comment_mark = "#"
-                        code_lines = sum(1 for line in lines if line.strip() and not line.strip().startswith(line_comment_mark))
-                        comment_lines = None
-                        blank_lines = sum(1 for line in lines if not line.strip())
+            if file_path.endswith(text_files) and not is_binary:
+                code_lines, comment_lines, blank_lines = count_source_lines(source, extension, stream)
             rel_path = file_path[len(root):]
             return {
                 'FileName': file_path,
@@ -145,59 +177,56 @@ def process_file(file_path,root):
         logging.error(f"Error processing file: {file_path} - {e}")
         return None
 
-def scan_folders(folder_config, output_csv):
+def collect_rows(file_path, root_path, source=None, stream=True):
+    file_info = process_file(file_path, root_path, source, stream)
+    if file_info is not None:
+        yield file_info
+
+def list_files(folder_config, console, with_entries=False):
+    for config in folder_config:
+        root_path = config.get("root_path", "")
+        exclusions = Exclusions.from_config(config)
+
+        console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
+        logging.info(f"Scanning folder: {root_path}")
+
+        for entry in iter_entries(root_path, exclusions):
+            # DirEntry objects cannot be sent to the worker processes
+            yield (entry.path, root_path, entry) if with_entries else (entry.path, root_path)
+
+def scan_folders(folder_config, output_csv, workers=1, log_file=None, output_format="csv"):
     console = Console()
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = [
-            'FileName', 'Extension', 'Technology', 'Status', 'isBinary',
-            'Bytes', 'ContentType', 'ContentLines', 'CommentLines', 'BlankLines'
-        ]
-        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        csv_writer.writeheader()
-
-        for config in folder_config:
-            root_path = config.get("root_path", "")
-            exclude_folders = config.get("exclude_folders", [])
-            exclude_files = config.get("exclude_files", [])
-
-            console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
-            logging.info(f"Scanning folder: {root_path}")
-
-            for folder in os.listdir(root_path):
-                folder_path = os.path.join(root_path, folder)
-                if os.path.isfile(folder_path) and not is_excluded(folder_path, exclude_files):
-                    do_file_processing(root_path,"", csv_writer, folder_path)
-                elif os.path.isdir(folder_path) and not is_excluded(folder, exclude_folders):
-                    for root, dirs, files in os.walk(folder_path):
-                        current_path = root
-                        dirs[:] = [d for d in dirs if not is_excluded(d, exclude_folders)]
-                        files = [f for f in files if not is_excluded(f, exclude_files)]
-
-                        for file in files:
-                            do_file_processing(root_path,os.path.relpath(current_path,root_path),csv_writer, file)
-
-def do_file_processing(root_path,folder_path,csv_writer, file):
-    file_path = os.path.join(root_path,folder_path, file)
+    with open_report(output_csv, report_fieldnames, output_format, column_types=report_types) as csv_writer:
+
+        # files can be processed by several workers but only this process writes to the csv,
+        # results come back in walk order so the output is the same as a serial run
+        files = list_files(folder_config, console, with_entries=workers <= 1)
+        initializer = setup_logging if log_file else None
+        for rows in ordered_map(do_file_processing, files, workers, initializer=initializer, initargs=(log_file,)):
+            csv_writer.writerows(rows)
+
+def do_file_processing(file_path, root_path, entry=None):
     logging.info(f"Processing file: {file_path}")
 
     try:
-        file_info = process_file(file_path, root_path)
-        if file_info is not None:
-            csv_writer.writerow(file_info)
+        return list(collect_rows(file_path, root_path, SourceFile(file_path, entry)))
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
+        return []
 
 def main():
     parser = argparse.ArgumentParser(description="Scan folders based on YAML configuration to collect general metrics and generate CSV.")
     parser.add_argument("config_file", help="Path to the YAML configuration file")
     parser.add_argument("output_folder", help="Folder for all the tool output")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to process the files (default 1)")
+    parser.add_argument("--output-format", choices=output_formats, default="csv", help="Format of the report: csv (default), parquet or arrow")
 
     args = parser.parse_args()
 
 
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports","GenericScanner","GenericScannerOutput","FilesInventory.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","files_inventory.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -206,9 +235,9 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
 
-            scan_folders(folder_config, output_csv)
+            scan_folders(folder_config, output_csv, args.workers, log_file, args.output_format)
 
     except FileNotFoundError:
         print(f"Error: Configuration file '{args.config_file}' not found.")
@@ -0,0 +1,160 @@
+#!/usr/bin/python3
+"""
+Index of the keyword occurrences found by keywords.py (`keywords.py --index <file>` or
+`assessment.py --keyword-index <file>`). It is a SQLite file with three tables:
+
+- files(id, path, technology)
+- keywords(id, name)
+- occurrences(file_id, keyword_id, line, column, in_string)
+
+Lines and columns start at 1. In notebooks the line is counted over the sources of all the cells,
+one after the other. in_string is 1 for the matches inside string literals, only recorded when
+count_keywords_in_strings is set.
+
+It answers where a keyword is used without scanning the estate again:
+
+    python3 keyword_index.py index.db where from_utc_timestamp
+    python3 keyword_index.py index.db top from_utc_timestamp --limit 10
+    python3 keyword_index.py index.db keywords
+"""
+import os
+import sqlite3
+import argparse
+
+report_fieldnames = ['File', 'Technology', 'Keyword', 'Line', 'Column', 'InString']
+
+
+class KeywordIndex:
+    """
+    Writes an index from rows with the report_fieldnames keys. It has the writerow/writerows
+    interface of the report writers, so it can take the place of a report in assessment.py.
+    """
+
+    def __init__(self, path, batch_rows=65536):
+        # every run writes a new index
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.batch_rows = batch_rows
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT, technology TEXT)")
+        self.connection.execute("CREATE TABLE keywords (id INTEGER PRIMARY KEY, name TEXT)")
+        self.connection.execute("CREATE TABLE occurrences (file_id INTEGER, keyword_id INTEGER, line INTEGER, column INTEGER, in_string INTEGER)")
+        self.files = {}
+        self.keywords = {}
+        self.pending = []
+
+    def file_id(self, path, technology):
+        file_id = self.files.get(path)
+        if file_id is None:
+            file_id = self.files[path] = len(self.files) + 1
+            self.connection.execute("INSERT INTO files VALUES (?, ?, ?)", (file_id, path, technology))
+        return file_id
+
+    def keyword_id(self, name):
+        keyword_id = self.keywords.get(name)
+        if keyword_id is None:
+            keyword_id = self.keywords[name] = len(self.keywords) + 1
+            self.connection.execute("INSERT INTO keywords VALUES (?, ?)", (keyword_id, name))
+        return keyword_id
+
+    def writerow(self, row):
+        self.pending.append((self.file_id(row['File'], row.get('Technology')), self.keyword_id(row['Keyword']),
+                             row['Line'], row['Column'], int(bool(row.get('InString')))))
+        if len(self.pending) >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        self.connection.executemany("INSERT INTO occurrences VALUES (?, ?, ?, ?, ?)", self.pending)
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        # built at the end, it is faster than keeping them up to date on every insert
+        self.connection.execute("CREATE INDEX occurrences_by_keyword ON occurrences (keyword_id, file_id)")
+        self.connection.execute("CREATE UNIQUE INDEX keywords_by_name ON keywords (name)")
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def keyword_id(connection, name):
+    row = connection.execute("SELECT id FROM keywords WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def where_used(connection, name, limit=None):
+    """(path, line, column, in_string) of every occurrence of a keyword, by path and position."""
+    return connection.execute("""
+        SELECT files.path, occurrences.line, occurrences.column, occurrences.in_string
+        FROM occurrences JOIN files ON files.id = occurrences.file_id
+        WHERE occurrences.keyword_id = ?
+        ORDER BY files.path, occurrences.line, occurrences.column
+        LIMIT ?""", (keyword_id(connection, name), -1 if limit is None else limit)).fetchall()
+
+
+def top_files(connection, name, limit=20):
+    """(path, technology, occurrences) of the files that use a keyword the most."""
+    return connection.execute("""
+        SELECT files.path, files.technology, counts.total
+        FROM (SELECT file_id, COUNT(*) AS total FROM occurrences WHERE keyword_id = ? GROUP BY file_id) AS counts
+        JOIN files ON files.id = counts.file_id
+        ORDER BY counts.total DESC, files.path
+        LIMIT ?""", (keyword_id(connection, name), limit)).fetchall()
+
+
+def keyword_totals(connection):
+    """(keyword, occurrences, files) for every keyword of the index."""
+    return connection.execute("""
+        SELECT keywords.name, counts.total, counts.files
+        FROM (SELECT keyword_id, COUNT(*) AS total, COUNT(DISTINCT file_id) AS files FROM occurrences GROUP BY keyword_id) AS counts
+        JOIN keywords ON keywords.id = counts.keyword_id
+        ORDER BY counts.total DESC, keywords.name""").fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the keyword occurrence index written by keywords.py --index.")
+    parser.add_argument("index_file", help="Path to the index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    where = commands.add_parser("where", help="Every place where a keyword is used, as path:line:column")
+    where.add_argument("keyword")
+    where.add_argument("--limit", type=int, help="Maximum number of occurrences")
+    top = commands.add_parser("top", help="Files with the most occurrences of a keyword")
+    top.add_argument("keyword")
+    top.add_argument("--limit", type=int, default=20, help="Number of files (default 20)")
+    commands.add_parser("keywords", help="Occurrences and files of every keyword")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.index_file):
+        print(f"Error: Index file '{args.index_file}' not found.")
+        return
+    connection = sqlite3.connect(args.index_file)
+    try:
+        if args.command == "keywords":
+            for name, total, files in keyword_totals(connection):
+                print(f"{name}\t{total}\t{files}")
+        elif keyword_id(connection, args.keyword) is None:
+            print(f"Keyword '{args.keyword}' is not in the index.")
+        elif args.command == "where":
+            for path, line, column, in_string in where_used(connection, args.keyword, args.limit):
+                print(f"{path}:{line}:{column}" + (" (string)" if in_string else ""))
+        else:
+            for path, technology, total in top_files(connection, args.keyword, args.limit):
+                print(f"{total}\t{technology}\t{path}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+"""
+Counts the keywords of keywords.py in one pass over the text of a file.
+
+The keyword list is compiled once into a KeywordMatcher:
+
+    matcher = keyword_matcher(["SparkR", "array_max/array_min", "F.col", "nocase:merge"])
+    matcher.count(text)                    # {"SparkR": 2, "array_max/array_min": 3, "F.col": 1}
+    matcher.count(text, ignore_case=True)  # SQL files
+    matcher.locate(text)                   # [(offset, "SparkR"), ...] for the occurrence index
+
+Every entry of the list is a rule, reported under the entry as written (its display name):
+
+- `date_add`: an identifier. Keywords only match whole identifiers, `date_add` is found in
+  `date_add(df)` but not in `my_date_add` or `date_add_months`.
+- `array_max/array_min`, `explode / explode_outer`: alternatives, the count of the rule is the sum.
+- `F.col`, `spark.read`, `a::b`: qualified names, a sequence of tokens (spaces between them do not matter).
+- `nocase:merge`: matched ignoring case in every file. With `count(text, ignore_case=True)`, used
+  for SQL files, all the rules ignore case. The prefix is not part of the display name.
+
+Rules made of single identifiers, the usual case, are counted with one regular expression pass that
+collects the identifiers of the text in a Counter, intersected with the keyword set. Qualified names
+are a trie of tokens walked from every token that can start one. All the rules share these two
+scans, so the cost of a file depends on its size and on the number of distinct identifiers in it,
+not on the number of rules or on their kind.
+
+`locate` finds the offset of every match. It is only used for the occurrence index of keywords.py:
+the identifiers of the text are collected first, and only the keywords present in the file are
+searched again with a regular expression that reports their positions.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+identifiers = re.compile(r"\w+")
+# identifiers and single punctuation characters, whitespace between tokens does not matter
+tokens = re.compile(r"\w+|[^\w\s]")
+alternative_separator = re.compile(r"\s*/\s*")
+nocase_prefix = "nocase:"
+
+
+def parse_rule(rule):
+    """Returns (display name, ignore case, token tuples of the alternatives) of a keyword rule."""
+    name = str(rule).strip()
+    ignore_case = name.startswith(nocase_prefix)
+    if ignore_case:
+        name = name[len(nocase_prefix):].strip()
+    alternatives = [tuple(tokens.findall(part)) for part in alternative_separator.split(name)]
+    return name, ignore_case, list(dict.fromkeys(parts for parts in alternatives if parts))
+
+
+class MatchTable:
+    """The words and the trie of the rules matched one way (exact or ignoring case)."""
+
+    def __init__(self):
+        # identifier -> rules made of that identifier only
+        self.words = {}
+        # token -> nested dict of the next tokens, the None key has the rules that end there
+        self.trie = {}
+
+    def add(self, name, parts):
+        if len(parts) == 1 and identifiers.fullmatch(parts[0]):
+            self.words.setdefault(parts[0], []).append(name)
+            return
+        node = self.trie
+        for part in parts:
+            node = node.setdefault(part, {})
+        node.setdefault(None, []).append(name)
+
+    def count_words(self, words, found):
+        for word in words.keys() & self.words.keys():
+            for name in self.words[word]:
+                found[name] += words[word]
+
+    def count_sequences(self, text_tokens, found):
+        for _, names in self.sequence_matches(text_tokens):
+            for name in names:
+                found[name] += 1
+
+    def sequence_matches(self, text_tokens):
+        # yields (index of the first token, rules) for every sequence of the trie found in text_tokens
+        trie = self.trie
+        size = len(text_tokens)
+        for start, token in enumerate(text_tokens):
+            node = trie.get(token)
+            position = start + 1
+            while node is not None:
+                names = node.get(None)
+                if names:
+                    yield start, names
+                if position == size:
+                    break
+                node = node.get(text_tokens[position])
+                position += 1
+
+    def locate_words(self, text, words, found, flags=0):
+        present = words & self.words.keys()
+        if not present:
+            return
+        pattern = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(word) for word in sorted(present, key=len, reverse=True)) + r")(?!\w)", flags)
+        for match in pattern.finditer(text):
+            word = match.group().lower() if flags & re.IGNORECASE else match.group()
+            for name in self.words.get(word, ()):
+                found.append((match.start(), name))
+
+    def locate_sequences(self, text_tokens, starts, found):
+        for index, names in self.sequence_matches(text_tokens):
+            for name in names:
+                found.append((starts[index], name))
+
+
+class KeywordMatcher:
+    def __init__(self, keywords):
+        self.names = []
+        self.order = {}
+        # count(text) uses the exact and the nocase tables, count(text, ignore_case=True) the folded one
+        self.exact = MatchTable()
+        self.nocase = MatchTable()
+        self.folded = MatchTable()
+        for rule in keywords:
+            name, ignore_case, alternatives = parse_rule(rule)
+            # duplicated rules are reported once
+            if name in self.order or not alternatives:
+                continue
+            self.order[name] = len(self.names)
+            self.names.append(name)
+            for parts in alternatives:
+                folded = tuple(part.lower() for part in parts)
+                if ignore_case:
+                    self.nocase.add(name, folded)
+                else:
+                    self.exact.add(name, parts)
+                self.folded.add(name, folded)
+
+    def tables(self, ignore_case):
+        # (table matched as is or None, table matched on lower cased text)
+        return (None, self.folded) if ignore_case else (self.exact, self.nocase)
+
+    def count(self, text, ignore_case=False):
+        """Returns {display name: count} for the rules found in text, in the order of the keyword list."""
+        exact, folded = self.tables(ignore_case)
+        found = Counter()
+        if (exact and exact.words) or folded.words:
+            words = Counter(identifiers.findall(text))
+            if exact:
+                exact.count_words(words, found)
+            if folded.words:
+                folded_words = Counter()
+                for word, count in words.items():
+                    folded_words[word.lower()] += count
+                folded.count_words(folded_words, found)
+        if (exact and exact.trie) or folded.trie:
+            text_tokens = tokens.findall(text)
+            if exact:
+                exact.count_sequences(text_tokens, found)
+            if folded.trie:
+                folded.count_sequences([token.lower() for token in text_tokens], found)
+        return {name: found[name] for name in sorted(found, key=self.order.__getitem__)}
+
+    def locate(self, text, ignore_case=False):
+        """Returns (offset, display name) for every match in text, in the order of the text."""
+        exact, folded = self.tables(ignore_case)
+        found = []
+        if (exact and exact.words) or folded.words:
+            words = set(identifiers.findall(text))
+            if exact:
+                exact.locate_words(text, words, found)
+            if folded.words:
+                folded.locate_words(text, {word.lower() for word in words}, found, re.IGNORECASE)
+        if (exact and exact.trie) or folded.trie:
+            matches = list(tokens.finditer(text))
+            starts = [match.start() for match in matches]
+            if exact and exact.trie:
+                exact.locate_sequences([match.group() for match in matches], starts, found)
+            if folded.trie:
+                folded.locate_sequences([match.group().lower() for match in matches], starts, found)
+        found.sort(key=lambda hit: (hit[0], self.order[hit[1]]))
+        return found
+
+
+@lru_cache(maxsize=16)
+def compile_keywords(keywords):
+    return KeywordMatcher(keywords)
+
+
+def keyword_matcher(keywords):
+    """The KeywordMatcher of a keyword list, compiled the first time the list is seen."""
+    if isinstance(keywords, KeywordMatcher):
+        return keywords
+    return compile_keywords(tuple(str(keyword) for keyword in keywords))
@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+"""
+Files x keywords matrix of the counts of Keywords.csv (`keywords.py --matrix npz` or
+`assessment.py --keyword-matrix npz`), so the counts can be loaded without pivoting the long csv.
+
+- npz: a SciPy CSR matrix, `scipy.sparse.load_npz("KeywordMatrix.npz")` reads it. The same file has
+  the index vectors, read with `numpy.load`:
+  - `files`: path of every row, `keywords`: name of every column,
+  - `file_technology` / `technologies` and `file_folder` / `folders`: code of every row and the names
+    of the codes, so rollups are vectorized, for example the counts per technology:
+
+        m = numpy.load("KeywordMatrix.npz")
+        rows = scipy.sparse.csr_matrix((numpy.ones(len(m["files"])), (m["file_technology"], numpy.arange(len(m["files"])))))
+        per_technology = rows @ scipy.sparse.load_npz("KeywordMatrix.npz")
+
+- parquet / arrow: a table with the File, Technology and Folder columns (dictionary encoded) and
+  one int64 column per keyword, written in row groups so it never needs the whole dense matrix in memory.
+
+Only the files with at least one keyword have a row, like in Keywords.csv, and only the matches in
+code are counted (not StringCount). npz needs numpy and falls back to parquet without it; parquet
+and arrow need pyarrow, without it the matrix is not written.
+"""
+import os
+import logging
+from array import array
+
+from report_writer import resolve_format
+
+matrix_formats = ("npz", "parquet", "arrow")
+matrix_path = os.path.join("Reports", "GenericScanner", "GenericScannerOutput", "KeywordMatrix")
+
+
+def resolve_matrix_format(matrix_format):
+    """Returns the format that can actually be written, None when nothing can be written."""
+    if matrix_format == "npz":
+        try:
+            import numpy
+            return "npz"
+        except ImportError:
+            logging.warning("numpy is not installed, writing the keyword matrix as parquet")
+            matrix_format = "parquet"
+    matrix_format = resolve_format(matrix_format)
+    if matrix_format == "csv":
+        logging.warning("The keyword matrix needs numpy or pyarrow, it is not written")
+        return None
+    return matrix_format
+
+
+class KeywordMatrix:
+    """
+    Collects the Keywords.csv rows, which come grouped by file, as a CSR matrix. It has the
+    writerow/writerows interface of the report writers.
+    """
+
+    def __init__(self, path, keywords, matrix_format="npz", batch_cells=4 * 1024 * 1024):
+        self.matrix_format = matrix_format
+        self.path = os.path.splitext(path)[0] + "." + matrix_format
+        self.keywords = list(keywords)
+        self.columns = {name: index for index, name in enumerate(self.keywords)}
+        self.technologies = {}
+        self.folders = {}
+        self.current = None
+        # parquet and arrow write a row group every batch_files files
+        self.batch_files = max(1, batch_cells // max(1, len(self.keywords)))
+        self.writer = None
+        self.reset()
+
+    def reset(self):
+        self.files = []
+        self.file_technology = array('i')
+        self.file_folder = array('i')
+        self.indptr = array('q', [0])
+        self.indices = array('i')
+        self.data = array('q')
+
+    def add_file(self, file_path, technology):
+        if self.matrix_format != "npz" and len(self.files) >= self.batch_files:
+            self.flush()
+        self.current = file_path
+        self.files.append(file_path)
+        self.file_technology.append(self.technologies.setdefault(technology, len(self.technologies)))
+        folder = os.path.dirname(file_path)
+        self.file_folder.append(self.folders.setdefault(folder, len(self.folders)))
+        self.indptr.append(self.indptr[-1])
+
+    def writerow(self, row):
+        count = row.get('Count')
+        if not count:
+            return
+        if row['File'] != self.current:
+            self.add_file(row['File'], row.get('Technology'))
+        self.indices.append(self.columns[row['Keyword']])
+        self.data.append(int(count))
+        self.indptr[-1] += 1
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def open_writer(self):
+        import pyarrow as pa
+        self.schema = pa.schema([pa.field(name, pa.dictionary(pa.int32(), pa.string())) for name in ("File", "Technology", "Folder")] +
+                                [pa.field(name, pa.int64()) for name in self.keywords])
+        if self.matrix_format == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self.sink = pa.OSFile(self.path, 'wb')
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def flush(self):
+        # one row group of the parquet or arrow table
+        if not self.files:
+            return
+        import pyarrow as pa
+        if self.writer is None:
+            self.open_writer()
+        technologies = list(self.technologies)
+        folders = list(self.folders)
+        dense = [[0] * len(self.files) for _ in self.keywords]
+        for row in range(len(self.files)):
+            for position in range(self.indptr[row], self.indptr[row + 1]):
+                dense[self.indices[position]][row] = self.data[position]
+        arrays = [pa.array(self.files, type=pa.string()).dictionary_encode(),
+                  pa.array([technologies[code] for code in self.file_technology], type=pa.string()).dictionary_encode(),
+                  pa.array([folders[code] for code in self.file_folder], type=pa.string()).dictionary_encode()]
+        arrays.extend(pa.array(column, type=pa.int64()) for column in dense)
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.matrix_format == "parquet":
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.reset()
+
+    def write_npz(self):
+        import numpy as np
+        np.savez_compressed(
+            self.path,
+            # the keys of scipy.sparse.save_npz
+            format=np.array(b"csr"),
+            shape=np.array([len(self.files), len(self.keywords)]),
+            data=np.frombuffer(self.data, dtype=np.int64),
+            indices=np.frombuffer(self.indices, dtype=np.int32),
+            indptr=np.frombuffer(self.indptr, dtype=np.int64),
+            files=np.array(self.files, dtype=str),
+            keywords=np.array(self.keywords, dtype=str),
+            technologies=np.array(list(self.technologies), dtype=str),
+            file_technology=np.frombuffer(self.file_technology, dtype=np.int32),
+            folders=np.array(list(self.folders), dtype=str),
+            file_folder=np.frombuffer(self.file_folder, dtype=np.int32))
+
+    def close(self):
+        if self.matrix_format == "npz":
+            self.write_npz()
+            return
+        self.flush()
+        if self.writer is None:
+            # no file had keywords, the table only has the columns
+            self.open_writer()
+        self.writer.close()
+        if hasattr(self, 'sink'):
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -2,42 +2,66 @@
 import os
 import re
 import argparse
+from bisect import bisect_right
+from collections import Counter
+from contextlib import ExitStack
 import logging
-import csv
 from rich.console import Console
 import yaml
 
-import nbformat
+from scan_utils import SourceFile, iter_entries
+from notebook_reader import read_notebook, notebook_of
+from keyword_matcher import keyword_matcher
+from code_regions import split_code, split_chunks, mask_code, blank, language_for
+from keyword_index import KeywordIndex
+from keyword_matrix import KeywordMatrix, matrix_formats, matrix_path, resolve_matrix_format
+from exclusions import Exclusions, folders_from_config
+from report_writer import open_report, output_formats, ReportTee
 
 keyword_list = []
 
-def analyze_jupyter_notebook(file_path, keywords):
+def notebook_cells(content, source=None):
+    """(language, source) of every cell of a notebook, the language is None for markdown and raw cells."""
+    notebook_content = notebook_of(source) if source is not None else read_notebook(content)
+    kernel_language = notebook_content.language or 'python'
+    cells = []
+    for cell in notebook_content.cells:
+        source_code = cell.source
+        # markdown and raw cells are documentation, only code cells are matched
+        if cell.cell_type != 'code':
+            cells.append((None, source_code))
+            continue
+        language = kernel_language
+        magic = cell_magic.match(source_code)
+        if magic:
+            # %sql, %r, %scala... cells of Databricks notebooks, the magic itself is not code
+            language = magic.group(1)
+            source_code = blank(source_code[:magic.end()]) + source_code[magic.end():]
+        cells.append((notebook_languages.get(language.lower()), source_code))
+    return cells
+
+def analyze_jupyter_notebook(file_path, keywords, content=None, with_strings=False, source=None):
     # Read the Jupyter notebook
-    with open(file_path, 'r', encoding='utf-8') as f:
-        total_cells = 0
-        keyword_counts = {keyword: 0 for keyword in keywords}
-        notebook_content = nbformat.read(f, as_version=4)
-        # Iterate through each cell in the notebook
-        for cell in notebook_content['cells']:
-            total_cells += 1
-            # Get the source code of the cell
-            source_code = cell['source']
-            # Split the source code into lines
-            lines = source_code.split('\n')
-            for line in lines:
-                count_keywords_in_line(keyword_counts, keywords, line)
-        return keyword_counts
+    if content is None and source is None:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+    chunks = notebook_cells(content, source)
+    # the code of all the cells is matched in one pass, SQL cells in another one that ignores case
+    code_counts = Counter()
+    string_counts = Counter() if with_strings else None
+    for ignore_case in (False, True):
+        cells = [chunk for chunk in chunks if (chunk[0] in case_insensitive_technologies) == ignore_case]
+        if cells:
+            code, strings = count_regions(keywords, *split_chunks(cells, with_strings), ignore_case)
+            code_counts.update(code)
+            if with_strings:
+                string_counts.update(strings)
+    return code_counts, string_counts
 
 def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
                         format='%(asctime)s - %(levelname)s - %(message)s')
 
-def is_excluded(name, exclude_patterns):
-    for pattern in exclude_patterns:
-        if re.search(pattern, name):
-            return True
-    return False
-
 def map_technology(extension):
     technology_mappings = {
         '.r': 'R',
@@ -77,92 +101,179 @@ line_comments_by_extension = {
     ".sql":"--"
 }
 
-def count_keywords_in_line(keyword_counts, keywords, line):
-    line = line.strip()
-    if line=="" or line.startswith("#"):
-        return
-    words = re.split('\.|,|;|\(|\)|\[|\]|\{|\}', line)
-    for word in words:
-        if word:
-            if word in keywords:
-                keyword_counts[word] += 1    
-
-def count_keywords(filename, keywords):
-    keyword_counts = {keyword: 0 for keyword in keywords}
+# files without a scanner in code_regions: lines starting with # are left out, as comments
+comment_lines = re.compile(r"^[ \t]*#.*$", re.MULTILINE)
+# language of the magic command on the first line of a notebook cell (%sql, %r, ...)
+cell_magic = re.compile(r"\s*%(\w+)[^\n]*(?:\n|$)")
+notebook_languages = {"python": "Python", "pyspark": "Python", "r": "R", "scala": "Scala", "sql": "SQL", "sh": "Shell"}
+
+# SQL is not case sensitive, keywords match in any case in these files
+case_insensitive_technologies = ('SQL',)
+
+def count_regions(keywords, code, strings, ignore_case=False):
+    """
+    Returns (counts in code, counts in string literals or None). Keywords in strings match in any
+    case, they are mostly SQL statements.
+    """
+    matcher = keyword_matcher(keywords)
+    return matcher.count(code, ignore_case), (matcher.count(strings, True) if strings is not None else None)
+
+def count_keywords_in_text(keywords, text, extension, with_strings=False):
+    ignore_case = map_technology(extension) in case_insensitive_technologies
+    regions = split_code(text, language_for(extension), with_strings)
+    if regions is None:
+        if "#" in text:
+            text = comment_lines.sub("", text)
+        return count_regions(keywords, text, "" if with_strings else None, ignore_case)
+    return count_regions(keywords, regions[0], regions[1], ignore_case)
+
+newlines = re.compile(r"\n")
+
+def locate_regions(keywords, text, regions):
+    """
+    regions are (masked text, ignore case, in string) where masked text has the offsets of text.
+    Returns (line, column, keyword, in string) for every match, by position.
+    """
+    matcher = keyword_matcher(keywords)
+    line_starts = [0] + [match.end() for match in newlines.finditer(text)]
+    hits = []
+    for masked, ignore_case, in_string in regions:
+        if masked is None:
+            continue
+        for offset, name in matcher.locate(masked, ignore_case):
+            line = bisect_right(line_starts, offset)
+            hits.append((line, offset - line_starts[line - 1] + 1, name, in_string))
+    hits.sort(key=lambda hit: (hit[0], hit[1]))
+    return hits
+
+def locate_keywords(keywords, text, extension, with_strings=False):
+    ignore_case = map_technology(extension) in case_insensitive_technologies
+    regions = mask_code(text, language_for(extension), with_strings)
+    if regions is None:
+        code = comment_lines.sub(lambda match: blank(match.group()), text) if "#" in text else text
+        regions = (code, "" if with_strings else None)
+    return locate_regions(keywords, text, [(regions[0], ignore_case, False), (regions[1], True, True)])
+
+def locate_in_notebook(keywords, content, with_strings=False, source=None):
+    # lines are counted over the sources of all the cells, one after the other
+    cells = notebook_cells(content, source)
+    text = "\n".join(source for _, source in cells)
+    regions = []
+    for ignore_case in (False, True):
+        code = []
+        strings = []
+        for language, source in cells:
+            parts = mask_code(source, language, with_strings) if (language in case_insensitive_technologies) == ignore_case else None
+            code.append(parts[0] if parts else blank(source))
+            strings.append(parts[1] if parts and with_strings else blank(source))
+        regions.append(("\n".join(code), ignore_case, False))
+        if with_strings:
+            regions.append(("\n".join(strings), True, True))
+    return locate_regions(keywords, text, regions)
+
+def count_keywords(filename, keywords, source=None, with_strings=False):
     try:
-        with open(filename, 'r') as file:
-            for line in file:
-                count_keywords_in_line(keyword_counts, keywords, line)
-        return keyword_counts
+        source = source or SourceFile(filename)
+        return count_keywords_in_text(keywords, source.text, os.path.splitext(filename)[1], with_strings)
     except Exception as e:
-        logging.error(f"Error processing file: {file_path} - {e}")
+        logging.error(f"Error processing file: {filename} - {e}")
         return None
 
 
-def process_file(keyword_list,file_path,root):
+def process_file(keyword_list,file_path,root,source=None,with_strings=False):
     try:
-        if os.path.isfile(file_path):
-
-            if file_path.endswith(".ipynb"):
-                return analyze_jupyter_notebook(file_path, keyword_list)
-            elif file_path.endswith(text_files):
-                return count_keywords(file_path, keyword_list)
+        source = source or SourceFile(file_path)
+        if source.is_file():
+            # binary files are skipped after reading their first bytes
+            if file_path.endswith(".ipynb") and not source.is_binary:
+                return analyze_jupyter_notebook(file_path, keyword_list, with_strings=with_strings, source=source)
+            elif file_path.endswith(text_files) and not source.is_binary:
+                return count_keywords(file_path, keyword_list, source, with_strings)
             
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
         return None
 
-def scan_folders(folder_config, keywords_list, output_csv):
+report_path = os.path.join("Reports","GenericScanner","GenericScannerOutput","Keywords.csv")
+report_fieldnames = ['File','Technology','Keyword','Count']
+report_types = {'Count': 'int64'}
+# when the matches in string literals are counted (count_keywords_in_strings)
+string_fieldnames = report_fieldnames + ['StringCount']
+string_types = dict(report_types, StringCount='int64')
+
+def scan_folders(folder_config, keywords_list, output_csv, output_format="csv", count_strings=False, index_file=None, matrix_format=None):
     console = Console()
+    keywords_list = keyword_matcher(keywords_list)
+    matrix_format = resolve_matrix_format(matrix_format) if matrix_format else None
 
-    with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = [
-            'File','Technology','Keyword','Count'
-        ]
-        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        csv_writer.writeheader()
+    with ExitStack() as stack:
+        csv_writer = stack.enter_context(open_report(output_csv, string_fieldnames if count_strings else report_fieldnames, output_format,
+                                                     column_types=string_types if count_strings else report_types))
+        index = stack.enter_context(KeywordIndex(index_file)) if index_file else None
+        if matrix_format:
+            # the matrix gets the same rows as Keywords.csv
+            matrix = stack.enter_context(KeywordMatrix(os.path.join(os.path.dirname(output_csv), os.path.basename(matrix_path)),
+                                                       keywords_list.names, matrix_format))
+            csv_writer = ReportTee(csv_writer, matrix)
 
         for config in folder_config:
             root_path = config.get("root_path", "")
             root_path_label = config.get("root_path_label", "")
-            exclude_folders = config.get("exclude_folders", [])
-            exclude_files = config.get("exclude_files", [])
+            exclusions = Exclusions.from_config(config)
 
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {root_path}")
             logging.info(f"Scanning folder: {root_path}")
 
-            for folder in os.listdir(root_path):
-                folder_path = os.path.join(root_path, folder)
-                if os.path.isfile(folder_path) and not is_excluded(folder_path, exclude_files):
-                    do_file_processing(keywords_list,root_path,"", csv_writer, folder_path)
-                elif os.path.isdir(folder_path) and not is_excluded(folder, exclude_folders):
-                    for root, dirs, files in os.walk(folder_path):
-                        current_path = root
-                        dirs[:] = [d for d in dirs if not is_excluded(d, exclude_folders)]
-                        files = [f for f in files if not is_excluded(f, exclude_files)]
-
-                        for file in files:
-                            do_file_processing(keywords_list,root_path,os.path.relpath(current_path,root_path),csv_writer, file)
-
-def do_file_processing(keywords_list,root_path,folder_path,csv_writer, file):
-    file_path = os.path.join(root_path,folder_path, file)
+            for entry in iter_entries(root_path, exclusions):
+                do_file_processing(keywords_list,root_path, csv_writer, entry.path, SourceFile(entry.path, entry), count_strings, index)
+
+def collect_rows(keywords_list, file_path, root_path, source=None, count_strings=False):
+    source = source or SourceFile(file_path)
+    # the keyword matrix of assessment.py is another collector with the same rows
+    return source.memo(("keyword_rows", count_strings), lambda: list(keyword_rows(keywords_list, file_path, root_path, source, count_strings)))
+
+def keyword_rows(keywords_list, file_path, root_path, source=None, count_strings=False):
+    keywords_info = process_file(keywords_list,file_path, root_path, source, count_strings)
+    if keywords_info is not None:
+        code_counts, string_counts = keywords_info
+        filename, extension = os.path.splitext(os.path.basename(file_path))
+        order = keyword_matcher(keywords_list).order
+        for key in sorted(code_counts.keys() | (string_counts or {}).keys(), key=order.__getitem__):
+            # only keywords found somewhere are written
+            row = {
+                'File':file_path,
+                'Technology': map_technology(extension.lower()),
+                'Keyword':key,
+                'Count':code_counts.get(key, 0)
+            }
+            if string_counts is not None:
+                row['StringCount'] = string_counts.get(key, 0)
+            yield row
+
+def collect_occurrences(keywords_list, file_path, root_path, source=None, count_strings=False):
+    """Rows of the keyword occurrence index (keyword_index.py) of a file."""
+    source = source or SourceFile(file_path)
+    if not source.is_file() or source.is_binary:
+        return
+    extension = os.path.splitext(file_path)[1]
+    if file_path.endswith(".ipynb"):
+        hits = locate_in_notebook(keywords_list, None, count_strings, source)
+    elif file_path.endswith(text_files):
+        hits = locate_keywords(keywords_list, source.text, extension, count_strings)
+    else:
+        return
+    technology = map_technology(extension.lower())
+    for line, column, keyword, in_string in hits:
+        yield {'File': file_path, 'Technology': technology, 'Keyword': keyword, 'Line': line, 'Column': column, 'InString': in_string}
+
+def do_file_processing(keywords_list,root_path, csv_writer, file_path, source=None, count_strings=False, index=None):
     logging.info(f"Processing file: {file_path}")
 
     try:
-        keywords_info = process_file(keywords_list,file_path, root_path)
-        if keywords_info is not None:
-            filename, extension = os.path.splitext(os.path.basename(file_path))
-            for key in keywords_info.keys():
-                count = keywords_info[key]
-                if count:
-                    # only write non-zero 
-                    file_info = {
-                        'File':file_path,
-                        'Technology': map_technology(extension.lower()),
-                        'Keyword':key,
-                        'Count':keywords_info[key]
-                    }
-                    csv_writer.writerow(file_info)
+        for file_info in collect_rows(keywords_list, file_path, root_path, source, count_strings):
+            csv_writer.writerow(file_info)
+        if index is not None:
+            index.writerows(collect_occurrences(keywords_list, file_path, root_path, source, count_strings))
     except Exception as e:
         logging.error(f"Error processing file: {file_path} - {e}")
 
@@ -171,10 +282,13 @@ def main():
     parser.add_argument("config_file", help="Path to the YAML configuration file")
     parser.add_argument("output_folder", help="Folder for all the tool output")
     #parser.add_argument("output_csv", help="Path to the output CSV file",default="FilesInventory.csv")
+    parser.add_argument("--output-format", choices=output_formats, default="csv", help="Format of the report: csv (default), parquet or arrow")
+    parser.add_argument("--matrix", choices=matrix_formats, help="Also write the counts as a files x keywords matrix: npz (SciPy CSR), parquet or arrow (see keyword_matrix.py)")
+    parser.add_argument("--index", help="Path to a SQLite file where the line and column of every keyword are written (see keyword_index.py)")
 
     args = parser.parse_args()
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports","GenericScanner","GenericScannerOutput","Keywords.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","keywords.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -184,10 +298,11 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
             keyword_list = config.get("keywords", [])
 
-            scan_folders(folder_config,keyword_list, output_csv)
+            scan_folders(folder_config,keyword_list, output_csv, args.output_format, config.get("count_keywords_in_strings", False),
+                         args.index, args.matrix)
 
     except FileNotFoundError:
         print(f"Error: Configuration file '{args.config_file}' not found.")
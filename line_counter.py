@@ -0,0 +1,174 @@
+#!/usr/bin/python3
+"""
+Counts code, comment and blank lines of a source file in one pass over its bytes.
+
+The file is read in large binary chunks, so a multi-hundred-MB file never has to be decoded or
+held in memory as a list of lines. Lines are split the same way as a file opened in text mode
+(`\\n`, `\\r\\n` and `\\r`) and a line is blank when it only has whitespace.
+
+Besides the line comment marker of the language, block comments are understood:
+
+- `/* ... */` for Java, Scala and SQL. A line is a comment line when it only has comments, so
+  `int a; /* note */` is code and the lines after `int b; /* start` are comments until the `*/`.
+- Python docstrings: triple quoted strings that start a line are comment blocks. Triple quoted
+  strings that start after some code (`sql = \"\"\"...`) are strings, their lines are code.
+
+Block markers inside string literals and after a line comment are ignored. R has no block
+comments, roxygen `#'` lines are already line comments.
+
+Most of the work is done with C level operations over the whole chunk: a regular expression finds
+the blocks (only the text before a block marker on its own line is checked for strings and line
+comments), `bytes.translate` masks their text (comment blocks with \\x01, strings with \\x02,
+keeping newlines and whitespace) and another regular expression counts the blank and comment lines.
+"""
+import re
+
+default_chunk_size = 4 * 1024 * 1024
+
+c_block = (b"/*", b"*/", False)
+docstring_blocks = ((b'"""', b'"""', True), (b"'''", b"'''", True))
+# (opener, closer, docstring)
+block_comments_by_extension = {
+    ".java": (c_block,),
+    ".scala": (c_block,),
+    ".sql": (c_block,),
+    ".py": docstring_blocks,
+}
+
+whitespace = b" \t\x0b\x0c"
+comment_mask = b"\x01"
+code_mask = b"\x02"
+string_literals = rb'"[^"\\\n]*(?:\\.[^"\\\n]*)*"|' + rb"'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+
+
+strings = re.compile(string_literals)
+
+
+def mask_table(mask):
+    keep = set(b"\n" + whitespace)
+    return bytes(byte if byte in keep else mask[0] for byte in range(256))
+
+
+mask_tables = {"comment": mask_table(comment_mask), "code": mask_table(code_mask)}
+
+
+class LineCounter:
+    """Feed it the bytes of a file with `feed` (any chunk size), then call `finish`."""
+
+    def __init__(self, line_comment=None, blocks=()):
+        self.line_comment = line_comment.encode() if isinstance(line_comment, str) else line_comment
+        self.blocks = tuple(blocks)
+        self.openers = tuple(opener for opener, _, _ in self.blocks)
+        # matched at every \n: nothing for a blank line, the group for a comment line (a line
+        # comment, or only masked comment blocks and whitespace)
+        mark = re.escape(self.line_comment) + rb"|" if self.line_comment else b""
+        comment = mark + rb"\x01[\x01 \t\x0b\x0c]*(?:" + mark + rb"(?=\n))"
+        self.line_kinds = re.compile(rb"\n[ \t\x0b\x0c]*(?:(?=\n)|(" + comment + rb"))")
+        # one group per kind of block
+        self.block_start = re.compile(b"|".join(rb"(" + re.escape(opener) + rb".*?(?:" + re.escape(closer) + rb"|\Z))"
+                                                for opener, closer, _ in self.blocks), re.DOTALL)
+        # closer and kind ('comment' or 'code') of a block that goes on in the next chunk
+        self.open_block = None
+        self.pending = b""
+        self.code = 0
+        self.comments = 0
+        self.blank = 0
+
+    def feed(self, data):
+        data = self.pending + data
+        # a \r at the end may be the first half of a \r\n
+        if data.endswith(b"\r"):
+            data, self.pending = data[:-1], b"\r"
+        else:
+            self.pending = b""
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        end = data.rfind(b"\n") + 1
+        self.pending = data[end:] + self.pending
+        if end:
+            self.count(data[:end])
+
+    def finish(self):
+        """Returns (code lines, comment lines, blank lines)."""
+        if self.pending:
+            data = self.pending.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            self.pending = b""
+            self.count(data if data.endswith(b"\n") else data + b"\n")
+        return self.code, self.comments, self.blank
+
+    def count(self, data):
+        # data is made of complete lines, each one ending with \n
+        if self.open_block is not None or any(opener in data for opener in self.openers):
+            data = self.mask_blocks(data)
+        # with the extra \n in front every line start is right after a \n
+        found = self.line_kinds.findall(b"\n" + data)
+        lines = data.count(b"\n")
+        blank = found.count(b"")
+        comments = len(found) - blank
+        self.blank += blank
+        self.comments += comments
+        self.code += lines - blank - comments
+
+    def in_code(self, prefix):
+        """prefix is the text of the line before a block marker, False if the marker is in a string or a line comment."""
+        if b'"' in prefix or b"'" in prefix:
+            prefix = strings.sub(b"", prefix)
+            if b'"' in prefix or b"'" in prefix:
+                return False
+        return not (self.line_comment and self.line_comment in prefix)
+
+    def mask_blocks(self, data):
+        pieces = []
+        pos = 0
+        if self.open_block is not None:
+            closer, kind = self.open_block
+            hit = data.find(closer)
+            if hit < 0:
+                return data.translate(mask_tables[kind])
+            pos = hit + len(closer)
+            pieces.append(data[:pos].translate(mask_tables[kind]))
+            self.open_block = None
+        size = len(data)
+        scan_from = pos
+        while scan_from is not None:
+            resume, scan_from = scan_from, None
+            for match in self.block_start.finditer(data, resume):
+                start, end = match.span()
+                line_start = data.rfind(b"\n", 0, start) + 1
+                prefix = data[line_start if line_start > pos else pos:start]
+                if prefix and not prefix.isspace() and not self.in_code(prefix):
+                    # look again right after the false marker, a real block can start inside this match
+                    scan_from = start + 1
+                    break
+                opener, closer, docstring = self.blocks[match.lastindex - 1]
+                kind = "comment"
+                if docstring and data[line_start:start].strip(whitespace):
+                    # a string after some code, not a docstring
+                    kind = "code"
+                if end == size and (end - start < len(opener) + len(closer) or not data.endswith(closer)):
+                    self.open_block = (closer, kind)
+                pieces.append(data[pos:start])
+                pieces.append(data[start:end].translate(mask_tables[kind]))
+                pos = end
+        pieces.append(data[pos:])
+        return b"".join(pieces)
+
+
+def count_lines(data, line_comment=None, blocks=()):
+    """Counts the lines of a bytes buffer, returns (code lines, comment lines, blank lines)."""
+    counter = LineCounter(line_comment, blocks)
+    counter.feed(data)
+    return counter.finish()
+
+
+def count_file_lines(path, line_comment=None, blocks=(), chunk_size=default_chunk_size, offset=0):
+    """Same as count_lines reading the file in chunks of chunk_size bytes, from offset (past a BOM)."""
+    counter = LineCounter(line_comment, blocks)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            counter.feed(chunk)
+    return counter.finish()
@@ -1,14 +1,27 @@
 #!/usr/bin/python3
 from ply import lex
+from ply.lex import TOKEN
 import os
+import re
+import sys
+import hashlib
+import tempfile
 import rich
 import argparse
 import logging
 import csv
+import importlib.util
+from functools import lru_cache
+from contextlib import contextmanager
 
 from rich.console import Console
 import yaml
 
+from scan_utils import SourceFile, iter_files, is_hidden, ordered_map
+from code_regions import rmd_chunk, rmd_engines
+from exclusions import Exclusions, folders_from_config
+from literal_store import LiteralStore
+
 # Define the R lexer tokens
 tokens = (
     'NUMBER',
@@ -44,9 +57,16 @@ tokens = (
     'SEMICOLON',
     'BITWISE_AND',
     'BACKTICK_ID',
-    'BACKSLASH'
+    'BACKSLASH',
+    'RAW_STRING'
 )
 
+# "..." and '...' with backslash escapes, they can span lines
+double_quoted = r'"[^"\\]*(?:\\[\s\S][^"\\]*)*"'
+single_quoted = r"'[^'\\]*(?:\\[\s\S][^'\\]*)*'"
+# R 4.0 raw strings: r"(...)", R'[...]', r"{...}", r"---(...)---"
+raw_string = r"""[rR](?P<raw_quote>["'])(?P<raw_dashes>-*)(?:\((?P<raw_paren>[\s\S]*?)\)|\[(?P<raw_square>[\s\S]*?)\]|\{(?P<raw_curly>[\s\S]*?)\})(?P=raw_dashes)(?P=raw_quote)"""
+
 # Define the regular expressions for the tokens
 t_PLUS = r'\+'
 t_MINUS = r'-'
@@ -80,6 +100,7 @@ t_BACKSLASH = r'\\'
 # Define a rule for matching backtick-enclosed identifiers
 def t_BACKTICK_ID(t):
     r'`[^`]+`'
+    t.lexer.lineno += t.value.count('\n')
     return t
 
 # Define a rule for comments
@@ -93,15 +114,24 @@ def t_NUMBER(t):
     t.value = int(t.value)
     return t
 
+# Define a rule for matching raw strings, before the identifiers so the r prefix is not taken as one
+@TOKEN(raw_string)
+def t_RAW_STRING(t):
+    t.lexer.lineno += t.value.count('\n')
+    t.value = raw_string_body(t.lexer.lexmatch)
+    t.type = 'STRING'
+    return t
+
 # Define a rule for matching identifiers
 def t_ID(t):
     r'[a-zA-Z_][a-zA-Z_0-9]*'
     return t
 
 # Define a rule for matching strings
+@TOKEN(double_quoted + '|' + single_quoted)
 def t_STRING(t):
-    r'"[^"]*"|\'[^\']*\''
-    t.value = t.value[1:-1]  # Remove quotes from the value
+    t.lexer.lineno += t.value.count('\n')
+    t.value = t.value[1:-1]  # Remove quotes from the value, the escapes are kept as written
     return t
 
 # Define a rule for tracking line numbers
@@ -127,60 +157,311 @@ def t_PERCENT(t):
     r'%'
     return t
 
-# Build the lexer
-lexer = lex.lex()
+# The lexer is built on first use. Its tables (the master regular expression of the rules) are
+# kept in r_lextab.py next to this file, regenerated when the rules change
+lexer_table = "r_lextab"
+lexer_table_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), lexer_table + ".py")
+
+
+def lexer_signature():
+    """Hash of what the tables are made of: the tokens, the string rules and the function rules in their order."""
+    rules = {name: value for name, value in globals().items() if name.startswith('t_')}
+    functions = sorted((rule for rule in rules.values() if callable(rule)), key=lambda rule: rule.__code__.co_firstlineno)
+    signature = repr((lex.__tabversion__, tokens, [(rule.__name__, getattr(rule, 'regex', rule.__doc__)) for rule in functions],
+                      sorted((name, value) for name, value in rules.items() if isinstance(value, str))))
+    return hashlib.sha1(signature.encode()).hexdigest()
+
+
+def read_lexer_table(path, signature):
+    """The table module at path, None when it is missing or was generated from other rules."""
+    try:
+        spec = importlib.util.spec_from_file_location(lexer_table, path)
+        table = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(table)
+    except (OSError, SyntaxError):
+        return None
+    return table if getattr(table, '_rules_signature', None) == signature else None
+
+
+def write_lexer_table(built, path, signature):
+    # written in a temporary folder and moved, so a process never reads half a table
+    try:
+        with tempfile.TemporaryDirectory(dir=os.path.dirname(path)) as temp:
+            built.writetab(lexer_table, temp)
+            written = os.path.join(temp, lexer_table + ".py")
+            with open(written, "a") as f:
+                f.write(f"_rules_signature = {signature!r}\n")
+            os.replace(written, path)
+    except OSError as e:
+        logging.warning(f"The lexer tables could not be written to {path}: {e}")
+
+
+@lru_cache(maxsize=None)
+def r_lexer():
+    """The ply lexer of the R rules above, read from its tables when they are up to date."""
+    module = sys.modules[__name__]
+    signature = lexer_signature()
+    table = read_lexer_table(lexer_table_path, signature)
+    if table is not None:
+        return lex.lex(module=module, optimize=True, lextab=table)
+    built = lex.lex(module=module)
+    write_lexer_table(built, lexer_table_path, signature)
+    return built
+
+# The literal scanner only stops at the characters that can start a comment, a backtick name or a
+# string, the rest of the code is jumped over by the search for the next one
+literal_start = re.compile(r"""[#`"']""")
+quoted = {'"': re.compile(double_quoted), "'": re.compile(single_quoted)}
+raw_string_pattern = re.compile(raw_string)
+word_chars = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+
+
+def raw_string_body(match):
+    return next(body for body in match.group('raw_paren', 'raw_square', 'raw_curly') if body is not None)
+
+
+def starts_token(data, pos):
+    # the lexer reads a run of letters and digits as a number followed by one identifier, so the
+    # character at pos starts a token only when the run before it is all digits
+    start = pos
+    while start and data[start - 1] in word_chars:
+        start -= 1
+    return start == pos or data[start:pos].isdigit()
+
+
+def scan_literals(file, data):
+    """Yields the same (file, literal, line) as lex_literals without tokenizing the rest of the code."""
+    search = literal_start.search
+    line = 1
+    counted = 0
+    match = search(data)
+    while match:
+        pos = match.start()
+        char = data[pos]
+        if char == '#':
+            end = data.find('\n', pos)
+            if end < 0:
+                return
+        elif char == '`':
+            # an empty or unclosed backtick name is skipped one character at a time, like the lexer does
+            end = data.find('`', pos + 1)
+            end = pos + 1 if end <= pos + 1 else end + 1
+        else:
+            literal = None
+            if pos and data[pos - 1] in 'rR' and starts_token(data, pos - 1):
+                raw = raw_string_pattern.match(data, pos - 1)
+                if raw:
+                    literal, end = raw_string_body(raw), raw.end()
+            if literal is None:
+                string = quoted[char].match(data, pos)
+                if string:
+                    end = string.end()
+                    literal = data[pos + 1:end - 1]
+                else:
+                    # an unclosed quote is an illegal character for the lexer
+                    end = pos + 1
+            if literal is not None:
+                line += data.count('\n', counted, pos)
+                counted = pos
+                yield (file, literal, line)
+        match = search(data, end)
+
+
+def extract_literals(file, data, full_lexer=False):
+    """(file, literal, line) of every string of the R code in data, the line starts at 1."""
+    if full_lexer:
+        return lex_literals(file, data)
+    return scan_literals(file, data)
+
+
+def lex_literals(file, data):
+    # every file gets its own copy of the lexer, which shares the tables of the process
+    lexer = r_lexer().clone()
+    lexer.current_file = file
+    lexer.lineno = 1
+    lexer.input(data)
+    # Tokenize and print tokens
+    while True:
+        tok = lexer.token()
+        if not tok:
+            break
+        elif tok.type == "STRING":
+            yield (file, tok.value, tok.lineno)
+
 
+# R scripts and R Markdown files, in any case
+r_extensions = ('.r', '.rmd')
 
-def process_folder(root_folder):
+
+def is_r_file(file):
+    return os.path.splitext(file)[1].lower() in r_extensions
+
+
+def file_literals(file, data, full_lexer=False):
+    """The literals of an R script, or of the r chunks of an R Markdown file, with the line in the file."""
+    if not file.lower().endswith('.rmd'):
+        yield from extract_literals(file, data, full_lexer)
+        return
+    for chunk in rmd_chunk.finditer(data):
+        if rmd_engines.get(chunk.group(1).lower()) != "R":
+            continue
+        offset = data.count('\n', 0, chunk.start(2))
+        for _, literal, line in extract_literals(file, chunk.group(2), full_lexer):
+            yield (file, literal, line + offset)
+
+
+def process_folder(root_folder, exclusions=None, full_lexer=False, classify_sql=False):
     console = Console()
-    import glob
-    files = glob.glob(os.path.join(root_folder,"**/*.R"),recursive=True)
-    processed_folder = []
-    for file in files:
+    processed_folder = set()
+    for file in iter_files(root_folder, exclusions):
+        if not is_r_file(file) or is_hidden(file, root_folder):
+            continue
         folder = os.path.dirname(file)
         if folder not in processed_folder:
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {folder}")
-            processed_folder.append(folder)
-        try:
-            with open(file,"r") as f:
-                logging.info(f"Processing file: {file}")
-                data = f.read()
-                lexer.current_file = file
-                lexer.lineno = 1
-                lexer.input(data)
-                # Tokenize and print tokens
-                while True:
-                    tok = lexer.token()
-                    if not tok:
-                        break
-                    elif tok.type == "STRING":
-                        yield (file, tok.value, tok.lineno)
-        except Exception as e:
-            logging.error(f"Error processing file: {file} - {e}")
-
-
-def scan_folders(folders_config, output_csv):
-     console = Console()
-     with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-        fieldnames = [
-            'FileName', 'Literal', 'Line'
-        ]
-        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+            processed_folder.add(folder)
+        yield (file, full_lexer, classify_sql)
+
+
+def do_file_processing(file, full_lexer=False, classify_sql=False):
+    try:
+        with open(file,"r") as f:
+            logging.info(f"Processing file: {file}")
+            data = f.read()
+        return list(literal_rows(file_literals(file, data, full_lexer), classify_sql))
+    except Exception as e:
+        logging.error(f"Error processing file: {file} - {e}")
+        return []
+
+
+report_path = os.path.join("Reports", "R_SQL_Snippets.csv")
+report_fieldnames = [
+    'FileName', 'Literal', 'Line'
+]
+# with --classify-sql
+classified_fieldnames = report_fieldnames + ['IsSQL', 'StatementType', 'Tables']
+
+# only the literals that start like a statement are parsed
+sql_prefilter = re.compile(r"[\s(]*(?:select|with|insert|update|delete|merge|create|drop|alter|truncate)\b", re.IGNORECASE)
+not_sql = (False, "", "")
+
+
+def parse_sql(statement, dialect="spark"):
+    """(is SQL, statement types, tables) of a literal, with the same dialect as sql_scripts_metrics.py."""
+    from sqlglot import ErrorLevel, expressions
+    from sqlglot.errors import SqlglotError
+    from sqlglot.dialects.dialect import Dialect
+    sql_dialect = Dialect.get_or_raise(dialect)
+    # the syntax errors are kept in parser.errors, the arguments are checked below
+    parser = sql_dialect.parser(error_level=ErrorLevel.IGNORE)
+    # sqlglot warns about every literal it parses as a Command, they are not SQL here
+    sqlglot_logger = logging.getLogger("sqlglot")
+    level = sqlglot_logger.level
+    sqlglot_logger.setLevel(logging.ERROR)
+    try:
+        parsed = [tree for tree in parser.parse(sql_dialect.tokenize(statement), statement) if tree is not None]
+    except SqlglotError:
+        return not_sql
+    finally:
+        sqlglot_logger.setLevel(level)
+    if parser.errors or not parsed:
+        return not_sql
+    for tree in parsed:
+        # what sqlglot does not understand comes back as a Command, like "create the report"
+        if isinstance(tree, expressions.Command):
+            return not_sql
+        # an operator without its operand ("WHERE c = ", the start of a paste0) is not a statement, a
+        # function called with the arguments of another dialect (date_add(ts)) still is
+        if any(node.error_messages() for node in tree.walk() if isinstance(node, (expressions.Binary, expressions.Unary))):
+            return not_sql
+    tables = {}
+    for tree in parsed:
+        ctes = {cte.alias for cte in tree.find_all(expressions.CTE)}
+        for table in tree.find_all(expressions.Table):
+            if table.name and table.name not in ctes:
+                tables[".".join(part for part in (table.catalog, table.db, table.name) if part)] = None
+    return True, "|".join(dict.fromkeys(tree.key for tree in parsed)), "|".join(tables)
+
+
+class SqlClassifier:
+    """
+    Classifies literals as SQL statements. The same queries are repeated in many scripts, so the
+    result is kept by the hash of the literal with its runs of spaces and tabs collapsed and every
+    distinct statement is parsed once per process. The newlines are kept in the key, a -- comment
+    ends with its line.
+    """
+
+    def __init__(self, dialect="spark"):
+        self.dialect = dialect
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, literal):
+        if not sql_prefilter.match(literal):
+            return not_sql
+        normalized = "\n".join(line for line in (" ".join(line.split()) for line in literal.splitlines()) if line)
+        key = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+        result = self.results.get(key)
+        if result is None:
+            self.misses += 1
+            result = self.results[key] = parse_sql(literal, self.dialect)
+        else:
+            self.hits += 1
+        return result
+
+
+@lru_cache(maxsize=None)
+def sql_classifier():
+    # one per process, the workers of --workers each keep their own results
+    return SqlClassifier()
+
+
+def literal_rows(literals, classify_sql=False):
+    for info in literals:
+        if info is not None:
+            file, literal, line = info
+            if len(literal) > 10:
+                row = {
+                    "FileName": file,
+                    "Literal": literal,
+                    "Line": line
+                }
+                if classify_sql:
+                    row["IsSQL"], row["StatementType"], row["Tables"] = sql_classifier().classify(literal)
+                yield row
+
+def collect_rows(file, root_path, source=None, full_lexer=False, classify_sql=False):
+    source = source or SourceFile(file)
+    yield from literal_rows(file_literals(file, source.text, full_lexer), classify_sql)
+
+def list_files(folders_config, full_lexer=False, classify_sql=False):
+    for config in folders_config:
+        root_path = config.get("root_path", "")
+        logging.info(f"Scanning folder: {root_path}")
+        exclusions = Exclusions.from_config(config)
+        yield from process_folder(root_path, exclusions, full_lexer, classify_sql)
+
+@contextmanager
+def open_output(output_csv, classify_sql=False, store_file=None):
+    # with a store the literals are written to it instead of the csv
+    if store_file:
+        with LiteralStore(store_file) as store:
+            yield store
+        return
+    with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
+        csv_writer = csv.DictWriter(csv_file, fieldnames=classified_fieldnames if classify_sql else report_fieldnames)
         csv_writer.writeheader()
+        yield csv_writer
 
-        for config in folders_config:
-            root_path = config.get("root_path", "")          
-            logging.info(f"Scanning folder: {root_path}")
-            for info in process_folder(root_path):
-                if info is not None:
-                    file, literal, line = info
-                    if len(literal) > 10:
-                        file_info = {
-                            "FileName": file,
-                            "Literal": literal,
-                            "Line": line
-                        }
-                        csv_writer.writerow(file_info)
+def scan_folders(folders_config, output_csv, full_lexer=False, workers=1, log_file=None, classify_sql=False, store_file=None):
+     with open_output(output_csv, classify_sql, store_file) as csv_writer:
+        # the files can be lexed by several worker processes, each one with its own lexer; the rows
+        # come back in walk order and only this process writes them
+        initializer = setup_logging if log_file else None
+        for rows in ordered_map(do_file_processing, list_files(folders_config, full_lexer, classify_sql), workers,
+                                initializer=initializer, initargs=(log_file,)):
+            csv_writer.writerows(rows)
 
 def setup_logging(log_file):
     logging.basicConfig(filename=log_file, level=logging.INFO,
@@ -192,10 +473,16 @@ def main():
     parser.add_argument("config_file", help="Path to the YAML configuration file")
     parser.add_argument("output_folder", help="Folder for all the tool output")
     #parser.add_argument("output_csv", help="Path to the output CSV file",default="FilesInventory.csv")
+    parser.add_argument("--full-lexer", action="store_true",
+                        help="Extract the literals with the complete R lexer instead of the literal scanner (same output, slower)")
+    parser.add_argument("--classify-sql", action="store_true",
+                        help="Parse the literals that look like SQL with sqlglot and add the IsSQL, StatementType and Tables columns")
+    parser.add_argument("--store", help="Path to a SQLite file where every distinct literal is written once with the list of its occurrences, instead of R_SQL_Snippets.csv (see literal_store.py)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes used to extract the literals (default 1)")
 
     args = parser.parse_args()
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports", "R_SQL_Snippets.csv")
+    output_csv = os.path.join(output_folder, report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","sql_snippets.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -204,9 +491,9 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
 
-            scan_folders(folder_config, output_csv)
+            scan_folders(folder_config, output_csv, args.full_lexer, args.workers, log_file, args.classify_sql, args.store)
 
     except FileNotFoundError:
         print(f"Error: Configuration file '{args.config_file}' not found.")
@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+"""
+Content addressed store of the literals found by literal_analyzer.py (`literal_analyzer.py --store
+<file>` or `assessment.py --literal-store <file>`), written instead of R_SQL_Snippets.csv. The same
+connection strings and query templates are repeated in many scripts, here every distinct literal is
+kept once. It is a SQLite file with three tables:
+
+- files(id, path)
+- literals(id, hash, literal, is_sql, statement_type, tables)
+- occurrences(literal_id, file_id, line)
+
+hash is the blake2b hash of the literal (result_cache.content_hash). is_sql, statement_type and
+tables are only set when the literals were classified (--classify-sql). Lines start at 1.
+
+It answers where a literal is used without scanning the estate again:
+
+    python3 literal_store.py literals.db where "SELECT * FROM sales"
+    python3 literal_store.py literals.db where --id 42
+    python3 literal_store.py literals.db top --limit 10
+    python3 literal_store.py literals.db stats
+"""
+import os
+import sqlite3
+import argparse
+
+from result_cache import content_hash
+
+
+class LiteralStore:
+    """
+    Writes a store from the rows of literal_analyzer.py (FileName, Literal, Line and, when classified,
+    IsSQL, StatementType, Tables). It has the writerow/writerows interface of the report writers, so
+    it can take the place of R_SQL_Snippets.csv in assessment.py.
+    """
+
+    def __init__(self, path, batch_rows=65536):
+        # every run writes a new store
+        if os.path.exists(path):
+            os.remove(path)
+        self.path = path
+        self.batch_rows = batch_rows
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, path TEXT)")
+        self.connection.execute("CREATE TABLE literals (id INTEGER PRIMARY KEY, hash TEXT, literal TEXT, is_sql INTEGER, statement_type TEXT, tables TEXT)")
+        self.connection.execute("CREATE TABLE occurrences (literal_id INTEGER, file_id INTEGER, line INTEGER)")
+        self.files = {}
+        # hash of every literal -> id, the text is only kept in the database
+        self.literals = {}
+        self.pending_literals = []
+        self.pending = []
+
+    def file_id(self, path):
+        file_id = self.files.get(path)
+        if file_id is None:
+            file_id = self.files[path] = len(self.files) + 1
+            self.connection.execute("INSERT INTO files VALUES (?, ?)", (file_id, path))
+        return file_id
+
+    def literal_id(self, row):
+        literal = row['Literal']
+        digest = content_hash(literal.encode('utf-8'))
+        literal_id = self.literals.get(digest)
+        if literal_id is None:
+            literal_id = self.literals[digest] = len(self.literals) + 1
+            is_sql = row.get('IsSQL')
+            self.pending_literals.append((literal_id, digest, literal, None if is_sql is None else int(bool(is_sql)),
+                                          row.get('StatementType'), row.get('Tables')))
+        return literal_id
+
+    def writerow(self, row):
+        self.pending.append((self.literal_id(row), self.file_id(row['FileName']), row['Line']))
+        if len(self.pending) >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        self.connection.executemany("INSERT INTO literals VALUES (?, ?, ?, ?, ?, ?)", self.pending_literals)
+        self.connection.executemany("INSERT INTO occurrences VALUES (?, ?, ?)", self.pending)
+        self.pending_literals = []
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        # built at the end, it is faster than keeping them up to date on every insert
+        self.connection.execute("CREATE INDEX occurrences_by_literal ON occurrences (literal_id, file_id)")
+        self.connection.execute("CREATE UNIQUE INDEX literals_by_hash ON literals (hash)")
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def literal_id(connection, literal):
+    row = connection.execute("SELECT id FROM literals WHERE hash = ?", (content_hash(literal.encode('utf-8')),)).fetchone()
+    return row[0] if row else None
+
+
+def where_used(connection, literal_id, limit=None):
+    """(path, line) of every occurrence of a literal, by path and line."""
+    return connection.execute("""
+        SELECT files.path, occurrences.line
+        FROM occurrences JOIN files ON files.id = occurrences.file_id
+        WHERE occurrences.literal_id = ?
+        ORDER BY files.path, occurrences.line
+        LIMIT ?""", (literal_id, -1 if limit is None else limit)).fetchall()
+
+
+def top_literals(connection, limit=20):
+    """(id, files, occurrences, literal) of the literals used in the most files."""
+    return connection.execute("""
+        SELECT literals.id, counts.files, counts.total, literals.literal
+        FROM (SELECT literal_id, COUNT(DISTINCT file_id) AS files, COUNT(*) AS total FROM occurrences GROUP BY literal_id) AS counts
+        JOIN literals ON literals.id = counts.literal_id
+        ORDER BY counts.files DESC, counts.total DESC, literals.id
+        LIMIT ?""", (limit,)).fetchall()
+
+
+def store_stats(connection):
+    """(files, distinct literals, occurrences, characters of the distinct literals, characters of all the occurrences)."""
+    return connection.execute("""
+        SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM literals), (SELECT COUNT(*) FROM occurrences),
+               (SELECT COALESCE(SUM(LENGTH(literal)), 0) FROM literals),
+               (SELECT COALESCE(SUM(LENGTH(literals.literal)), 0) FROM occurrences JOIN literals ON literals.id = occurrences.literal_id)""").fetchone()
+
+
+def preview(literal, width=100):
+    literal = " ".join(literal.split())
+    return literal if len(literal) <= width else literal[:width - 3] + "..."
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the literal store written by literal_analyzer.py --store.")
+    parser.add_argument("store_file", help="Path to the store file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    where = commands.add_parser("where", help="Every place where a literal is used, as path:line")
+    where.add_argument("literal", nargs="?", help="Text of the literal")
+    where.add_argument("--id", type=int, help="Id of the literal, as printed by top")
+    where.add_argument("--limit", type=int, help="Maximum number of occurrences")
+    top = commands.add_parser("top", help="Literals used in the most files")
+    top.add_argument("--limit", type=int, default=20, help="Number of literals (default 20)")
+    commands.add_parser("stats", help="Files, distinct literals and occurrences of the store")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store_file):
+        print(f"Error: Store file '{args.store_file}' not found.")
+        return
+    connection = sqlite3.connect(args.store_file)
+    try:
+        if args.command == "stats":
+            files, literals, occurrences, stored, written = store_stats(connection)
+            print(f"{files} files, {literals} distinct literals, {occurrences} occurrences")
+            print(f"{stored} characters stored for {written} characters of literals")
+        elif args.command == "top":
+            for found, files, total, literal in top_literals(connection, args.limit):
+                print(f"{found}\t{files}\t{total}\t{preview(literal)}")
+        else:
+            found = args.id if args.id is not None else literal_id(connection, args.literal or "")
+            if found is None:
+                print("The literal is not in the store.")
+            else:
+                for path, line in where_used(connection, found, args.limit):
+                    print(f"{path}:{line}")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
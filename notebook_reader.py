@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+"""
+Reads the cells of a Jupyter notebook (.ipynb) without nbformat.
+
+The scanners only need the type and the source of every cell and the language of the kernel.
+nbformat.reads builds the whole notebook, validates it against the schema and wraps every value,
+including the base64 images of the outputs. This reader walks the JSON text instead: the cell
+type, the source and the notebook metadata are decoded with the json module, every other value
+(outputs, attachments, cell metadata) is skipped by finding where it ends: only its quotes and
+brackets are looked at and strings are jumped over with str.find, so the outputs are never turned
+into Python objects. Small notebooks, where the outputs cost little, are decoded whole with
+json.loads, which is faster than walking them from Python.
+
+    notebook = read_notebook(text)
+    notebook.language          # "python", from the kernelspec or the language_info
+    for cell in notebook.cells:
+        cell.cell_type, cell.source
+
+`notebook_of(source)` keeps the result in the scan_utils.SourceFile, so the collectors that look
+at the same notebook in one run parse it once. Notebooks older than format 4 (no "cells" list)
+are read with nbformat, which converts them.
+"""
+import re
+import json
+from collections import namedtuple
+
+Cell = namedtuple("Cell", ["cell_type", "source"])
+Notebook = namedtuple("Notebook", ["language", "cells"])
+
+# notebooks up to this size are decoded whole
+walk_size = 256 * 1024
+
+decoder = json.JSONDecoder()
+whitespace = re.compile(r"[ \t\n\r]*")
+# inside an array or an object only quotes and brackets matter
+json_structure = re.compile(r'["\[\]{}]')
+json_scalar = re.compile(r"[^,}\]\s]+")
+
+
+def skip_space(text, pos):
+    return whitespace.match(text, pos).end()
+
+
+def expect(text, pos, char):
+    pos = skip_space(text, pos)
+    if text[pos:pos + 1] != char:
+        raise ValueError(f"Invalid notebook JSON: expected '{char}' at position {pos}")
+    return pos + 1
+
+
+def skip_string(text, pos):
+    """Returns the position after the string whose opening quote is at pos."""
+    # str.find jumps over the string in C, the base64 of an image has no quotes nor backslashes
+    end = text.find('"', pos + 1)
+    while end > 0:
+        # the quote is escaped when an odd number of backslashes come before it
+        before = end - 1
+        while text[before] == '\\':
+            before -= 1
+        if (end - 1 - before) % 2 == 0:
+            return end + 1
+        end = text.find('"', end + 1)
+    raise ValueError(f"Invalid notebook JSON: unterminated string at position {pos}")
+
+
+def skip_value(text, pos):
+    """Returns the position after the JSON value that starts at pos."""
+    pos = skip_space(text, pos)
+    first = text[pos:pos + 1]
+    if first == '"':
+        return skip_string(text, pos)
+    if first in ('[', '{'):
+        depth = 0
+        search = json_structure.search
+        match = search(text, pos)
+        while match is not None:
+            token = match.group()
+            if token == '"':
+                end = skip_string(text, match.start())
+            else:
+                end = match.end()
+                depth += 1 if token in ('[', '{') else -1
+                if depth == 0:
+                    return end
+            match = search(text, end)
+        match = None
+    else:
+        match = json_scalar.match(text, pos)
+    if match is None:
+        raise ValueError(f"Invalid notebook JSON: bad value at position {pos}")
+    return match.end()
+
+
+def decode_value(text, pos):
+    return decoder.raw_decode(text, skip_space(text, pos))
+
+
+def object_items(text, pos):
+    """Yields (key, position of the value) for the object at pos. The caller moves to the end of each value."""
+    pos = expect(text, pos, '{')
+    pos = skip_space(text, pos)
+    if text[pos:pos + 1] == '}':
+        return pos + 1
+    while True:
+        key, pos = decode_value(text, pos)
+        pos = expect(text, pos, ':')
+        pos = yield key, pos
+        pos = skip_space(text, pos)
+        if text[pos:pos + 1] == ',':
+            pos += 1
+            continue
+        return expect(text, pos, '}')
+
+
+def walk_object(text, pos, handle):
+    """Calls handle(key, position) for every item of the object at pos, handle returns the end of the value."""
+    items = object_items(text, pos)
+    try:
+        key, value_pos = next(items)
+        while True:
+            key, value_pos = items.send(handle(key, value_pos))
+    except StopIteration as end:
+        return end.value
+
+
+def read_cell(text, pos):
+    cell = {}
+
+    def handle(key, value_pos):
+        if key in ("cell_type", "source"):
+            cell[key], end = decode_value(text, value_pos)
+            return end
+        # outputs, attachments, metadata... are skipped without decoding them
+        return skip_value(text, value_pos)
+
+    end = walk_object(text, pos, handle)
+    return Cell(cell.get("cell_type"), cell_source(cell.get("source", ""))), end
+
+
+def kernel_language(metadata):
+    if not isinstance(metadata, dict):
+        return None
+    return (metadata.get("kernelspec") or {}).get("language") or (metadata.get("language_info") or {}).get("name")
+
+
+def cell_source(source):
+    return "".join(source) if isinstance(source, list) else source
+
+
+def read_notebook(text):
+    """Returns the Notebook of the JSON text of an .ipynb file."""
+    if len(text) <= walk_size:
+        notebook = json.loads(text)
+        if not isinstance(notebook, dict) or "cells" not in notebook:
+            return read_old_notebook(text)
+        return Notebook(kernel_language(notebook.get("metadata")),
+                        [Cell(cell.get("cell_type"), cell_source(cell.get("source", ""))) for cell in notebook["cells"]])
+    found = {}
+
+    def handle(key, value_pos):
+        if key == "metadata":
+            found["metadata"], end = decode_value(text, value_pos)
+            return end
+        if key != "cells":
+            return skip_value(text, value_pos)
+        cells = found["cells"] = []
+        pos = expect(text, value_pos, '[')
+        pos = skip_space(text, pos)
+        if text[pos:pos + 1] == ']':
+            return pos + 1
+        while True:
+            cell, pos = read_cell(text, pos)
+            cells.append(cell)
+            pos = skip_space(text, pos)
+            if text[pos:pos + 1] == ',':
+                pos += 1
+                continue
+            return expect(text, pos, ']')
+
+    walk_object(text, 0, handle)
+    if "cells" not in found:
+        return read_old_notebook(text)
+    return Notebook(kernel_language(found.get("metadata")), found["cells"])
+
+
+def read_old_notebook(text):
+    # format 3 notebooks keep their cells in worksheets, nbformat converts them
+    import nbformat
+    notebook = nbformat.reads(text, as_version=4)
+    return Notebook(kernel_language(notebook.get("metadata")), [Cell(cell.get("cell_type"), cell.get("source", "")) for cell in notebook.cells])
+
+
+def notebook_of(source):
+    """The Notebook of a scan_utils.SourceFile, read once per run."""
+    return source.memo("notebook", lambda: read_notebook(source.text))
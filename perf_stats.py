@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+"""
+Optional timing of the scan loop (`assessment.py --profile`).
+
+For every file it records the time spent reading it, the time spent in each collector and the
+total wall time, and writes:
+
+- Reports/Performance.csv: one row per file and stage (read, one per collector, total).
+- Reports/PerformanceSlowestFiles.csv: the N files with the longest total time and their slowest stage.
+- Reports/PerformanceHistogram.csv: per extension, number of files in each latency bucket.
+
+Rows are streamed to Performance.csv as the scan goes, only the top N files and the histogram
+counters are kept in memory. When profiling is off the scan loop does not create this object at all.
+"""
+import csv
+import heapq
+import os
+
+report_path = "Reports/Performance.csv"
+report_fieldnames = ["FileName", "Extension", "Stage", "Seconds", "Bytes", "Cached"]
+slowest_report_path = "Reports/PerformanceSlowestFiles.csv"
+slowest_report_fieldnames = ["FileName", "Extension", "Seconds", "Bytes", "SlowestStage", "SlowestStageSeconds"]
+histogram_report_path = "Reports/PerformanceHistogram.csv"
+# upper bound of every bucket in seconds, the last one takes everything else
+histogram_buckets = [(0.001, "<1ms"), (0.01, "1-10ms"), (0.1, "10-100ms"), (1.0, "100ms-1s"), (10.0, "1-10s"), (None, ">=10s")]
+histogram_report_fieldnames = ["Extension", "Files", "Bytes", "TotalSeconds", "MaxSeconds"] + [label for _, label in histogram_buckets]
+
+
+def file_extension(file_path):
+    name = os.path.basename(file_path)
+    ext = os.path.splitext(name)[1]
+    return ext if ext else name
+
+
+class PerfStats:
+    def __init__(self, output_folder, top=20):
+        self.output_folder = output_folder
+        self.top = top
+        self.slowest = []
+        self.histogram = {}
+        self.counter = 0
+        path = os.path.join(output_folder, report_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, fieldnames=report_fieldnames)
+        self.writer.writeheader()
+
+    def record_file(self, file_path, size, read_seconds, stages, total_seconds):
+        """stages is a list of (collector name, seconds, cached) in the order they ran."""
+        ext = file_extension(file_path)
+        rows = [{"FileName": file_path, "Extension": ext, "Stage": "read", "Seconds": f"{read_seconds:.6f}", "Bytes": size, "Cached": False}]
+        rows.extend({"FileName": file_path, "Extension": ext, "Stage": name, "Seconds": f"{seconds:.6f}", "Bytes": size, "Cached": cached}
+                    for name, seconds, cached in stages)
+        rows.append({"FileName": file_path, "Extension": ext, "Stage": "total", "Seconds": f"{total_seconds:.6f}", "Bytes": size, "Cached": False})
+        self.writer.writerows(rows)
+
+        slowest_stage, slowest_seconds = max([("read", read_seconds)] + [(name, seconds) for name, seconds, _ in stages],
+                                             key=lambda stage: stage[1])
+        # the counter breaks ties so the heap never compares the other fields
+        self.counter += 1
+        entry = (total_seconds, self.counter, file_path, ext, size, slowest_stage, slowest_seconds)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+        bucket = self.histogram.get(ext)
+        if bucket is None:
+            bucket = self.histogram[ext] = {"Files": 0, "Bytes": 0, "TotalSeconds": 0.0, "MaxSeconds": 0.0,
+                                            **{label: 0 for _, label in histogram_buckets}}
+        bucket["Files"] += 1
+        bucket["Bytes"] += size
+        bucket["TotalSeconds"] += total_seconds
+        bucket["MaxSeconds"] = max(bucket["MaxSeconds"], total_seconds)
+        for limit, label in histogram_buckets:
+            if limit is None or total_seconds < limit:
+                bucket[label] += 1
+                break
+
+    def close(self):
+        self.file.close()
+        with open(os.path.join(self.output_folder, slowest_report_path), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=slowest_report_fieldnames)
+            writer.writeheader()
+            for seconds, _, file_path, ext, size, stage, stage_seconds in sorted(self.slowest, reverse=True):
+                writer.writerow({"FileName": file_path, "Extension": ext, "Seconds": f"{seconds:.6f}", "Bytes": size,
+                                 "SlowestStage": stage, "SlowestStageSeconds": f"{stage_seconds:.6f}"})
+        with open(os.path.join(self.output_folder, histogram_report_path), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=histogram_report_fieldnames)
+            writer.writeheader()
+            for ext, bucket in sorted(self.histogram.items(), key=lambda item: -item[1]["TotalSeconds"]):
+                writer.writerow({"Extension": ext, **bucket, "TotalSeconds": f"{bucket['TotalSeconds']:.6f}",
+                                 "MaxSeconds": f"{bucket['MaxSeconds']:.6f}"})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+"""
+Report writers used by the scanners.
+
+`open_report` returns an object with the `writerow`/`writerows` interface of csv.DictWriter for one
+of the supported output formats:
+
+- csv: the default, same files as always.
+- parquet: columnar file written in row groups of `batch_rows` rows. String columns are dictionary
+  encoded, so the file paths and the constant columns repeated on every row are stored once per row group.
+- arrow: Arrow IPC stream with the same layout, used when pyarrow is installed without Parquet support.
+
+pyarrow is only needed for parquet/arrow. If it is not installed the report falls back to csv.
+"""
+import csv
+import logging
+import os
+
+output_formats = ("csv", "parquet", "arrow")
+default_batch_rows = 65536
+
+
+class CsvReportWriter:
+    def __init__(self, path, fieldnames, dialect="excel"):
+        self.path = path
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.DictWriter(self.file, dialect=dialect, fieldnames=fieldnames)
+        self.writer.writeheader()
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def writerows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArrowReportWriter:
+    """Buffers rows column by column and writes them as Parquet row groups or Arrow record batches."""
+
+    def __init__(self, path, fieldnames, output_format, column_types=None, batch_rows=default_batch_rows):
+        import pyarrow as pa
+        self.pa = pa
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.field_set = set(self.fieldnames)
+        self.batch_rows = batch_rows
+        column_types = column_types or {}
+        self.types = [getattr(pa, column_types.get(name, "string"))() for name in self.fieldnames]
+        self.schema = pa.schema([
+            pa.field(name, pa.dictionary(pa.int32(), pa.string()) if arrow_type == pa.string() else arrow_type)
+            for name, arrow_type in zip(self.fieldnames, self.types)
+        ])
+        self.columns = [[] for _ in self.fieldnames]
+        self.buffered = 0
+        if output_format == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(path, self.schema)
+            self.write_batch = lambda batch: self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.sink = pa.OSFile(path, 'wb')
+            # the stream format allows a different dictionary in every batch
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+            self.write_batch = self.writer.write_batch
+
+    def writerow(self, row):
+        if row.keys() - self.field_set:
+            raise ValueError(f"dict contains fields not in fieldnames: {', '.join(repr(k) for k in row.keys() - self.field_set)}")
+        for column, name in zip(self.columns, self.fieldnames):
+            column.append(row.get(name))
+        self.buffered += 1
+        if self.buffered >= self.batch_rows:
+            self.flush()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def flush(self):
+        if not self.buffered:
+            return
+        pa = self.pa
+        arrays = []
+        for values, arrow_type in zip(self.columns, self.types):
+            if arrow_type == pa.string():
+                values = [None if value is None else str(value) for value in values]
+                arrays.append(pa.array(values, type=pa.string()).dictionary_encode())
+            else:
+                arrays.append(pa.array(values, type=arrow_type))
+        self.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.columns = [[] for _ in self.fieldnames]
+        self.buffered = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+        if hasattr(self, 'sink'):
+            self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReportTee:
+    """Writes the same rows to several writers, for example a report and keyword_matrix.KeywordMatrix."""
+
+    def __init__(self, *writers):
+        self.writers = writers
+
+    def writerow(self, row):
+        for writer in self.writers:
+            writer.writerow(row)
+
+    def writerows(self, rows):
+        rows = list(rows)
+        for writer in self.writers:
+            writer.writerows(rows)
+
+
+def resolve_format(output_format):
+    """Returns the format that can actually be written: parquet -> arrow -> csv depending on what is installed."""
+    if output_format == "csv":
+        return "csv"
+    try:
+        import pyarrow
+    except ImportError:
+        logging.warning("pyarrow is not installed, writing csv reports")
+        return "csv"
+    if output_format == "parquet":
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            logging.warning("pyarrow was built without parquet support, writing arrow reports")
+            return "arrow"
+    return output_format
+
+
+def report_file_name(csv_path, output_format):
+    if output_format == "csv":
+        return csv_path
+    return os.path.splitext(csv_path)[0] + "." + output_format
+
+
+def open_report(csv_path, fieldnames, output_format="csv", dialect="excel", column_types=None, batch_rows=default_batch_rows):
+    """
+    Opens a report writer. csv_path is the name of the csv report, for the other formats the
+    extension is replaced. column_types maps column names to pyarrow type names (for example
+    'int64'), the other columns are dictionary encoded strings.
+    """
+    output_format = resolve_format(output_format)
+    path = report_file_name(csv_path, output_format)
+    if output_format == "csv":
+        return CsvReportWriter(path, fieldnames, dialect)
+    return ArrowReportWriter(path, fieldnames, output_format, column_types, batch_rows)
@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+"""
+Persistent cache of the rows produced by each collector for each file.
+
+Entries are keyed by (collector, path). A cached entry is replayed when the collector stamp still
+matches and the file has the same size and mtime; when only the mtime changed the content hash is
+compared before giving up. The stamp is derived from the collector source code, the parts of the
+configuration it depends on and the versions of the parsing libraries, so changing one collector (or
+its settings) only invalidates its entries and upgrading a parser invalidates the rows it produced.
+"""
+import hashlib
+import json
+import sqlite3
+from importlib import metadata
+from functools import lru_cache
+
+import scan_utils
+import sniffer
+
+schema_version = 1
+
+# the libraries whose parsers produce rows, a new version can change them
+parser_packages = ("sqlglot", "javalang", "nbformat", "pyarrow", "ply")
+
+
+@lru_cache(maxsize=None)
+def package_versions():
+    versions = {}
+    for package in parser_packages:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def version_stamp(module, settings=None, helpers=()):
+    # helpers are the other modules whose code changes the rows of the collector
+    h = hashlib.sha1()
+    for m in (module, scan_utils, sniffer) + tuple(helpers):
+        with open(m.__file__, 'rb') as f:
+            h.update(f.read())
+    h.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+    h.update(json.dumps(package_versions(), sort_keys=True).encode('utf-8'))
+    return h.hexdigest()
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path, commit_every=1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.connection.execute("SELECT value FROM meta WHERE key='schema_version'").fetchone()
+        if row is None or int(row[0]) != schema_version:
+            self.connection.execute("DROP TABLE IF EXISTS results")
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (str(schema_version),))
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS results (
+            collector TEXT, path TEXT, stamp TEXT, size INTEGER, mtime_ns INTEGER, hash TEXT, rows TEXT,
+            PRIMARY KEY (collector, path))""")
+        self.connection.commit()
+
+    def get(self, collector, stamp, source):
+        """Returns the cached rows for source or None when they have to be computed again."""
+        entry = self.connection.execute(
+            "SELECT stamp, size, mtime_ns, hash, rows FROM results WHERE collector=? AND path=?",
+            (collector, source.path)).fetchone()
+        if entry is None:
+            self.misses += 1
+            return None
+        cached_stamp, size, mtime_ns, cached_hash, rows = entry
+        st = source.stat()
+        if cached_stamp != stamp or size != st.st_size:
+            self.misses += 1
+            return None
+        if mtime_ns != st.st_mtime_ns:
+            # touched but maybe not modified (checkout, copy), compare the content
+            if cached_hash is None or cached_hash != self.source_hash(source):
+                self.misses += 1
+                return None
+            self.connection.execute("UPDATE results SET mtime_ns=? WHERE collector=? AND path=?",
+                                    (st.st_mtime_ns, collector, source.path))
+            self._count_write()
+        self.hits += 1
+        return json.loads(rows)
+
+    def put(self, collector, stamp, source, rows):
+        st = source.stat()
+        # only hash what some collector already read, files that were never opened are cheap to redo
+        file_hash = self.source_hash(source) if source.is_loaded else None
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                (collector, source.path, stamp, st.st_size, st.st_mtime_ns, file_hash,
+                                 json.dumps(rows, default=str)))
+        self._count_write()
+
+    def source_hash(self, source):
+        return source.memo("content_hash", lambda: content_hash(source.data))
+
+    def _count_write(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.connection.commit()
+            self.pending = 0
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
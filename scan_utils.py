@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+"""
+Helpers shared by the folder scanners (inventory.py, keywords.py, import_inventory.py, ...).
+
+`SourceFile` wraps a path so that its bytes are read once, decoded once and handed to every
+collector that is interested in it (see assessment.py, which runs all the collectors in one walk).
+The encoding is sniffed from the first bytes (sniffer.py), so binary files can be skipped
+without reading them whole and files that are not utf-8 are still decoded.
+
+`iter_entries` walks a root_path with os.scandir and yields DirEntry objects, which already know
+whether they are files and keep their stat, so `SourceFile(entry.path, entry)` does not stat the
+file again. `iter_files` is the same walk yielding paths.
+"""
+import io
+import os
+import stat
+import time
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+from sniffer import sniff, sniff_size
+
+# files up to this size are read whole the first time any byte is needed, bigger ones only read
+# their first sniff_size bytes to be sniffed
+small_file_size = 64 * 1024
+
+
+def decode_text(data, encoding='utf-8'):
+    # same result as reading the file with open(..., 'r'): strict decoding and universal newlines
+    text = data.decode(encoding)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+class SourceFile:
+    """A file found while scanning. Content is loaded lazily and kept for the other collectors."""
+
+    def __init__(self, path, entry=None):
+        self.path = path
+        # the os.DirEntry found by iter_entries, it caches the file type and the stat
+        self._entry = entry
+        self._stat = None
+        self._data = None
+        self._text = None
+        self._head = None
+        self._sniff = None
+        self._memo = {}
+        self.read_seconds = 0.0
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = self._entry.stat() if self._entry is not None else os.stat(self.path)
+        return self._stat
+
+    def is_file(self):
+        try:
+            if self._entry is not None:
+                return self._entry.is_file()
+            return stat.S_ISREG(self.stat().st_mode)
+        except OSError:
+            return False
+
+    @property
+    def size(self):
+        return self.stat().st_size
+
+    @property
+    def is_loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            start = time.perf_counter()
+            with open(self.path, 'rb') as f:
+                self._data = f.read()
+            self.read_seconds = time.perf_counter() - start
+        return self._data
+
+    @property
+    def head(self):
+        """The first bytes of the file, enough to sniff it."""
+        if self._head is None:
+            if self._data is not None or self.size <= small_file_size:
+                self._head = self.data[:sniff_size]
+            else:
+                with open(self.path, 'rb') as f:
+                    self._head = f.read(sniff_size)
+        return self._head
+
+    def sniff(self):
+        if self._sniff is None:
+            self._sniff = sniff(self.head)
+        return self._sniff
+
+    @property
+    def is_binary(self):
+        return self.sniff()[0]
+
+    @property
+    def encoding(self):
+        """Codec of the text of the file (see sniffer.py), None for binary files."""
+        return self.sniff()[1]
+
+    @property
+    def text(self):
+        if self._text is None:
+            encoding = self.encoding or 'utf-8'
+            try:
+                self._text = decode_text(self.data, encoding)
+            except UnicodeDecodeError as e:
+                # only the head was sniffed, the rest of the file can still have other bytes
+                logging.warning(f"File {self.path} is not {encoding} ({e}), decoding it as latin-1")
+                self._text = decode_text(self.data, 'latin-1')
+        return self._text
+
+    def lines(self):
+        # equivalent to f.readlines() on a file opened in text mode
+        return io.StringIO(self.text).readlines()
+
+    def memo(self, key, compute):
+        # lets several collectors share an expensive parse of the same file
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+
+def scan_dir(path, stat_files=False):
+    """Lists a folder. With stat_files the stat of the files is fetched now and kept by their DirEntry."""
+    with os.scandir(path) as it:
+        entries = list(it)
+    if stat_files:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    entry.stat()
+            except OSError:
+                pass
+    return entries
+
+
+def walk_entries(top, top_rel, exclusions, executor=None, prefetch=0):
+    # same order as os.walk(top): the files of a folder, then each subfolder in turn. Symbolic
+    # links to folders are not followed and folders that cannot be listed are skipped.
+    stack = [(top, top_rel, None)]
+    while stack:
+        path, rel, listing = stack.pop()
+        try:
+            entries = listing.result() if listing is not None else scan_dir(path)
+        except OSError:
+            continue
+        files = []
+        dirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                if exclusions is None or not exclusions.file_excluded(entry.name, rel + entry.name):
+                    files.append(entry)
+            elif exclusions is None or not exclusions.folder_excluded(entry.name, rel + entry.name):
+                try:
+                    if not entry.is_symlink():
+                        dirs.append(entry)
+                except OSError:
+                    pass
+        stack.extend((entry.path, rel + entry.name + '/', None) for entry in reversed(dirs))
+        if executor is not None:
+            # list the next folders of the walk while the files of this one are processed
+            for i in range(len(stack) - 1, max(len(stack) - 1 - prefetch, -1), -1):
+                next_path, next_rel, next_listing = stack[i]
+                if next_listing is None:
+                    stack[i] = (next_path, next_rel, executor.submit(scan_dir, next_path, True))
+        yield from files
+
+
+def iter_entries(root_path, exclusions=None, prefetch=0):
+    """
+    Yields an os.DirEntry for every file under root_path. Folders rejected by exclusions (an
+    exclusions.Exclusions) are pruned before the walk descends into them. With prefetch > 0 the
+    next folders of the walk are listed, and their files stat'ed, on that many threads.
+    """
+    executor = ThreadPoolExecutor(max_workers=prefetch) if prefetch > 0 else None
+    try:
+        for entry in scan_dir(root_path):
+            name = entry.name
+            try:
+                is_file = entry.is_file()
+                is_dir = not is_file and entry.is_dir()
+            except OSError:
+                continue
+            if is_file:
+                if exclusions is None or not exclusions.file_excluded(name, name):
+                    yield entry
+            elif is_dir and (exclusions is None or not exclusions.folder_excluded(name, name)):
+                yield from walk_entries(entry.path, name + '/', exclusions, executor, prefetch * 4)
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_files(root_path, exclusions=None):
+    """Yields the path of every file under root_path, see iter_entries."""
+    for entry in iter_entries(root_path, exclusions):
+        yield entry.path
+
+
+def is_hidden(file_path, root_path):
+    # glob("**/*") skips dot folders and dot files, the literal and SQL scanners rely on that
+    return any(part.startswith('.') for part in os.path.relpath(file_path, root_path).split(os.sep))
+
+
+def _run_batch(func, batch):
+    return [func(*args) for args in batch]
+
+
+def ordered_map(func, items, workers=1, batch_size=256, initializer=None, initargs=()):
+    """
+    Yields func(*args) for every args tuple in items, in the same order as items.
+    With workers > 1 the calls run on a process pool in batches of batch_size; at most
+    2 * workers batches are in flight so a huge walk never queues up in memory.
+    func must be a module level function so it can be sent to the workers.
+    """
+    if workers <= 1:
+        for args in items:
+            yield func(*args)
+        return
+    items = iter(items)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        while True:
+            batch = list(islice(items, batch_size))
+            if batch:
+                pending.append(pool.submit(_run_batch, func, batch))
+            if pending and (not batch or len(pending) >= 2 * workers):
+                yield from pending.popleft().result()
+            elif not batch:
+                break
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+"""
+Guesses from the first bytes of a file whether it is binary and which encoding its text uses.
+
+    is_binary, encoding = sniff(head)
+
+- Binary: a known magic number (images, archives, executables, class files, databases...), NUL
+  bytes that are not explained by a UTF-16 encoding, or bytes that are not utf-8 and have many
+  control characters (compressed or encrypted data). The magic numbers made of printable ascii
+  ("PAR1", "ID3", "BM"...) also need NUL bytes after them or a head that is not utf-8.
+- Encoding: the byte order mark when there is one, otherwise utf-8 when the bytes are valid utf-8
+  and latin-1 (which can decode anything) when they are not. UTF-16 text without a BOM is
+  recognised by the NUL bytes on every other position.
+
+The encoding is a Python codec name: 'utf-8-sig', 'utf-16' and 'utf-32' remove the BOM while decoding.
+"""
+import codecs
+
+sniff_size = 8192
+
+magic_numbers = [
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+    (b"%PDF-", "pdf"),
+    (b"PK\x03\x04", "zip"),
+    (b"PK\x05\x06", "zip"),
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bzip2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"7z\xbc\xaf\x27\x1c", "7z"),
+    (b"Rar!\x1a\x07", "rar"),
+    (b"\x7fELF", "elf"),
+    (b"MZ", "exe"),
+    (b"\xca\xfe\xba\xbe", "class"),
+    (b"\xcf\xfa\xed\xfe", "mach-o"),
+    (b"\xfe\xed\xfa\xcf", "mach-o"),
+    (b"SQLite format 3\x00", "sqlite"),
+    (b"PAR1", "parquet"),
+    (b"ARROW1", "arrow"),
+    (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+    (b"\x00asm", "wasm"),
+    (b"OggS", "ogg"),
+    (b"ID3", "mp3"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+# magic numbers made of printable ascii can also start a text file ("ID3 tags", "PAR1 = ...")
+text_magic_numbers = {magic for magic, _ in magic_numbers if all(0x20 <= byte < 0x7f for byte in magic)}
+# utf-32 goes first: its little endian BOM starts with the utf-16 one
+boms = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+
+def binary_magic(head):
+    """Returns the kind of binary file announced by the magic number of head, or None."""
+    for magic, kind in magic_numbers:
+        if head.startswith(magic):
+            # the ones that could be text are only trusted when NUL bytes follow or the head is not utf-8
+            if magic not in text_magic_numbers or b"\x00" in head[:64] or not is_utf8(head):
+                return kind
+    return None
+
+
+def utf16_without_bom(head):
+    # ascii text encoded as UTF-16 has a NUL in every other byte
+    if len(head) < 16:
+        return None
+    even = head[0::2].count(0)
+    odd = head[1::2].count(0)
+    half = len(head) // 2
+    if odd > half * 0.4 and even < half * 0.05:
+        return "utf-16-le"
+    if even > half * 0.4 and odd < half * 0.05:
+        return "utf-16-be"
+    return None
+
+
+def is_utf8(head):
+    # the last character can be cut by the end of the head, so the decoder is not told it is final
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+# control characters that do not show up in text files
+control_bytes = bytes(range(0x00, 0x09)) + bytes(range(0x0e, 0x20)) + b"\x7f"
+max_control_ratio = 0.05
+
+
+def control_ratio(head):
+    return (len(head) - len(head.translate(None, control_bytes))) / len(head) if head else 0
+
+
+def sniff(head):
+    """Returns (is_binary, encoding) for the first bytes of a file, encoding is None for binary files."""
+    for bom, encoding in boms:
+        if head.startswith(bom):
+            return False, encoding
+    if binary_magic(head):
+        return True, None
+    if b"\x00" in head:
+        encoding = utf16_without_bom(head)
+        if encoding:
+            return False, encoding
+        return True, None
+    if is_utf8(head):
+        return False, "utf-8"
+    if control_ratio(head) > max_control_ratio:
+        return True, None
+    return False, "latin-1"
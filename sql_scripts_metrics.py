@@ -8,13 +8,46 @@ import csv
 from rich.console import Console
 import yaml
 import sqlglot
+
+from scan_utils import SourceFile, iter_files, is_hidden
+from exclusions import Exclusions, folders_from_config
 console = Console()
 
-def process_folder(root_folder):
-    import glob
-    files = glob.glob(os.path.join(root_folder,"**/*.sql"),recursive=True)
+report_path = os.path.join("Reports", "SQL_metrics.csv")
+report_fieldnames = [
+    'FileName', 'Key', 'Name','Lines','Characters', 'Tables'
+]
+errors_report_path = os.path.join("Reports", "SQL_metrics_errors.csv")
+errors_report_fieldnames = ['FileName', 'Error', 'Line','Col']
+
+def analyze_sql_script(file, sql_script):
+    try:
+        parsed_sql = sqlglot.parse(sql_script,dialect="spark")
+        if parsed_sql:
+            for statement in parsed_sql:
+                str_statement = str(statement)
+                LOC = len(str_statement.splitlines())
+                characters = len(str_statement)
+                key = statement.key
+                table_names = ""
+                try:
+                    tables = list(statement.find_all(sqlglot.expressions.Table))
+                    if tables:
+                        table_names = '|'.join([x.name for x in tables if x.name])
+                except Exception as ex1:
+                    print("ooops")
+                    logging.error("Error extracting tables info")
+                name = statement.name or statement.this.name
+                yield ("OK","",file,key,name, LOC,characters, table_names)
+    except Exception as e:
+        logging.error(f"Error parsing sql script {file}. Error {e}")
+        yield ("ERROR",e,file,None,None,None,None, None)
+
+def process_folder(root_folder, exclusions=None):
     processed_folder = []
-    for file in files:
+    for file in iter_files(root_folder, exclusions):
+        if not file.endswith(".sql") or is_hidden(file, root_folder):
+            continue
         folder = os.path.dirname(file)
         if folder not in processed_folder:
             console.print(f"[bold magenta]Scanning folder:[/bold magenta] {folder}")
@@ -22,70 +55,70 @@ def process_folder(root_folder):
         try:
             with open(file,"r") as f:
                 logging.info(f"Processing file: {file}")
-                sql_script = open(file).read()
-                parsed_sql = sqlglot.parse(sql_script,dialect="spark")
-                if parsed_sql:
-                    for statement in parsed_sql:
-                        str_statement = str(statement)
-                        LOC = len(str_statement.splitlines())
-                        characters = len(str_statement)
-                        key = statement.key
-                        table_names = ""
-                        try:
-                            tables = list(statement.find_all(sqlglot.expressions.Table))
-                            if tables:
-                                table_names = '|'.join([x.name for x in tables if x.name])
-                        except Exception as ex1:
-                            print("ooops")
-                            logging.error("Error extracting tables info")
-                        name = statement.name or statement.this.name
-                        yield ("OK","",file,key,name, LOC,characters, table_names)
+                sql_script = f.read()
         except Exception as e:
             logging.error(f"Error parsing sql script {file}. Error {e}")
             yield ("ERROR",e,file,None,None,None,None, None)
+            continue
+        yield from analyze_sql_script(file, sql_script)
+
+def metric_rows(info):
+    status, exception, file, key,name, loc, chars, table_names = info
+    if status == "OK":
+        yield {
+            "FileName": file,
+            "Key": key,
+            "Name":name,
+            "Lines": loc,
+            "Characters": chars,
+            "Tables": table_names
+        }
+
+def error_rows(info):
+    status, exception, file, key,name, loc, chars, table_names = info
+    if status != "OK":
+        if isinstance(exception, sqlglot.ParseError):
+            for error in exception.errors:
+                yield {
+                    "FileName": file,
+                    "Error": error['description'],
+                    "Line": error['line'],
+                    "Col": error['col']
+                }
+        #else:
+        #    print(exception)
+
+def analyze_source(file, source):
+    # the metrics and the errors report share one parse of the script
+    return source.memo("sql_scripts_metrics", lambda: list(analyze_sql_script(file, source.text)))
+
+def collect_rows(file, root_path, source=None):
+    source = source or SourceFile(file)
+    for info in analyze_source(file, source):
+        yield from metric_rows(info)
+
+def collect_error_rows(file, root_path, source=None):
+    source = source or SourceFile(file)
+    for info in analyze_source(file, source):
+        yield from error_rows(info)
 
 def scan_folders(folders_config, output_csv, output_csv_errors):
      console = Console()
      with open(output_csv_errors, 'w', newline='', encoding='utf-8') as csv_file_errors:
-        fieldnames = ['FileName', 'Error', 'Line','Col']
-        csv_file_errors_writer = csv.DictWriter(csv_file_errors, fieldnames=fieldnames)
+        csv_file_errors_writer = csv.DictWriter(csv_file_errors, fieldnames=errors_report_fieldnames)
         csv_file_errors_writer.writeheader()
         with open(output_csv, 'w', newline='', encoding='utf-8') as csv_file:
-            fieldnames = [
-                'FileName', 'Key', 'Name','Lines','Characters', 'Tables'
-            ]
-            csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
+            csv_writer = csv.DictWriter(csv_file, fieldnames=report_fieldnames)
             csv_writer.writeheader()
 
             for config in folders_config:
                 root_path = config.get("root_path", "")
                 console.print(f"[bold cyan]Scanning folder:[/bold cyan] {root_path}")
                 logging.info(f"Scanning folder: {root_path}")
-                for info in process_folder(root_path):
+                for info in process_folder(root_path, Exclusions.from_config(config)):
                     if info is not None:
-                        status, exception, file, key,name, loc, chars, table_names = info
-                        if status == "OK":
-                            file_info = {
-                                "FileName": file,
-                                "Key": key,
-                                "Name":name,
-                                "Lines": loc,
-                                "Characters": chars,
-                                "Tables": table_names
-                            }
-                            csv_writer.writerow(file_info)
-                        else:
-                            if isinstance(exception, sqlglot.ParseError):
-                                for error in exception.errors:
-                                    file_info = {
-                                        "FileName": file,
-                                        "Error": error['description'],
-                                        "Line": error['line'],
-                                        "Col": error['col']
-                                    }
-                                    csv_file_errors_writer.writerow(file_info)
-                            #else:
-                            #    print(exception)
+                        csv_writer.writerows(metric_rows(info))
+                        csv_file_errors_writer.writerows(error_rows(info))
 
 
 def setup_logging(log_file):
@@ -101,8 +134,8 @@ def main():
 
     args = parser.parse_args()
     output_folder = args.output_folder
-    output_csv = os.path.join(output_folder, "Reports", "SQL_metrics.csv")
-    output_csv_errors = os.path.join(output_folder, "Reports", "SQL_metrics_errors.csv")
+    output_csv = os.path.join(output_folder, report_path)
+    output_csv_errors = os.path.join(output_folder, errors_report_path)
     os.makedirs(os.path.dirname(output_csv), exist_ok=True)
     log_file = os.path.join(output_folder,"Logs","sql_metrics.log")
     os.makedirs(os.path.dirname(log_file), exist_ok=True);
@@ -111,7 +144,7 @@ def main():
     try:
         with open(args.config_file, "r") as file:
             config = yaml.safe_load(file)
-            folder_config = config.get("folders", [])
+            folder_config = folders_from_config(config)
             scan_folders(folder_config, output_csv, output_csv_errors)
         print("SQL Scripts Scanning process done")
     except FileNotFoundError: